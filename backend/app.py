@@ -5,16 +5,18 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_jwt_extended.exceptions import JWTExtendedException
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from flask_restx import Api
 from dotenv import load_dotenv
-from werkzeug.utils import secure_filename
 
-from extensions import db
+from cli import register_commands
+from extensions import REPLICA_BIND, configure_engines, db, engine_options, pool_stats
+from utils import (audit, cache, hashing, identity, keyring, mail_queue, maintenance, media, metrics, ratelimit,
+                   revocation, tenants)
+from utils.otp import sweep_expired_otps
+from utils.sessions import purge_expired_sessions
 from resources.auth import api as auth_ns
 from resources.admin import api as admin_ns
-from seed import ensure_admin
+from seed import init_db
 
 load_dotenv()
 
@@ -25,23 +27,117 @@ def create_app():
     # --- Core config ---
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///app.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", "5"))
+    app.config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    app.config["DB_POOL_TIMEOUT"] = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    app.config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds, server databases only
+    app.config["DB_POOL_PRE_PING"] = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"], app.config)
+    replica_url = os.getenv("DATABASE_REPLICA_URL")  # user-list GETs read from here when set
+    app.config["SQLALCHEMY_BINDS"] = {}
+    if replica_url:
+        app.config["SQLALCHEMY_BINDS"][REPLICA_BIND] = {"url": replica_url, **engine_options(replica_url, app.config)}
+    # Tenants other than the default one, each with its own database: name=url;name=url
+    app.config["TENANT_DATABASES"] = tenants.parse_tenant_databases(os.getenv("TENANT_DATABASES"))
+    app.config["TENANT_HEADER"] = os.getenv("TENANT_HEADER", "X-Tenant")
+    app.config["SQLALCHEMY_BINDS"].update(tenants.tenant_binds(app.config))
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
+    app.config["OTP_SECRET"] = os.getenv("OTP_SECRET")  # HMAC key for stored OTPs, defaults to SECRET_KEY
+    app.config["OTP_SWEEP_SECONDS"] = int(os.getenv("OTP_SWEEP_SECONDS", "300"))  # 0 disables
+    app.config["JOB_BUDGET_SECONDS"] = float(os.getenv("JOB_BUDGET_SECONDS", "30"))  # per run, rest is backlog
+    app.config["JOB_BATCH_PAUSE_SECONDS"] = float(os.getenv("JOB_BATCH_PAUSE_SECONDS", "0.01"))
     
     # --- File upload config ---
     app.config["UPLOAD_FOLDER"] = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
     app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    app.config["THUMBNAIL_SIZES"] = [int(size) for size in os.getenv("THUMBNAIL_SIZES", "96,256").split(",") if size]
+    app.config["THUMBNAIL_WORKERS"] = int(os.getenv("THUMBNAIL_WORKERS", "2"))  # 0 disables thumbnails
+    app.config["UPLOADS_MAX_PIXELS"] = int(os.getenv("UPLOADS_MAX_PIXELS", str(40 * 1000 * 1000)))  # width x height
+    app.config["UPLOADS_SENDFILE"] = os.getenv("UPLOADS_SENDFILE")  # x-sendfile or x-accel-redirect
+    app.config["UPLOADS_ACCEL_PREFIX"] = os.getenv("UPLOADS_ACCEL_PREFIX", "/protected-uploads")
+    app.config["UPLOADS_SWEEP_SECONDS"] = int(os.getenv("UPLOADS_SWEEP_SECONDS", "3600"))  # 0 disables
+    app.config["UPLOADS_ORPHAN_AGE_HOURS"] = float(os.getenv("UPLOADS_ORPHAN_AGE_HOURS", "24"))
+
+    # --- Password hashing pool ---
+    app.config["HASH_POOL_WORKERS"] = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+    app.config["HASH_POOL_QUEUE_SIZE"] = int(os.getenv("HASH_POOL_QUEUE_SIZE", "0")) or None
+    app.config["HASH_DEADLINE_SECONDS"] = float(os.getenv("HASH_DEADLINE_SECONDS", "5"))
+    app.config["HASH_PROFILE"] = os.getenv("HASH_PROFILE", "low")
+    app.config["HASH_ROUNDS"] = int(os.getenv("HASH_ROUNDS", "0")) or None
 
     # --- JWT config ---
-    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret")
+    app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret")  # only used with HS256
+    app.config["JWT_ALGORITHM"] = os.getenv("JWT_ALGORITHM", "RS256")  # RS256, EdDSA or HS256
+    app.config["JWT_KEY_DIR"] = os.getenv("JWT_KEY_DIR", os.path.join(app.instance_path, "jwt_keys"))
+    app.config["JWT_KEY_ROTATION_DAYS"] = float(os.getenv("JWT_KEY_ROTATION_DAYS", "30"))  # 0 disables
+    app.config["JWKS_MAX_AGE_SECONDS"] = int(os.getenv("JWKS_MAX_AGE_SECONDS", "600"))
     app.config["JWT_TOKEN_LOCATION"] = ["headers", "cookies"]
     app.config["JWT_COOKIE_SECURE"] = os.getenv("FLASK_ENV") == "production"  # True in production
     app.config["JWT_COOKIE_HTTPONLY"] = True  # Prevent XSS attacks
     app.config["JWT_COOKIE_SAMESITE"] = "Strict" if os.getenv("FLASK_ENV") == "production" else "Lax"
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=30)
     app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=7)
+    app.config["SESSION_MAX_AGE"] = timedelta(days=float(os.getenv("SESSION_MAX_AGE_DAYS", "30")))  # caps rotation
+    app.config["REFRESH_REUSE_GRACE_SECONDS"] = float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
     app.config["JWT_BLACKLIST_ENABLED"] = True
     app.config["JWT_BLACKLIST_TOKEN_CHECKS"] = ["access", "refresh"]
+    # Let JWT errors reach the loaders below instead of flask_restx's generic 500
+    app.config["PROPAGATE_EXCEPTIONS"] = True
+
+    # --- Token revocation ---
+    app.config["REVOCATION_BACKEND"] = os.getenv("REVOCATION_BACKEND", "sql")  # sql or memory
+    app.config["REVOCATION_CACHE_SIZE"] = int(os.getenv("REVOCATION_CACHE_SIZE", "100000"))
+    app.config["REVOCATION_SYNC_SECONDS"] = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+    app.config["REVOCATION_BLOOM_BYTES"] = int(os.getenv("REVOCATION_BLOOM_BYTES", str(1024 * 1024)))  # 0 disables
+    app.config["REVOCATION_BLOOM_BUCKET_SECONDS"] = int(os.getenv("REVOCATION_BLOOM_BUCKET_SECONDS", "3600"))
+
+    # --- Outbound email ---
+    app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER")
+    app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT") or "587")
+    app.config["MAIL_USERNAME"] = os.getenv("MAIL_USERNAME")
+    app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
+    app.config["MAIL_USE_TLS"] = os.getenv("MAIL_USE_TLS", "true").lower() == "true"
+    app.config["MAIL_SPOOL_PATH"] = os.getenv("MAIL_SPOOL_PATH", os.path.join(app.instance_path, "mail_spool.db"))
+    app.config["MAIL_POOL_SIZE"] = int(os.getenv("MAIL_POOL_SIZE", "2"))
+    app.config["MAIL_BATCH_SIZE"] = int(os.getenv("MAIL_BATCH_SIZE", "20"))
+    app.config["MAIL_MAX_ATTEMPTS"] = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+    app.config["MAIL_RETRY_BACKOFF_SECONDS"] = float(os.getenv("MAIL_RETRY_BACKOFF_SECONDS", "30"))
+
+    # --- Caching ---
+    app.config["CACHE_BACKEND"] = os.getenv("CACHE_BACKEND", "memory")  # memory or redis
+    app.config["REDIS_URL"] = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    app.config["PROFILE_CACHE_TTL_SECONDS"] = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "30"))
+    app.config["PROFILE_CACHE_SIZE"] = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+    app.config["IDENTITY_CACHE_TTL_SECONDS"] = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "5"))  # staleness bound
+    app.config["IDENTITY_CACHE_SIZE"] = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+
+    # --- Rate limiting ---
+    app.config["RATELIMIT_ENABLED"] = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+    app.config["RATELIMIT_STORAGE"] = os.getenv("RATELIMIT_STORAGE", "memory")  # memory, sql or redis
+    app.config["RATELIMIT_REDIS_URL"] = os.getenv("RATELIMIT_REDIS_URL")  # defaults to REDIS_URL
+    app.config["RATELIMIT_DEFAULT"] = os.getenv("RATELIMIT_DEFAULT", "300/minute")  # per client, empty disables
+    app.config["RATELIMIT_ROUTES"] = os.getenv(
+        "RATELIMIT_ROUTES",
+        "auth_user_login=20/minute;auth_admin_login=10/minute;auth_verify_otp=10/minute;"
+        "auth_refresh=60/minute;admin_users_bulk=10/hour;upload_profile_picture=30/hour",
+    )
+    app.config["RATELIMIT_EXEMPT"] = ("health_check", "metrics", "jwks", "static")
+    app.config["RATELIMIT_LOGIN_FAILURES"] = os.getenv("RATELIMIT_LOGIN_FAILURES", "5/15minutes")  # per email
+
+    # --- Audit log ---
+    app.config["AUDIT_SINK"] = os.getenv("AUDIT_SINK", "sql")  # sql (searchable) or jsonl
+    app.config["AUDIT_DIR"] = os.getenv("AUDIT_DIR", os.path.join(app.instance_path, "audit"))  # jsonl segments
+    app.config["AUDIT_SEGMENT_BYTES"] = int(os.getenv("AUDIT_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+    app.config["AUDIT_BUFFER_SIZE"] = int(os.getenv("AUDIT_BUFFER_SIZE", "10000"))  # oldest events dropped past this
+    app.config["AUDIT_BATCH_SIZE"] = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    app.config["AUDIT_FLUSH_SECONDS"] = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+
+    # --- Metrics ---
+    app.config["METRICS_ENABLED"] = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    app.config["METRICS_DIR"] = os.getenv("METRICS_DIR")  # shared by workers for /api/metrics aggregation
+    app.config["METRICS_FLUSH_SECONDS"] = int(os.getenv("METRICS_FLUSH_SECONDS", "10"))
 
     # --- CORS ---
     frontend_origin = os.getenv("FRONTEND_ORIGIN", "http://localhost:3000")
@@ -60,21 +156,53 @@ def create_app():
 
     # --- Init ---
     db.init_app(app)
+    configure_engines(app)
+    tenants.init_app(app)
+    metrics_dir = metrics.init_app(app)
+    hashing.init_app(app)
+    register_commands(app)
+    email_dispatcher = mail_queue.init_app(app)
+    media_store = media.init_app(app)
+    audit_log = audit.init_app(app)
+
+    @app.before_request
+    def start_background_workers():
+        # Picks up mail left in the spool by a previous run on the first request.
+        email_dispatcher.start()
+        audit_log.start()
+        app.extensions["maintenance"].start()
     jwt = JWTManager(app)
+    jwt_keyring = keyring.init_app(app, jwt)
+    identity_cache = identity.init_app(app, jwt)
     
-    # Rate limiting
-    limiter = Limiter(
-        key_func=get_remote_address,
-        default_limits=["200 per day", "50 per hour"]
-    )
-    limiter.init_app(app)
-    
-    # Token blacklist for logout functionality
-    blacklisted_tokens = set()
+    rate_limiter = ratelimit.init_app(app)
     
+    # Token revocation store for logout functionality
+    revocation_store = revocation.init_app(app)
+    profile_cache = cache.init_app(app)
+
+    # Background housekeeping
+    tasks = maintenance.init_app(app)
+    # Cleanup of shared tables runs on one worker per interval; key rotation is already safe everywhere.
+    tasks.register("sweep_expired_otps", app.config["OTP_SWEEP_SECONDS"],
+                   tenants.for_each_tenant(sweep_expired_otps), lease="cluster")
+    tasks.register("purge_expired_sessions", app.config["OTP_SWEEP_SECONDS"],
+                   tenants.for_each_tenant(purge_expired_sessions), lease="cluster")
+    if isinstance(revocation_store, revocation.SQLRevocationStore):
+        tasks.register("purge_revoked_tokens", app.config["OTP_SWEEP_SECONDS"],
+                       tenants.for_each_tenant(revocation_store.purge_expired), lease="cluster")
+    if jwt_keyring is not None:
+        tasks.register("rotate_jwt_keys", 60, jwt_keyring.maintain)
+    if isinstance(rate_limiter.store, ratelimit.SQLRateLimitStore):
+        tasks.register("purge_rate_limit_counters", app.config["OTP_SWEEP_SECONDS"], rate_limiter.store.purge_expired,
+                       lease="cluster")
+    # The upload folder is local disk, so one worker per host.
+    tasks.register("sweep_upload_orphans", app.config["UPLOADS_SWEEP_SECONDS"], media.sweep_upload_orphans,
+                   lease="node")
+
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        return jwt_payload['jti'] in blacklisted_tokens
+        return revocation.get_store().is_revoked(jwt_payload['jti'], jwt_payload.get('exp'))
     
     @jwt.revoked_token_loader
     def revoked_token_callback(jwt_header, jwt_payload):
@@ -92,6 +220,56 @@ def create_app():
     def missing_token_callback(error):
         return jsonify({"message": "Authorization token required"}), 401
 
+    if metrics_dir:
+        tasks.register("write_metrics_snapshot", app.config["METRICS_FLUSH_SECONDS"],
+                       lambda: metrics.write_worker_snapshot(metrics_dir))
+
+    def runtime_gauges():
+        pid = os.getpid()
+        pool = hashing.get_pool().stats()
+        email = email_dispatcher.stats()
+        gauges = [
+            ("hash_pool_queue_depth", "Password hash calls queued or running.", {"pid": pid}, pool["queue_depth"]),
+            ("hash_pool_rejected_total", "Hash calls rejected because the queue was full.", {"pid": pid}, pool["rejected"]),
+            ("hash_pool_timeouts_total", "Hash calls that exceeded their deadline.", {"pid": pid}, pool["timeouts"]),
+            ("email_queue_pending", "Emails waiting in the spool.", {"pid": pid}, email["pending"]),
+            ("email_queue_dead", "Emails that exhausted their delivery attempts.", {"pid": pid}, email["dead"]),
+        ]
+        for bind, pool_info in pool_stats().items():
+            if pool_info["checked_out"] is not None:
+                gauges.append(("db_pool_checked_out", "Database connections currently in use.",
+                               {"pid": pid, "bind": bind}, pool_info["checked_out"]))
+        gauges.append(("rate_limit_rejected_total", "Requests and logins rejected by rate limits.", {"pid": pid},
+                       rate_limiter.stats()["rejected"]))
+        profile = profile_cache.stats()
+        gauges.append(("profile_cache_hit_rate", "Share of profile reads served from cache.", {"pid": pid}, profile["hit_rate"]))
+        audit_stats = audit_log.stats()
+        gauges += [
+            ("audit_buffered", "Auth events waiting to be written.", {"pid": pid}, audit_stats["buffered"]),
+            ("audit_dropped_total", "Auth events dropped because the buffer was full or a write failed.", {"pid": pid},
+             audit_stats["dropped"]),
+        ]
+        for job in tasks.tasks:
+            if job.last_duration is not None:
+                gauges += [
+                    ("job_last_duration_seconds", "Duration of the job's last run in this worker.",
+                     {"pid": pid, "job": job.name}, job.last_duration),
+                    ("job_backlog", "1 when the job's last run stopped at its time budget with work left.",
+                     {"pid": pid, "job": job.name}, int(job.backlog)),
+                ]
+        gauges.append(("identity_cache_hit_rate", "Share of account status checks served from cache.", {"pid": pid},
+                       identity_cache.stats()["hit_rate"]))
+        bloom = revocation_store.stats().get("bloom")
+        if bloom:
+            gauges += [
+                ("revocation_bloom_checks_total", "Revocation checks against the Bloom filter.", {"pid": pid}, bloom["checks"]),
+                ("revocation_bloom_hit_rate", "Share of revocation checks answered by the Bloom filter alone.", {"pid": pid}, bloom["hit_rate"]),
+                ("revocation_bloom_false_positive_rate", "Share of Bloom filter positives that were not revoked.", {"pid": pid}, bloom["false_positive_rate"]),
+            ]
+        return gauges
+
+    metrics.register_gauges(app, runtime_gauges)
+
     # --- API ---
     api = Api(app, version="1.0", title="Galvan AI API", doc="/api/docs", prefix="/api")
     api.add_namespace(auth_ns, path="/auth")
@@ -100,68 +278,34 @@ def create_app():
     # Add a simple health check endpoint
     @app.route('/api/health')
     def health_check():
-        return {"status": "ok", "message": "Server is running"}, 200
-    
-    # File upload utility functions
-    def allowed_file(filename):
-        return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-    
-    def save_uploaded_file(file, user_id):
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            # Create unique filename with user_id
-            name, ext = os.path.splitext(filename)
-            unique_filename = f"user_{user_id}_{name}{ext}"
-            
-            # Ensure upload directory exists
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
-            
-            # Return relative URL for the uploaded file
-            return f"/uploads/{unique_filename}"
-        return None
-    
-    # File upload endpoint
-    @app.route('/api/upload/profile-picture', methods=['POST'])
-    def upload_profile_picture():
-        if 'file' not in request.files:
-            return jsonify({"error": "No file provided"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({"error": "Invalid file type. Allowed: png, jpg, jpeg, gif, webp"}), 400
-        
-        # For now, use a temporary user_id (in real app, get from JWT)
-        temp_user_id = request.form.get('user_id', 'temp')
-        file_url = save_uploaded_file(file, temp_user_id)
-        
-        if file_url:
-            return jsonify({"url": file_url}), 200
-        else:
-            return jsonify({"error": "Failed to save file"}), 500
-
-    # Serve uploaded files
-    @app.route('/uploads/<filename>')
-    def uploaded_file(filename):
-        from flask import send_from_directory
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-    
-    # --- DB & seed ---
-    with app.app_context():
-        db.create_all()
-        ensure_admin()
+        return {
+            "status": "ok",
+            "message": "Server is running",
+            "hashing": hashing.get_pool().stats(),
+            "revocation": revocation.get_store().stats(),
+            "jwt": jwt_keyring.stats() if jwt_keyring else {"algorithm": app.config["JWT_ALGORITHM"]},
+            "email": email_dispatcher.stats(),
+            "database": pool_stats(),
+            "profile_cache": profile_cache.stats(),
+            "identity_cache": identity_cache.stats(),
+            "rate_limit": rate_limiter.stats(),
+            "media": media_store.stats(),
+            "audit": audit_log.stats(),
+        }, 200
 
-    return app
+    @app.errorhandler(hashing.HashingUnavailable)
+    def hashing_unavailable(error):
+        return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
 
+    # No database or disk work here: workers boot without touching the schema.
+    # Run `flask --app app init-db` once per deployment to create tables and the superadmin.
+    return app
 
-app = create_app()
 
 if __name__ == "__main__":
+    app = create_app()
+    with app.app_context():
+        init_db()  # development convenience; production runs the CLI command
     host = os.getenv("BACKEND_HOST", "0.0.0.0")  # Listen on all interfaces
     port = int(os.getenv("BACKEND_PORT", "5000"))
     app.run(host=host, port=port, debug=True)
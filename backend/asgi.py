@@ -0,0 +1,148 @@
+"""ASGI entry point: ``uvicorn asgi:app`` (or ``python serve.py --mode asgi``).
+
+The event loop owns the sockets, so idle keep-alive connections and slow
+clients no longer pin a thread each. The hot routes in ``NATIVE_VIEWS`` (admin
+and user logins, the profile and the admin user list) are served on the loop:
+their request handling runs on the ``SERVER_THREADS`` pool in two short steps,
+and between them their queries run on an ``AsyncSession`` (utils.async_db) and
+the password check is awaited on the hashing pool, so a request waiting on
+the database or on PBKDF2 holds no thread. Every other request, and user list
+NDJSON exports, run the Flask app through a2wsgi on the same threads, so the
+/api/auth and /api/admin contract is the WSGI one throughout.
+"""
+import asyncio
+import contextvars
+import io
+import os
+from functools import partial
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import request_started
+
+from app import create_app
+from extensions import current_tenant, db
+from resources.admin import UsersPage
+from resources.auth import LoginAttempt, ProfileRead
+from utils.async_db import AsyncDatabase
+
+NATIVE_VIEWS = {
+    ("POST", "/api/auth/admin-login"): partial(LoginAttempt, "admin"),
+    ("POST", "/api/auth/user-login"): partial(LoginAttempt, "user"),
+    ("GET", "/api/auth/profile"): ProfileRead,
+    ("GET", "/api/admin/users"): UsersPage,
+}
+
+flask_app = create_app()
+wsgi = WSGIMiddleware(flask_app, workers=int(os.getenv("SERVER_THREADS", "8")))
+async_db = AsyncDatabase(flask_app)
+
+
+def native_view(scope):
+    """The view serving this request on the loop, or None to pass it to the WSGI app."""
+    view = NATIVE_VIEWS.get((scope["method"], scope["path"]))
+    if view is UsersPage and "ndjson" in parse_qs(scope["query_string"].decode("latin1")).get("format", ()):
+        return None  # exports stream through the WSGI app
+    return view
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_response(send, response):
+    headers = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in response.headers.items()]
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response.get_data()})
+
+
+async def serve(view, scope, receive, send):
+    """One request, dispatched by hand the way ``Flask.full_dispatch_request`` would.
+
+    ``view.begin`` and ``view.finish`` run in the request context on the pool;
+    ``view.run`` gets an ``AsyncSession`` on the tenant's database (the
+    replica if ``view.replica``) and runs on the loop. Their exceptions go to
+    ``view.error`` when the view has one, else to Flask's handlers. The
+    request context lives in its own ``contextvars`` context, which every step
+    enters, on whichever thread runs it.
+    """
+    environ = build_environ(scope, io.BytesIO(await _read_body(receive)))
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    request_context = flask_app.request_context(environ)
+    on_error = getattr(view, "error", None) or flask_app.handle_user_exception
+    pushed = []
+
+    def in_request(fn, *args):
+        return loop.run_in_executor(wsgi.executor, context.run, fn, *args)
+
+    def handled(fn, *args):
+        try:
+            return fn(*args)
+        except Exception as e:
+            return on_error(e)  # may re-raise; the context is popped below either way
+
+    def begin():
+        request_context.push()
+        pushed.append(request_context)
+        try:
+            request_started.send(flask_app, _async_wrapper=flask_app.ensure_sync)
+            rv = flask_app.preprocess_request()
+        except Exception as e:
+            rv = flask_app.handle_user_exception(e)
+        try:
+            return (rv if rv is not None else handled(view.begin)), current_tenant()
+        finally:
+            db.session.close()  # nothing should hold a connection while the loop has the request
+
+    async def run(tenant):
+        async with async_db.session(tenant, view.replica) as session:
+            return await view.run(session)
+
+    error = None
+    try:
+        rv, tenant = await in_request(begin)
+        if rv is None:
+            try:
+                # In the request's context, so spans and query metrics see the request.
+                result = await asyncio.create_task(run(tenant), context=context)
+            except Exception as e:
+                rv = await in_request(on_error, e)
+            else:
+                rv = await in_request(handled, view.finish, result)
+        response = await in_request(flask_app.finalize_request, rv)
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        if pushed:
+            await in_request(request_context.pop, error)
+    await _send_response(send, response)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await async_db.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    view = native_view(scope) if scope["type"] == "http" else None
+    if view is None:
+        await wsgi(scope, receive, send)
+    else:
+        await serve(view(), scope, receive, send)
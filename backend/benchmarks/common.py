@@ -0,0 +1,131 @@
+"""Shared helpers for the benchmark scripts: app setup, percentiles and result files."""
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+ADMIN_EMAIL = "admin@galvan.ai"
+ADMIN_PASSWORD = "Admin@1234"
+USER_PASSWORD = "Password@123"
+
+
+def create_bench_app(database_url=None, **env):
+    """Build the app against a throwaway SQLite database unless ``database_url`` is given."""
+    workdir = tempfile.mkdtemp(prefix="galvan-bench-")
+    os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("MAIL_SPOOL_PATH", os.path.join(workdir, "mail_spool.db"))
+    os.environ.setdefault("RATELIMIT_ENABLED", "false")
+    os.environ.setdefault("SUPERADMIN_EMAIL", ADMIN_EMAIL)
+    os.environ.setdefault("SUPERADMIN_PASSWORD", ADMIN_PASSWORD)
+    os.environ.update({key: str(value) for key, value in env.items()})
+
+    from app import create_app
+    from seed import init_db
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+    return app
+
+
+def seed(app, count):
+    from seed import seed_users
+
+    with app.app_context():
+        return seed_users(count, USER_PASSWORD)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies_s, elapsed_s, errors=0):
+    ms = [value * 1000 for value in latencies_s]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "throughput_rps": round(len(ms) / elapsed_s, 1) if elapsed_s else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+def timed(fn, iterations):
+    """Call ``fn`` repeatedly; returns the per-call latencies in seconds and total elapsed time."""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+
+def print_table(results):
+    print(f"{'benchmark':<28} {'reqs':>7} {'err':>5} {'rps':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['requests']:>7} {result['errors']:>5} {result['throughput_rps']:>10} "
+              f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+
+
+def write_results(path, suite, config, results):
+    document = {
+        "suite": suite,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "host": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": config,
+        "results": results,
+    }
+    with open(path, "w") as handle:
+        json.dump(document, handle, indent=2)
+
+
+def compare(path, results, tolerance):
+    """Print regressions against a previous results file; returns True when any were found."""
+    with open(path) as handle:
+        baseline = json.load(handle)["results"]
+    regressed = False
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        slower = before["p99_ms"] and result["p99_ms"] > before["p99_ms"] * (1 + tolerance)
+        fewer = before["throughput_rps"] and result["throughput_rps"] < before["throughput_rps"] * (1 - tolerance)
+        if slower or fewer:
+            regressed = True
+            print(f"REGRESSION {name}: p99 {before['p99_ms']} -> {result['p99_ms']} ms, "
+                  f"throughput {before['throughput_rps']} -> {result['throughput_rps']} rps")
+    if not regressed:
+        print(f"No regressions beyond {tolerance:.0%} against {path}")
+    return regressed
+
+
+def add_result_arguments(parser):
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (0.2 = 20%%)")
+
+
+def finish(args, suite, config, results):
+    print_table(results)
+    if args.output:
+        write_results(args.output, suite, config, results)
+        print(f"Results written to {args.output}")
+    if args.baseline and compare(args.baseline, results, args.tolerance):
+        sys.exit(1)
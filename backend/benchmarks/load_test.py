@@ -0,0 +1,213 @@
+"""HTTP load test for the auth API.
+
+Starts the app on a temporary SQLite database (or --database-url), seeds users
+and drives each endpoint at the requested concurrency:
+
+    python benchmarks/load_test.py --users 1000 --concurrency 16 --requests 2000 --output load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 ...   # an already running server
+
+The ``admin-create`` scenario creates ``--requests`` users one
+``POST /api/admin/users`` at a time, then the same number through
+``POST /api/admin/users/bulk`` in batches of ``--bulk-rows``, and reports
+users created per second for each and their ratio. Both pay one PBKDF2 hash
+per user, which bounds them on hosts with few cores; ``--hash-rounds 1000``
+compares the request and database overhead the bulk path removes.
+"""
+import argparse
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from common import ADMIN_EMAIL, ADMIN_PASSWORD, USER_PASSWORD, add_result_arguments, create_bench_app, finish, seed, summarize
+
+SCENARIOS = ("user-login", "refresh", "profile", "check", "admin-users", "admin-create")
+
+
+class Client:
+    """One keep-alive connection per worker thread."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        payload = json.dumps(body) if body is not None else None
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                data = response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+                    self._local.conn = None
+                return response.status, data
+            except (ConnectionError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def login(client, path, email, password):
+    status, data = client.request("POST", path, {"email": email, "password": password})
+    if status != 200:
+        raise SystemExit(f"Login for {email} failed with {status}: {data[:200]!r}")
+    return json.loads(data)
+
+
+def run_scenario(client, call, total, concurrency):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(count):
+        local_latencies, local_errors = [], 0
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                status = call()
+            except Exception:
+                status = 0
+            local_latencies.append(time.perf_counter() - started)
+            if status >= 400 or status == 0:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    per_worker = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, per_worker))
+    return summarize(latencies, time.perf_counter() - started, sum(errors))
+
+
+def start_server(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def build_calls(client, emails, concurrency):
+    """One zero-argument callable per scenario, each returning the HTTP status."""
+    user_tokens = login(client, "/api/auth/user-login", emails[0], USER_PASSWORD)
+    admin_tokens = login(client, "/api/auth/admin-login", ADMIN_EMAIL, ADMIN_PASSWORD)
+    # Refresh tokens are single use, so every call takes a session from the
+    # queue, rotates it and puts the new refresh token back.
+    refresh_tokens = queue.Queue()
+    for _ in range(concurrency):
+        refresh_tokens.put(login(client, "/api/auth/user-login", emails[0], USER_PASSWORD)["refreshToken"])
+
+    def rotate():
+        token = refresh_tokens.get()
+        status, data = client.request("POST", "/api/auth/refresh", token=token)
+        refresh_tokens.put(json.loads(data)["refreshToken"] if status == 200 else token)
+        return status
+
+    return {
+        "user-login": lambda: client.request(
+            "POST", "/api/auth/user-login", {"email": random.choice(emails), "password": USER_PASSWORD})[0],
+        "refresh": rotate,
+        "profile": lambda: client.request("GET", "/api/auth/profile", token=user_tokens["accessToken"])[0],
+        "check": lambda: client.request("GET", "/api/auth/check", token=user_tokens["accessToken"])[0],
+        "admin-users": lambda: client.request("GET", "/api/admin/users", token=admin_tokens["accessToken"])[0],
+    }
+
+
+def compare_create(client, admin_token, total, concurrency, bulk_rows):
+    """Users/s through N single creates and through bulk requests creating the same N users."""
+    run = uuid.uuid4().hex[:8]  # fresh emails on every run, also against a long-running --url server
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def new_user(kind):
+        with lock:
+            i = next(counter)
+        return {"firstName": "Load", "lastName": f"Create{i}", "email": f"{kind}-{run}-{i}@example.com",
+                "password": USER_PASSWORD, "role": "USER"}
+
+    single = run_scenario(
+        client, lambda: client.request("POST", "/api/admin/users", new_user("single"), token=admin_token)[0],
+        total, concurrency)
+
+    batches = [[new_user("bulk") for _ in range(min(bulk_rows, total - start))] for start in range(0, total, bulk_rows)]
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for batch in batches:
+        call_started = time.perf_counter()
+        status, data = client.request("POST", "/api/admin/users/bulk", batch, token=admin_token)
+        latencies.append(time.perf_counter() - call_started)
+        if status != 200 or json.loads(data)["created"] != len(batch):
+            errors += 1
+    bulk = summarize(latencies, time.perf_counter() - started, errors)
+
+    # Only users actually created count; a single create refused with 503 (hash pool full) created nobody.
+    single["users_per_s"] = round(single["throughput_rps"] * (total - single["errors"]) / total, 1)
+    bulk["users_per_s"] = round(total / sum(latencies), 1) if latencies and not errors else 0.0
+    ratio = bulk["users_per_s"] / single["users_per_s"] if single["users_per_s"] else 0.0
+    print(f"admin-create: {single['users_per_s']} users/s one at a time, {bulk['users_per_s']} users/s "
+          f"in bulk batches of {bulk_rows} ({ratio:.1f}x)")
+    return {"admin-create-single": single, "admin-create-bulk": bulk}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="Users to seed")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--bulk-rows", type=int, default=500, help="Users per bulk request in admin-create")
+    parser.add_argument("--hash-rounds", type=int, help="Override HASH_ROUNDS for the started app")
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--url", help="Target an already running server; skips app setup and seeding")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    emails = [f"user{i}@example.com" for i in range(args.users)]
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        app = create_bench_app(args.database_url, **({"HASH_ROUNDS": args.hash_rounds} if args.hash_rounds else {}))
+        emails = seed(app, args.users)
+        server, base_url = start_server(app)
+
+    client = Client(base_url)
+    calls = build_calls(client, emails, args.concurrency)
+
+    results = {}
+    for name in args.scenarios.split(","):
+        if name == "admin-create":
+            admin_token = login(client, "/api/auth/admin-login", ADMIN_EMAIL, ADMIN_PASSWORD)["accessToken"]
+            results.update(compare_create(client, admin_token, args.requests, args.concurrency, args.bulk_rows))
+        else:
+            results[name] = run_scenario(client, calls[name], args.requests, args.concurrency)
+        print(f"{name}: done")
+
+    if server is not None:
+        server.shutdown()
+    config = {key: getattr(args, key)
+              for key in ("users", "concurrency", "requests", "bulk_rows", "hash_rounds", "database_url", "url")}
+    finish(args, "load", config, results)
+
+
+if __name__ == "__main__":
+    main()
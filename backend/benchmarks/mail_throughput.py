@@ -0,0 +1,73 @@
+"""Compare queued, pooled email delivery with the one-connection-per-message path.
+
+    python benchmarks/mail_throughput.py --messages 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.emailer import send_email  # noqa: E402
+from utils.mail_queue import EmailDispatcher, MailSpool, SMTPConnectionPool  # noqa: E402
+from utils.smtp_sink import FakeSMTPServer  # noqa: E402
+
+
+def bench_direct(sink, count):
+    os.environ.update({
+        "MAIL_SERVER": sink.host,
+        "MAIL_PORT": str(sink.port),
+        "MAIL_USERNAME": "bench@example.com",
+        "MAIL_PASSWORD": "bench",
+        "MAIL_USE_TLS": "false",
+    })
+    started = time.perf_counter()
+    for i in range(count):
+        send_email(f"user{i}@example.com", "Benchmark", "Hello")
+    return time.perf_counter() - started
+
+
+def bench_dispatcher(sink, count, threads, batch_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = MailSpool(os.path.join(tmp, "spool.db"))
+        pool = SMTPConnectionPool(sink.host, sink.port, "bench@example.com", "bench", use_tls=False, size=threads)
+        dispatcher = EmailDispatcher(spool, pool, "bench@example.com", threads=threads, batch_size=batch_size,
+                                     poll_interval=0.05)
+        enqueue_started = time.perf_counter()
+        for i in range(count):
+            spool.enqueue(f"user{i}@example.com", "Benchmark", "Hello")
+        enqueue_time = time.perf_counter() - enqueue_started
+
+        started = time.perf_counter()
+        dispatcher.start()
+        while spool.counts().get("pending"):
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        dispatcher.stop()
+    return enqueue_time, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    sink = FakeSMTPServer().start()
+    direct = bench_direct(sink, args.messages)
+    connections_before = sink.connections
+    enqueue_time, queued = bench_dispatcher(sink, args.messages, args.threads, args.batch_size)
+    sink.stop()
+
+    print(f"messages: {args.messages}")
+    print(f"direct send_email:   {args.messages / direct:8.0f} msg/s  ({connections_before} connections)")
+    print(f"queued dispatcher:   {args.messages / queued:8.0f} msg/s  "
+          f"({sink.connections - connections_before} connections)")
+    print(f"enqueue (caller):    {args.messages / enqueue_time:8.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Micro-benchmarks for the per-request hot paths: password hashing, JWT issuance, revocation and serialization.
+
+    python benchmarks/micro.py --output micro.json
+"""
+import argparse
+import itertools
+import time
+from datetime import datetime
+
+from common import add_result_arguments, create_bench_app, finish, summarize, timed
+
+
+def bench_hashing(iterations):
+    from utils.hashing import build_context, get_rounds
+
+    context = build_context(get_rounds())
+    stored = context.hash("benchmark-password")
+    return {
+        "hash_password": summarize(*timed(lambda: context.hash("benchmark-password"), iterations)),
+        "verify_password": summarize(*timed(lambda: context.verify("benchmark-password", stored), iterations)),
+    }
+
+
+def bench_jwt(app, iterations):
+    from flask_jwt_extended import create_access_token, decode_token
+
+    claims = {"role": "USER", "type": "user"}
+    with app.app_context():
+        token = create_access_token(identity="1", additional_claims=claims)
+        return {
+            "create_access_token": summarize(
+                *timed(lambda: create_access_token(identity="1", additional_claims=claims), iterations)),
+            "decode_token": summarize(*timed(lambda: decode_token(token), iterations)),
+        }
+
+
+def bench_revocation(entries, iterations):
+    from utils.revocation import MemoryRevocationStore
+
+    # A full store, as after a mass logout: every further revoke is made at capacity.
+    store = MemoryRevocationStore(max_entries=entries)
+    expires_at = time.time() + 3600
+    for i in range(entries):
+        store.revoke(f"seed-{i}", expires_at + i)
+    counter = itertools.count()
+    return {
+        f"revoke_at_{entries}": summarize(
+            *timed(lambda: store.revoke(f"new-{next(counter)}", expires_at), iterations)),
+    }
+
+
+def sample_users(count):
+    from models import User
+
+    now = datetime.utcnow()
+    return [
+        User(id=i, first_name="Load", last_name=f"User{i}", email=f"user{i}@example.com", mobile_number="+15550000000",
+             role="USER", is_active=True, is_verified=True, created_at=now)
+        for i in range(count)
+    ]
+
+
+def bench_marshal(app, rows, iterations):
+    from resources.admin import api, user_model
+    from utils.serialization import DEFAULT_USER_FIELDS, USER_FIELDS, encode, object_serializer, row_serializer
+
+    users = sample_users(rows)
+    # What a column-only select returns: the fields in order, then created_at and id for the cursor.
+    tuples = [tuple(getattr(user, USER_FIELDS[name]) for name in DEFAULT_USER_FIELDS) + (user.created_at, user.id)
+              for user in users]
+    serialize_object = object_serializer(DEFAULT_USER_FIELDS)
+    serialize_row = row_serializer(DEFAULT_USER_FIELDS)
+    with app.app_context():
+        return {
+            f"marshal_{rows}_users": summarize(*timed(lambda: api.marshal(users, user_model), iterations)),
+            f"serialize_{rows}_users": summarize(*timed(lambda: [serialize_object(u) for u in users], iterations)),
+            f"serialize_{rows}_rows": summarize(*timed(lambda: [serialize_row(r) for r in tuples], iterations)),
+            f"encode_{rows}_rows": summarize(*timed(lambda: encode([serialize_row(r) for r in tuples]), iterations)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--hash-iterations", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=500, help="Users per marshalling call")
+    parser.add_argument("--revocations", type=int, default=100000, help="Entries in the full revocation store")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    app = create_bench_app(HASH_POOL_WORKERS=0)
+    results = {}
+    results.update(bench_hashing(args.hash_iterations))
+    results.update(bench_jwt(app, args.iterations))
+    results.update(bench_revocation(args.revocations, args.iterations))
+    results.update(bench_marshal(app, args.rows, max(args.iterations // 10, 1)))
+    config = {key: getattr(args, key) for key in ("iterations", "hash_iterations", "rows", "revocations")}
+    finish(args, "micro", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Query plans for every query the API and background jobs issue, on a large synthetic dataset.
+
+Fails (exit 1) when any of them reads a whole table instead of an index:
+
+    python benchmarks/query_plans.py --rows 1000000
+    python benchmarks/query_plans.py --database-url postgresql://... --rows 1000000
+
+The dataset is inserted once; re-running against the same ``--database-url``
+with ``--skip-seed`` only re-checks the plans.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import create_bench_app
+
+# Tables that stay a few rows long; a planner scanning them is right to.
+SMALL_TABLES = {"admin", "job_lease"}
+_SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+_POSTGRES_SCAN = re.compile(r'Seq Scan on "?(\w+)')
+
+BATCH = 10000
+ROLES = ("USER",) * 97 + ("ADMIN", "MANAGER", "SUPERVISOR")
+# As utils.audit.record writes them; a reused refresh token is a failed "refresh" event.
+EVENT_TYPES = ("login", "login", "login", "otp_verify", "logout", "refresh", "user_update")
+
+
+def _batches(count, make_row):
+    for start in range(0, count, BATCH):
+        yield [make_row(i) for i in range(start, min(start + BATCH, count))]
+
+
+def seed_dataset(rows):
+    """Users and auth events at ``rows`` each, the other tables at a tenth of that."""
+    from sqlalchemy import insert
+
+    from extensions import db
+    from models import AuthEvent, EmailOTP, RateLimitCounter, RefreshSession, RevokedToken, User
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    small = max(rows // 10, 1)
+    tables = [
+        (User, rows, lambda i: {
+            "first_name": "Plan", "last_name": f"User{i}", "email": f"plan{i}@example.com",
+            "password_hash": "x", "mobile_number": f"+1555{i:07d}", "role": rng.choice(ROLES),
+            "is_active": rng.random() > 0.02, "is_verified": rng.random() > 0.1,
+            "profile_picture_url": f"/uploads/{i:064x}.png" if rng.random() < 0.3 else None,
+            "created_at": now - timedelta(seconds=rows - i), "updated_at": now,
+        }),
+        (AuthEvent, rows, lambda i: {
+            "created_at": now - timedelta(seconds=rows - i), "event_type": rng.choice(EVENT_TYPES),
+            "success": rng.random() > 0.1, "subject_type": "user", "subject_id": rng.randrange(1, rows + 1),
+            "email": f"plan{rng.randrange(rows)}@example.com", "ip": "10.0.0.1",
+        }),
+        (RefreshSession, small, lambda i: {
+            "family": f"{i:032x}", "subject_type": "user", "subject_id": rng.randrange(1, rows + 1),
+            "role": "USER", "refresh_jti": f"{i:036x}", "access_jti": f"{i + small:036x}",
+            "access_expires_at": now, "created_at": now, "rotated_at": now,
+            "expires_at": now + timedelta(days=rng.uniform(-7, 7)),
+        }),
+        (RevokedToken, small, lambda i: {
+            "jti": f"{i:036x}", "expires_at": now + timedelta(minutes=rng.uniform(-60, 30)),
+            "revoked_at": now - timedelta(minutes=rng.uniform(0, 60)),
+        }),
+        (EmailOTP, small, lambda i: {
+            "email": f"plan{i}@example.com", "code_hash": "0" * 64, "purpose": "admin_verification",
+            "is_used": False, "created_at": now, "expires_at": now + timedelta(minutes=rng.uniform(-60, 10)),
+        }),
+        (RateLimitCounter, small, lambda i: {
+            "key": f"ip:10.0.{i // 256 % 256}.{i % 256}:auth_user_login:60", "window_index": i // 65536,
+            "count": 1, "expires_at": now + timedelta(minutes=rng.uniform(-2, 2)),
+        }),
+    ]
+    for model, count, make_row in tables:
+        started = time.perf_counter()
+        for batch in _batches(count, make_row):
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+        print(f"Inserted {count} {model.__tablename__} rows in {time.perf_counter() - started:.1f} s")
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+
+def statements(dialect):
+    """``(name, statement)`` for each distinct query shape, built the way the code issuing it does."""
+    from sqlalchemy import delete, select, update
+
+    from models import Admin, AuthEvent, EmailOTP, JobLease, RateLimitCounter, RefreshSession, RevokedToken, User
+    from resources.admin import build_events_query, build_users_query, encode_cursor
+    from resources.auth import PROFILE_COLUMNS
+    from utils.search import search_statement
+    from utils.serialization import DEFAULT_USER_FIELDS
+
+    now = datetime.utcnow()
+    email = "plan12345@example.com"
+    cursor = encode_cursor(now - timedelta(days=1), 500)
+    page = 51  # DEFAULT_PAGE_SIZE + 1 to detect the next page
+
+    def users(**args):
+        return build_users_query(args, DEFAULT_USER_FIELDS).limit(page)
+
+    def events(**args):
+        return build_events_query(args).limit(page)
+
+    def expired(model):
+        # delete_in_batches: select a batch of ids, then delete them by primary key.
+        return select(model.id).where(model.expires_at <= now).limit(1000)
+
+    return [
+        # Auth
+        ("admin_login", select(Admin).filter_by(email=email, is_active=True).limit(1)),
+        ("user_login", select(User).filter_by(email=email, is_active=True).limit(1)),
+        ("otp_user_lookup", select(User).where(User.email == email).limit(1)),
+        ("profile", select(*PROFILE_COLUMNS, User.updated_at).where(User.id == 1)),
+        ("identity_user", select(User.is_active, User.token_version, User.role).where(User.id == 1)),
+        ("identity_admin", select(Admin.is_active, Admin.token_version).where(Admin.id == 1)),
+        ("otp_lookup", select(EmailOTP).where(EmailOTP.email == email, EmailOTP.purpose == "admin_verification")),
+        ("otp_replace", delete(EmailOTP).where(EmailOTP.email == email, EmailOTP.purpose == "admin_verification")),
+        ("session_by_family", select(RefreshSession).where(RefreshSession.family == "0" * 32)),
+        ("session_rotate", update(RefreshSession).where(RefreshSession.id == 1, RefreshSession.refresh_jti == "x")
+         .values(rotated_at=now)),
+        ("sessions_of_subject", select(RefreshSession.id, RefreshSession.access_jti, RefreshSession.access_expires_at)
+         .where(RefreshSession.subject_type == "user", RefreshSession.subject_id == 1, RefreshSession.expires_at > now)),
+        ("sessions_revoke", update(RefreshSession).where(RefreshSession.id.in_([1, 2, 3])).values(expires_at=now)),
+        ("revocation_check", select(RevokedToken.id).where(RevokedToken.jti == "x", RevokedToken.expires_at > now)),
+        ("revocation_sync", select(RevokedToken.jti, RevokedToken.expires_at)
+         .where(RevokedToken.expires_at > now, RevokedToken.revoked_at >= now - timedelta(seconds=10))),
+        ("rate_limit_read", select(RateLimitCounter.window_index, RateLimitCounter.count)
+         .where(RateLimitCounter.key == "ip:10.0.0.1:auth_user_login:60", RateLimitCounter.window_index.in_((0, 1)))),
+        ("rate_limit_reset", delete(RateLimitCounter).where(RateLimitCounter.key == "ip:10.0.0.1:auth_user_login:60")),
+        # Admin
+        ("users_list", users()),
+        ("users_list_next_page", users(cursor=cursor)),
+        ("users_list_role", users(role="SUPERVISOR")),
+        ("users_list_inactive", users(is_active="false")),
+        ("users_list_inactive_next_page", users(is_active="false", cursor=cursor)),
+        ("users_list_unverified", users(is_verified="false")),
+        ("users_list_email_prefix", users(email_prefix="plan1234")),
+        ("user_email_exists", select(User).where(User.email == email).limit(1)),
+        ("user_by_id", select(User).where(User.id == 1)),
+        ("users_search", search_statement(dialect, ["plan123"], page)),
+        ("users_search_broad", search_statement(dialect, ["example", "plan"], page, 1000)),
+        ("users_search_rows", select(User.id, User.email).where(User.id.in_([1, 2, 3]))),
+        ("users_bulk_existing", select(User.email).where(User.email.in_([email, "plan1@example.com"]))),
+        ("events", events()),
+        ("events_next_page", events(cursor=cursor)),
+        ("events_subject", events(subject_id=1)),
+        ("events_email", events(email=email)),
+        ("events_type", events(type="logout")),
+        ("events_type_range", events(type="logout", since=(now - timedelta(hours=1)).isoformat())),
+        ("events_range", events(since=(now - timedelta(hours=1)).isoformat(), until=now.isoformat())),
+        # Background jobs
+        ("purge_otps", expired(EmailOTP)),
+        ("purge_sessions", expired(RefreshSession)),
+        ("purge_revoked_tokens", expired(RevokedToken)),
+        ("purge_rate_limit_counters", expired(RateLimitCounter)),
+        ("purge_batch_delete", delete(User).where(User.id.in_([1, 2, 3]))),
+        ("upload_referenced_digests", select(User.profile_picture_url).where(User.profile_picture_url.is_not(None))),
+        ("job_lease_acquire", update(JobLease).where(JobLease.name == "x", JobLease.leased_until <= now)
+         .values(owner="x")),
+    ]
+
+
+def explain(conn, statement):
+    """Plan lines for ``statement`` with its real bound parameters."""
+    dialect = conn.dialect
+    # Expands IN lists into one placeholder per value, as execution would.
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+    params = compiled.construct_params()
+    if dialect.name == "sqlite":
+        # SQLAlchemy stores datetimes in SQLite as text in this format.
+        positional = tuple(str(value) if isinstance(value, datetime) else value
+                           for value in (params[name] for name in compiled.positiontup))
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", positional)]
+    if dialect.name == "postgresql":
+        return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {compiled}", params)]
+    raise SystemExit(f"Query plans are only checked on sqlite and postgresql, not {dialect.name}")
+
+
+def full_scans(dialect_name, plan):
+    pattern = _SQLITE_SCAN if dialect_name == "sqlite" else _POSTGRES_SCAN
+    tables = (match.group(1) for match in (pattern.search(line.strip()) for line in plan) if match)
+    return [table for table in tables if table not in SMALL_TABLES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000, help="Users and auth events to insert")
+    parser.add_argument("--database-url", help="Check against this database instead of a throwaway SQLite file")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the data already in --database-url")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan, not only the failing ones")
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url, HASH_POOL_WORKERS=0)
+    from extensions import db
+
+    with app.app_context():
+        if not args.skip_seed:
+            seed_dataset(args.rows)
+        failed = []
+        with db.engine.connect() as conn:
+            for name, statement in statements(conn.dialect.name):
+                plan = explain(conn, statement)
+                scanned = full_scans(conn.dialect.name, plan)
+                print(f"{'FULL SCAN' if scanned else 'ok':<10} {name}{' (' + ', '.join(scanned) + ')' if scanned else ''}")
+                if scanned or args.verbose:
+                    for line in plan:
+                        print(f"{'':<10}   {line}")
+                if scanned:
+                    failed.append(name)
+    if failed:
+        print(f"\n{len(failed)} queries read a whole table: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nEvery query uses an index.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare the WSGI (gunicorn) and ASGI (uvicorn) serving modes at high concurrency.
+
+Seeds one SQLite database, then starts ``serve.py`` in each mode with the same
+worker and thread counts and drives the load-test scenarios against it:
+
+    python benchmarks/serving.py --concurrency 128 --requests 5000 --output serving.json
+
+With ``--background-logins N``, N more clients log in back to back while each
+scenario runs. WSGI threads wait out every password check; asgi.py awaits it
+on the event loop, so the other scenarios keep their threads:
+
+    python benchmarks/serving.py --scenarios check,profile --background-logins 8 --threads 4
+
+Needs requirements-serve.txt installed.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from common import BACKEND_DIR, add_result_arguments, create_bench_app, finish, seed
+from load_test import Client, build_calls, run_scenario
+
+MODES = ("wsgi", "asgi")
+DEFAULT_SCENARIOS = "user-login,profile,check,admin-users,refresh"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start(mode, args):
+    port = free_port()
+    command = [
+        sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "--mode", mode, "--host", "127.0.0.1",
+        "--port", str(port), "--workers", str(args.workers), "--threads", str(args.threads),
+        "--keep-alive", str(args.keep_alive),
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=os.environ.copy(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = Client(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{mode} server exited with {process.returncode}; is requirements-serve.txt installed?")
+        try:
+            if client.request("GET", "/api/health")[0] == 200:
+                return process, client
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"{mode} server did not become healthy within 60s")
+
+
+@contextmanager
+def background(call, clients):
+    """Keep ``clients`` threads calling ``call`` in a loop inside the block."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.is_set():
+            try:
+                call()
+            except OSError:
+                pass
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000, help="Users to seed")
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per scenario and mode")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--background-logins", type=int, default=0,
+                        help="Clients logging in continuously while each scenario runs")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    # The servers read the database, spool and admin settings from the environment set here.
+    app = create_bench_app(HASH_POOL_WORKERS=1)
+    emails = seed(app, args.users)
+
+    results = {}
+    for mode in args.modes.split(","):
+        process, client = start(mode, args)
+        try:
+            calls = build_calls(client, emails, args.concurrency)
+            for name in args.scenarios.split(","):
+                with background(calls["user-login"], args.background_logins):
+                    results[f"{mode}:{name}"] = run_scenario(client, calls[name], args.requests, args.concurrency)
+                print(f"{mode} {name}: done")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    config = {key: getattr(args, key) for key in
+              ("users", "concurrency", "requests", "workers", "threads", "keep_alive", "background_logins")}
+    finish(args, "serving", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Worker boot time: importing the app, building it with create_app() and serving its first request.
+
+Every sample is a fresh interpreter, as a new gunicorn or uvicorn worker would be:
+
+    python benchmarks/startup.py --samples 20 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from common import BACKEND_DIR, add_result_arguments, create_bench_app, finish, summarize
+
+PHASES = ("import_app", "create_app", "first_request", "boot_total")
+
+# Runs in the child; prints the phase timings in seconds as one JSON line.
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+status = flask_app.test_client().get("/api/health").status_code
+served = time.perf_counter()
+if status != 200:
+    sys.exit(f"health check returned {status}")
+print(json.dumps({"import_app": imported - started, "create_app": created - imported,
+                  "first_request": served - created}))
+"""
+
+
+def boot_once():
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=os.environ.copy(),
+        capture_output=True, text=True, check=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["boot_total"] = time.perf_counter() - started
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=10, help="Fresh interpreters to start")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    # Tables, the superadmin and a signing key exist up front, as they would after `flask init-db`.
+    app = create_bench_app(HASH_POOL_WORKERS=0)
+    app.test_client().get("/.well-known/jwks.json")
+
+    samples = {phase: [] for phase in PHASES}
+    started = time.perf_counter()
+    for _ in range(args.samples):
+        timings = boot_once()
+        for phase in PHASES:
+            samples[phase].append(timings[phase])
+    elapsed = time.perf_counter() - started
+
+    results = {phase: summarize(samples[phase], elapsed) for phase in PHASES}
+    finish(args, "startup", {"samples": args.samples}, results)
+
+
+if __name__ == "__main__":
+    main()
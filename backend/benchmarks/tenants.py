@@ -0,0 +1,87 @@
+"""Per-tenant admin query latency as the number of tenant databases grows.
+
+Builds the app with 1, 4, 16 and 64 tenants, each in its own SQLite file with
+the same number of users, and sends admin list and search requests to the
+tenants in turn. Latency should stay flat: a request only touches its own
+tenant's database and connection pool.
+
+    python benchmarks/tenants.py --tenants 1 4 16 64 --users 2000 --output tenants.json
+"""
+import argparse
+import itertools
+import os
+import tempfile
+
+from common import add_result_arguments, create_bench_app, finish, summarize, timed
+
+ENDPOINTS = {
+    "users_list": "/api/admin/users?limit=50",
+    "users_search": "/api/admin/users/search?q=user12&limit=50",
+}
+
+
+def build(tenant_count, users, workdir):
+    names = [f"t{i:03d}" for i in range(1, tenant_count)]
+    databases = ";".join(f"{name}=sqlite:///{os.path.join(workdir, name + '.db')}" for name in names)
+    app = create_bench_app(f"sqlite:///{os.path.join(workdir, 'default.db')}",
+                           HASH_POOL_WORKERS=0, TENANT_DATABASES=databases)
+
+    from flask_jwt_extended import create_access_token
+
+    from extensions import DEFAULT_TENANT, db, tenant_context
+    from models import Admin
+    from seed import seed_users
+
+    tokens = {}
+    with app.app_context():
+        for name in [DEFAULT_TENANT, *names]:
+            with tenant_context(name):
+                seed_users(users)
+                admin = Admin.query.first()
+                if admin is None:
+                    admin = Admin(first_name="Bench", last_name="Admin", email=f"admin@{name}.example.com",
+                                  password_hash="x", is_active=True)
+                    db.session.add(admin)
+                    db.session.commit()
+                tokens[name] = create_access_token(identity=str(admin.id), additional_claims={
+                    "type": "admin", "role": "ADMIN", "ver": admin.token_version, "tenant": name})
+    return app, tokens
+
+
+def bench(app, tokens, iterations):
+    client = app.test_client()
+    header = app.config["TENANT_HEADER"]
+    headers = [{header: name, "Authorization": f"Bearer {token}"} for name, token in tokens.items()]
+    results = {}
+    for name, path in ENDPOINTS.items():
+        turn = itertools.cycle(headers)
+        errors = []
+
+        def call():
+            response = client.get(path, headers=next(turn))
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+        results[name] = summarize(*timed(call, iterations), errors=len(errors))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--users", type=int, default=2000, help="Users in each tenant's database")
+    parser.add_argument("--iterations", type=int, default=1000, help="Requests per endpoint, spread over tenants")
+    add_result_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    for count in args.tenants:
+        app, tokens = build(count, args.users, tempfile.mkdtemp(prefix=f"galvan-tenants-{count}-"))
+        for name, result in bench(app, tokens, args.iterations).items():
+            results[f"{name}_{count}_tenants"] = result
+    config = {key: getattr(args, key) for key in ("tenants", "users", "iterations")}
+    finish(args, "tenants", config, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+
+import click
+
+from extensions import db, tenant_context, tenant_engine
+from models import Admin
+from utils.hashing import HASH_PROFILES, build_context
+from seed import init_db
+from utils.keyring import get_keyring
+from utils.migrations import new_revision
+from utils.search import SearchUnavailable, rebuild_search_index
+from utils.tenants import tenant_names
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def register_commands(app):
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Migrate every tenant's database and create the search index and the superadmin account."""
+        started = time.perf_counter()
+        try:
+            done = init_db()
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        for line in done:
+            click.echo(line)
+        click.echo(f"Database ready in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+    @app.cli.command("db-revision")
+    @click.option("-m", "--message", required=True, help="What the revision changes.")
+    def db_revision(message):
+        """Write a migration for the model changes not yet in the default tenant's database."""
+        click.echo(f"Wrote {new_revision(db.engine, message)}; review it before committing.")
+
+    @app.cli.command("hash-benchmark")
+    @click.option("--samples", default=20, show_default=True, help="Verify calls per profile.")
+    @click.option("--target-p99-ms", default=250.0, show_default=True, help="Latency budget for a single verify.")
+    def hash_benchmark(samples, target_p99_ms):
+        """Measure password verify latency per hash profile on this host."""
+        per_round_ms = []
+        click.echo(f"{'profile':<10} {'rounds':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, rounds in HASH_PROFILES.items():
+            context = build_context(rounds)
+            stored = context.hash("benchmark-password")
+            timings = []
+            for _ in range(samples):
+                started = time.perf_counter()
+                context.verify("benchmark-password", stored)
+                timings.append((time.perf_counter() - started) * 1000)
+            p50, p99 = _percentile(timings, 50), _percentile(timings, 99)
+            per_round_ms.append(p99 / rounds)
+            marker = "" if p99 <= target_p99_ms else "  (over budget)"
+            click.echo(f"{name:<10} {rounds:>8} {p50:>8.1f} {p99:>8.1f}{marker}")
+
+        # PBKDF2 cost is linear in rounds, so scale from the worst observed rate.
+        recommended = int(target_p99_ms / max(per_round_ms)) // 1000 * 1000
+        fitting = [name for name, rounds in HASH_PROFILES.items() if rounds <= recommended]
+        click.echo(f"\nRecommended HASH_ROUNDS for p99 <= {target_p99_ms:g} ms: {recommended}")
+        if fitting:
+            click.echo(f"Strongest profile within budget: HASH_PROFILE={fitting[-1]}")
+        else:
+            click.echo("No named profile fits this budget on this host.")
+
+    @app.cli.command("rotate-jwt-key")
+    def rotate_jwt_key():
+        """Publish a new JWT signing key; it starts signing after JWKS_MAX_AGE_SECONDS."""
+        keyring = get_keyring()
+        if keyring is None:
+            raise click.ClickException("JWT_ALGORITHM uses a shared secret; there are no keys to rotate.")
+        kid = keyring.rotate()
+        click.echo(f"Published key {kid}; tokens are signed with it from "
+                   f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(kid) + keyring.publish_ahead))}.")
+
+    @app.cli.command("rebuild-search-index")
+    @click.option("--tenant", help="Only this tenant's database (default: every tenant).")
+    def rebuild_search_index_command(tenant):
+        """Refill the admin user search index from the user table."""
+        names = tenant_names()
+        if tenant is not None and tenant not in names:
+            raise click.ClickException(f"Unknown tenant '{tenant}'")
+        for name in [tenant] if tenant else names:
+            started = time.perf_counter()
+            try:
+                indexed = rebuild_search_index(tenant_engine(name))
+            except SearchUnavailable as e:
+                raise click.ClickException(str(e))
+            click.echo(f"Indexed {indexed} users of tenant {name} in {time.perf_counter() - started:.1f} s.")
+
+    @app.cli.command("create-admin")
+    @click.option("--tenant", required=True, help="Tenant the admin manages.")
+    @click.option("--email", required=True)
+    @click.option("--first-name", default="Tenant", show_default=True)
+    @click.option("--last-name", default="Admin", show_default=True)
+    @click.password_option()
+    def create_admin(tenant, email, first_name, last_name, password):
+        """Create an admin in a tenant's database; init-db only creates the default tenant's superadmin."""
+        if tenant not in tenant_names():
+            raise click.ClickException(f"Unknown tenant '{tenant}'")
+        with tenant_context(tenant):
+            if Admin.query.filter_by(email=email).first():
+                raise click.ClickException(f"Admin {email} already exists in tenant {tenant}")
+            admin = Admin(first_name=first_name, last_name=last_name, email=email, is_active=True)
+            admin.set_password(password)
+            db.session.add(admin)
+            db.session.commit()
+        click.echo(f"Created admin {email} in tenant {tenant}.")
@@ -1,3 +1,143 @@
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA_BIND = "replica"
+DEFAULT_TENANT = "default"
+
+
+def tenant_bind(tenant):
+    """Bind key of a tenant's database; the default tenant uses the primary."""
+    return None if tenant == DEFAULT_TENANT else f"tenant:{tenant}"
+
+
+class RoutingSession(Session):
+    """Sends every statement to the current tenant's database, and SELECTs of the
+    default tenant to the ``replica`` bind while ``use_replica`` is set.
+
+    Flushes and anything that is not a plain SELECT always go to the primary.
+    ``db.engine`` is not routed: tables shared by all tenants are used through it.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            tenant = self.info.get("tenant", DEFAULT_TENANT)
+            if tenant != DEFAULT_TENANT:
+                return self._db.engines[tenant_bind(tenant)]
+            if self.info.get("use_replica") and not self._flushing and getattr(clause, "is_select", False):
+                replica = self._db.engines.get(REPLICA_BIND)
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def replica_reads(fn):
+    """Route the view's queries to the read replica, when one is configured.
+
+    Only for read-only views that can tolerate replication lag.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = db.session.info.get("use_replica")
+        db.session.info["use_replica"] = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db.session.info["use_replica"] = previous
+    return wrapper
+
+
+def current_tenant():
+    """Tenant whose database the session uses; the default tenant outside app contexts."""
+    if not has_app_context():
+        return DEFAULT_TENANT
+    return db.session.info.get("tenant", DEFAULT_TENANT)
+
+
+def tenant_engine(tenant):
+    """Engine of a tenant's database, for work outside the session."""
+    return db.engines[tenant_bind(tenant)]
+
+
+@contextmanager
+def tenant_context(tenant):
+    """Route the session to ``tenant``'s database inside the block (background jobs, CLI)."""
+    previous = db.session.info.get("tenant", DEFAULT_TENANT)
+    # Whatever the session holds belongs to the previous tenant's database.
+    db.session.close()
+    db.session.info["tenant"] = tenant
+    try:
+        yield
+    finally:
+        db.session.close()
+        db.session.info["tenant"] = previous
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(database_url, config):
+    """Pool settings for ``database_url``; in-memory SQLite keeps its single-connection pool."""
+    url = make_url(database_url)
+    if _is_memory_sqlite(url):
+        return {}
+    options = {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+    }
+    if url.get_backend_name() != "sqlite":
+        # Server connections get dropped by proxies and failovers; files do not.
+        options["pool_recycle"] = config["DB_POOL_RECYCLE"]
+        options["pool_pre_ping"] = config["DB_POOL_PRE_PING"]
+    return options
+
+
+def _sqlite_pragmas(busy_timeout_ms, synchronous, wal):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.close()
+    return on_connect
+
+
+def apply_sqlite_pragmas(engine, config):
+    """Run the connection pragmas from ``config`` on every new connection of a SQLite ``engine``."""
+    synchronous = config["SQLITE_SYNCHRONOUS"].upper()
+    if synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+        raise ValueError(f"Unsupported SQLITE_SYNCHRONOUS value: {synchronous}")
+    event.listen(engine, "connect", _sqlite_pragmas(
+        config["SQLITE_BUSY_TIMEOUT_MS"], synchronous, wal=not _is_memory_sqlite(engine.url)))
+
+
+def configure_engines(app):
+    """Apply connection pragmas to every SQLite engine created by ``db.init_app``."""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.url.get_backend_name() == "sqlite":
+                apply_sqlite_pragmas(engine, app.config)
+
 
-db = SQLAlchemy()
+def pool_stats():
+    """Connections in use and idle per bind (``default`` is the primary)."""
+    stats = {}
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        stats[key or "default"] = {
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "idle": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        }
+    return stats
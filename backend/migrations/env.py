@@ -0,0 +1,23 @@
+"""Alembic environment for ``utils.migrations``: runs on the connection it is handed.
+
+``flask --app app init-db`` upgrades every tenant's database through here, and
+``flask --app app db-revision`` autogenerates a new revision against the
+default one; there is no alembic.ini.
+"""
+from alembic import context
+
+from extensions import db
+from utils.migrations import include_object
+
+config = context.config
+
+context.configure(
+    connection=config.attributes["connection"],
+    target_metadata=db.metadata,
+    include_object=include_object,
+    # SQLite cannot alter columns or constraints in place; batch operations rebuild the table.
+    render_as_batch=True,
+    compare_type=True,
+)
+with context.begin_transaction():
+    context.run_migrations()
@@ -0,0 +1,66 @@
+"""baseline: users, admins and email codes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_table
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not has_table("user"):
+        op.create_table(
+            "user",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("profile_picture_url", sa.String(255)),
+            sa.Column("first_name", sa.String(80), nullable=False),
+            sa.Column("last_name", sa.String(80), nullable=False),
+            sa.Column("email", sa.String(120), nullable=False),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("mobile_number", sa.String(32)),
+            sa.Column("role", sa.String(50), nullable=False),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("is_verified", sa.Boolean),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+        op.create_index("ix_user_email", "user", ["email"], unique=True)
+    if not has_table("admin"):
+        op.create_table(
+            "admin",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("email", sa.String(120), nullable=False),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("first_name", sa.String(80), nullable=False),
+            sa.Column("last_name", sa.String(80), nullable=False),
+            sa.Column("is_active", sa.Boolean),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+        op.create_index("ix_admin_email", "admin", ["email"], unique=True)
+    if not has_table("email_otp"):
+        op.create_table(
+            "email_otp",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("email", sa.String(120), nullable=False),
+            sa.Column("otp_code", sa.String(6), nullable=False),
+            sa.Column("purpose", sa.String(32), nullable=False),
+            sa.Column("is_used", sa.Boolean),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("expires_at", sa.DateTime, nullable=False),
+        )
+        op.create_index("ix_email_otp_email", "email_otp", ["email"])
+
+
+def downgrade():
+    op.drop_table("email_otp")
+    op.drop_table("admin")
+    op.drop_table("user")
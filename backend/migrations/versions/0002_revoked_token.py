@@ -0,0 +1,34 @@
+"""revoked_token: revocations shared by every worker
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_table
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if has_table("revoked_token"):
+        return
+    op.create_table(
+        "revoked_token",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("jti", sa.String(64), nullable=False),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+        sa.Column("revoked_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_revoked_token_jti", "revoked_token", ["jti"], unique=True)
+    op.create_index("ix_revoked_token_expires_at", "revoked_token", ["expires_at"])
+    op.create_index("ix_revoked_token_revoked_at", "revoked_token", ["revoked_at"])
+
+
+def downgrade():
+    op.drop_table("revoked_token")
@@ -0,0 +1,23 @@
+"""user list keyset pagination index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+from utils.migrations import has_index
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not has_index("user", "ix_user_created_at_id"):
+        op.create_index("ix_user_created_at_id", "user", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_user_created_at_id", "user")
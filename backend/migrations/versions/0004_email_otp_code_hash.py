@@ -0,0 +1,50 @@
+"""email_otp: HMAC digests and one live code per email and purpose
+
+Plaintext codes cannot be turned into digests without the app's key, and
+older tables may hold several codes per email and purpose, so codes pending
+at upgrade time are discarded; they live 30 minutes and can be requested
+again.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_column, has_index
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if (has_column("email_otp", "code_hash") and not has_column("email_otp", "otp_code")
+            and has_index("email_otp", "uq_email_otp_email_purpose")):
+        if not has_index("email_otp", "ix_email_otp_expires_at"):
+            op.create_index("ix_email_otp_expires_at", "email_otp", ["expires_at"])
+        return
+    op.execute(sa.text("DELETE FROM email_otp"))
+    with op.batch_alter_table("email_otp", recreate="always") as batch:
+        if has_index("email_otp", "ix_email_otp_email"):
+            batch.drop_index("ix_email_otp_email")
+        if has_column("email_otp", "otp_code"):
+            batch.drop_column("otp_code")
+        if not has_column("email_otp", "code_hash"):
+            batch.add_column(sa.Column("code_hash", sa.String(64), nullable=False))
+        if not has_index("email_otp", "uq_email_otp_email_purpose"):
+            batch.create_unique_constraint("uq_email_otp_email_purpose", ["email", "purpose"])
+        if not has_index("email_otp", "ix_email_otp_expires_at"):
+            batch.create_index("ix_email_otp_expires_at", ["expires_at"])
+
+
+def downgrade():
+    op.execute(sa.text("DELETE FROM email_otp"))
+    with op.batch_alter_table("email_otp", recreate="always") as batch:
+        batch.drop_index("ix_email_otp_expires_at")
+        batch.drop_constraint("uq_email_otp_email_purpose", type_="unique")
+        batch.drop_column("code_hash")
+        batch.add_column(sa.Column("otp_code", sa.String(6), nullable=False))
+        batch.create_index("ix_email_otp_email", ["email"])
@@ -0,0 +1,42 @@
+"""refresh_session: server-side refresh token families
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_table
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if has_table("refresh_session"):
+        return
+    op.create_table(
+        "refresh_session",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("family", sa.String(32), nullable=False),
+        sa.Column("subject_type", sa.String(8), nullable=False),
+        sa.Column("subject_id", sa.Integer, nullable=False),
+        sa.Column("role", sa.String(50), nullable=False),
+        sa.Column("refresh_jti", sa.String(36), nullable=False),
+        sa.Column("previous_jti", sa.String(36)),
+        sa.Column("access_jti", sa.String(36), nullable=False),
+        sa.Column("access_expires_at", sa.DateTime, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("rotated_at", sa.DateTime, nullable=False),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_refresh_session_family", "refresh_session", ["family"], unique=True)
+    op.create_index("ix_refresh_session_expires_at", "refresh_session", ["expires_at"])
+    op.create_index("ix_refresh_session_subject", "refresh_session", ["subject_type", "subject_id"])
+
+
+def downgrade():
+    op.drop_table("refresh_session")
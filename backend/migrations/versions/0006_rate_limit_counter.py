@@ -0,0 +1,37 @@
+"""rate_limit_counter: sliding-window counters shared by every worker
+
+Shared by all tenants, so only the default tenant's database has it.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_table, is_default_tenant
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not is_default_tenant() or has_table("rate_limit_counter"):
+        return
+    op.create_table(
+        "rate_limit_counter",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("key", sa.String(191), nullable=False),
+        sa.Column("window_index", sa.Integer, nullable=False),
+        sa.Column("count", sa.Integer, nullable=False),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+        sa.UniqueConstraint("key", "window_index", name="uq_rate_limit_counter_key_window"),
+    )
+    op.create_index("ix_rate_limit_counter_expires_at", "rate_limit_counter", ["expires_at"])
+
+
+def downgrade():
+    if is_default_tenant():
+        op.drop_table("rate_limit_counter")
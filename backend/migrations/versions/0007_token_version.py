@@ -0,0 +1,28 @@
+"""token_version on users and admins
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_column
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ("user", "admin"):
+        if not has_column(table, "token_version"):
+            # The server default fills existing rows, so the column can be NOT NULL straight away.
+            op.add_column(table, sa.Column("token_version", sa.Integer, nullable=False, server_default="0"))
+
+
+def downgrade():
+    for table in ("user", "admin"):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("token_version")
@@ -0,0 +1,41 @@
+"""auth_event: append-only audit trail
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_table
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if has_table("auth_event"):
+        return
+    op.create_table(
+        "auth_event",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+        sa.Column("event_type", sa.String(40), nullable=False),
+        sa.Column("success", sa.Boolean, nullable=False),
+        sa.Column("subject_type", sa.String(10)),
+        sa.Column("subject_id", sa.Integer),
+        sa.Column("email", sa.String(120)),
+        sa.Column("actor_id", sa.Integer),
+        sa.Column("ip", sa.String(45)),
+        sa.Column("detail", sa.Text),
+    )
+    op.create_index("ix_auth_event_created_at", "auth_event", ["created_at"])
+    op.create_index("ix_auth_event_subject_created", "auth_event", ["subject_type", "subject_id", "created_at"])
+    op.create_index("ix_auth_event_email_created", "auth_event", ["email", "created_at"])
+    op.create_index("ix_auth_event_type_created", "auth_event", ["event_type", "created_at"])
+
+
+def downgrade():
+    op.drop_table("auth_event")
@@ -0,0 +1,38 @@
+"""job_lease: which process runs each housekeeping job
+
+Shared by all tenants, so only the default tenant's database has it.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_table, is_default_tenant
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not is_default_tenant() or has_table("job_lease"):
+        return
+    op.create_table(
+        "job_lease",
+        sa.Column("name", sa.String(120), primary_key=True),
+        sa.Column("owner", sa.String(120), nullable=False),
+        sa.Column("leased_until", sa.DateTime, nullable=False),
+        sa.Column("last_finished_at", sa.DateTime),
+        sa.Column("last_duration_ms", sa.Integer),
+        sa.Column("last_processed", sa.Integer),
+        sa.Column("backlog", sa.Boolean, nullable=False),
+        sa.Column("last_error", sa.String(255)),
+    )
+
+
+def downgrade():
+    if is_default_tenant():
+        op.drop_table("job_lease")
@@ -0,0 +1,36 @@
+"""user list filters and the upload orphan sweep
+
+Each index is built in one statement, which blocks writes to ``user`` on most
+databases while it runs; on a large table upgrade outside peak hours.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from utils.migrations import has_index
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+HAS_PICTURE = "profile_picture_url IS NOT NULL"
+
+
+def upgrade():
+    if not has_index("user", "ix_user_role_created_at_id"):
+        op.create_index("ix_user_role_created_at_id", "user", ["role", "created_at", "id"])
+    if not has_index("user", "ix_user_is_active_created_at_id"):
+        op.create_index("ix_user_is_active_created_at_id", "user", ["is_active", "created_at", "id"])
+    if not has_index("user", "ix_user_profile_picture_url"):
+        op.create_index("ix_user_profile_picture_url", "user", ["profile_picture_url"],
+                        sqlite_where=sa.text(HAS_PICTURE), postgresql_where=sa.text(HAS_PICTURE))
+
+
+def downgrade():
+    op.drop_index("ix_user_profile_picture_url", "user")
+    op.drop_index("ix_user_is_active_created_at_id", "user")
+    op.drop_index("ix_user_role_created_at_id", "user")
@@ -1,10 +1,23 @@
 
 from datetime import datetime
 from extensions import db
-from passlib.hash import pbkdf2_sha256
+from utils.hashing import hash_password, verify_password
+from utils.metrics import span
 
 
 class User(db.Model):
+    __table_args__ = (
+        # Keyset pagination for the admin user list walks this index.
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+        # The same walk when the list is filtered by role or status.
+        db.Index('ix_user_role_created_at_id', 'role', 'created_at', 'id'),
+        db.Index('ix_user_is_active_created_at_id', 'is_active', 'created_at', 'id'),
+        # Only users with a picture, for the upload orphan sweep.
+        db.Index('ix_user_profile_picture_url', 'profile_picture_url',
+                 sqlite_where=db.text('profile_picture_url IS NOT NULL'),
+                 postgresql_where=db.text('profile_picture_url IS NOT NULL')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     profile_picture_url = db.Column(db.String(255))
     first_name = db.Column(db.String(80), nullable=False)
@@ -15,14 +28,22 @@ class User(db.Model):
     role = db.Column(db.String(50), default='USER', nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=True)
+    # Copied into the ``ver`` claim; bumping it rejects every token issued before.
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = pbkdf2_sha256.hash(password)
+        with span("set_password"):
+            self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return pbkdf2_sha256.verify(password, self.password_hash)
+        with span("check_password"):
+            ok, new_hash = verify_password(password, self.password_hash)
+        if ok and new_hash:
+            # Rehash on login: the caller commits the upgraded hash.
+            self.password_hash = new_hash
+        return ok
 
 
 class Admin(db.Model):
@@ -32,21 +53,113 @@ class Admin(db.Model):
     first_name = db.Column(db.String(80), nullable=False)
     last_name = db.Column(db.String(80), nullable=False)
     is_active = db.Column(db.Boolean, default=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = pbkdf2_sha256.hash(password)
+        with span("set_password"):
+            self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return pbkdf2_sha256.verify(password, self.password_hash)
+        with span("check_password"):
+            ok, new_hash = verify_password(password, self.password_hash)
+        if ok and new_hash:
+            # Rehash on login: the caller commits the upgraded hash.
+            self.password_hash = new_hash
+        return ok
 
 
 class EmailOTP(db.Model):
+    __table_args__ = (
+        # One live code per (email, purpose): lookups hit this key and reissuing upserts it.
+        db.UniqueConstraint('email', 'purpose', name='uq_email_otp_email_purpose'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), nullable=False, index=True)
-    otp_code = db.Column(db.String(6), nullable=False)
+    email = db.Column(db.String(120), nullable=False)
+    code_hash = db.Column(db.String(64), nullable=False)  # HMAC-SHA256 hex digest
     purpose = db.Column(db.String(32), nullable=False)  # e.g., register
     is_used = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class RevokedToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class RefreshSession(db.Model):
+    """One row per login: the refresh-token family and the only refresh JTI that may still be exchanged."""
+    __table_args__ = (
+        # Revoking every session of one account walks this index.
+        db.Index('ix_refresh_session_subject', 'subject_type', 'subject_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    family = db.Column(db.String(32), unique=True, nullable=False, index=True)
+    subject_type = db.Column(db.String(8), nullable=False)  # user or admin
+    subject_id = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(50), nullable=False)
+    refresh_jti = db.Column(db.String(36), nullable=False)
+    previous_jti = db.Column(db.String(36))  # tolerated briefly after a rotation, see REFRESH_REUSE_GRACE_SECONDS
+    access_jti = db.Column(db.String(36), nullable=False)  # latest access token, revoked with the session
+    access_expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    rotated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # set to now when revoked
+
+
+class RateLimitCounter(db.Model):
+    __table_args__ = (
+        # Every hit upserts and reads by this key.
+        db.UniqueConstraint('key', 'window_index', name='uq_rate_limit_counter_key_window'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(191), nullable=False)  # limit key plus window length
+    window_index = db.Column(db.Integer, nullable=False)  # epoch seconds // window length
+    count = db.Column(db.Integer, default=0, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class AuthEvent(db.Model):
+    """Append-only audit trail written in batches by utils.audit."""
+
+    __table_args__ = (
+        # The admin event search filters on one of these and walks newest first.
+        db.Index('ix_auth_event_subject_created', 'subject_type', 'subject_id', 'created_at'),
+        db.Index('ix_auth_event_email_created', 'email', 'created_at'),
+        db.Index('ix_auth_event_type_created', 'event_type', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    event_type = db.Column(db.String(40), nullable=False)  # e.g. login, otp_verify, user_update
+    success = db.Column(db.Boolean, nullable=False)
+    subject_type = db.Column(db.String(10))  # user or admin the event is about
+    subject_id = db.Column(db.Integer)
+    email = db.Column(db.String(120))
+    actor_id = db.Column(db.Integer)  # admin who made the change, for admin actions
+    ip = db.Column(db.String(45))
+    detail = db.Column(db.Text)  # JSON object
+
+
+class JobLease(db.Model):
+    """Which process may run a maintenance job, and how its last run went (see utils.maintenance)."""
+
+    name = db.Column(db.String(120), primary_key=True)  # job name, plus @host for node-scoped jobs
+    owner = db.Column(db.String(120), nullable=False)  # host:pid:nonce of the holder
+    leased_until = db.Column(db.DateTime, nullable=False)
+    last_finished_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Integer)
+    last_processed = db.Column(db.Integer)
+    backlog = db.Column(db.Boolean, default=False, nullable=False)
+    last_error = db.Column(db.String(255))
+
+
+# Shared by every tenant and kept only in the default database; see utils.tenants.
+GLOBAL_TABLES = frozenset({RateLimitCounter.__tablename__, JobLease.__tablename__})
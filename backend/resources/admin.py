@@ -1,15 +1,32 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timezone
 
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.exc import IntegrityError
 
-from extensions import db
-from models import User, EmailOTP
-from utils.otp import generate_otp, otp_expiry
-from utils.emailer import send_email
+from extensions import DEFAULT_TENANT, current_tenant, db, replica_reads
+from models import AuthEvent, User
+from utils.audit import get_audit_log, record
+from utils.cache import invalidate_profile
+from utils.otp import generate_otp, issue_otp, otp_row, upsert_otps
+from utils.emailer import queue_email
+from utils.mail_queue import get_dispatcher
+from utils.maintenance import get_tasks
+from utils.sessions import revoke_subject_sessions
+from utils.hashing import HashingUnavailable, hash_passwords
+from utils.identity import bump_token_version, invalidate_identity
+from utils.search import SearchUnavailable, search_terms, search_user_ids
+from utils.serialization import DEFAULT_USER_FIELDS, USER_FIELDS, encode, row_serializer, serialize_user
 
 api = Namespace('admin', description='Admin user management')
 
+# Documents the response shape in Swagger; responses are built by utils.serialization.
 user_model = api.model('User', {
     'id': fields.Integer(readonly=True),
     'profilePictureUrl': fields.String(attribute='profile_picture_url'),
@@ -33,6 +50,187 @@ create_user_model = api.model('CreateUser', {
 })
 
 
+# Columns selectable through ?fields=; the list endpoint reads these directly
+# instead of loading ORM objects.
+USER_COLUMNS = {name: getattr(User, attribute) for name, attribute in USER_FIELDS.items()}
+BULK_MAX_ROWS = 10000
+BULK_CHUNK_SIZE = 500
+# Fields UserItem.put accepts; audit events list which ones a request changed (never their values).
+USER_EDITABLE = ('profilePictureUrl', 'firstName', 'lastName', 'mobileNumber', 'role', 'isActive', 'isVerified',
+                 'password')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 1000
+SEARCH_MAX_OFFSET = 1000  # search is for finding someone, not paging through everyone
+
+events_parser = api.parser()
+events_parser.add_argument('subject_type', type=str, location='args', help='user or admin')
+events_parser.add_argument('subject_id', type=int, location='args')
+events_parser.add_argument('email', type=str, location='args')
+events_parser.add_argument('type', type=str, location='args', help='Event type, e.g. login or user_update')
+events_parser.add_argument('since', type=str, location='args', help='ISO 8601 time, UTC unless it has an offset; inclusive')
+events_parser.add_argument('until', type=str, location='args', help='ISO 8601 time, UTC unless it has an offset; exclusive')
+events_parser.add_argument('limit', type=int, location='args', help=f'Page size (max {MAX_PAGE_SIZE})')
+events_parser.add_argument('cursor', type=str, location='args', help='nextCursor from the previous page')
+
+EVENT_COLUMNS = (AuthEvent.event_type, AuthEvent.success, AuthEvent.subject_type, AuthEvent.subject_id,
+                 AuthEvent.email, AuthEvent.actor_id, AuthEvent.ip, AuthEvent.detail,
+                 AuthEvent.created_at, AuthEvent.id)
+
+users_list_parser = api.parser()
+users_list_parser.add_argument('limit', type=int, location='args', help=f'Page size (max {MAX_PAGE_SIZE})')
+users_list_parser.add_argument('cursor', type=str, location='args', help='nextCursor from the previous page')
+users_list_parser.add_argument('role', type=str, location='args')
+users_list_parser.add_argument('is_active', type=str, location='args')
+users_list_parser.add_argument('is_verified', type=str, location='args')
+users_list_parser.add_argument('email_prefix', type=str, location='args')
+users_list_parser.add_argument('fields', type=str, location='args', help='Comma separated field names')
+users_list_parser.add_argument('format', type=str, location='args', help='json (default) or ndjson for a full export')
+
+users_search_parser = api.parser()
+users_search_parser.add_argument('q', type=str, location='args', required=True,
+                                 help='Part of a name, email or mobile number (terms of 3+ characters)')
+users_search_parser.add_argument('limit', type=int, location='args', help=f'Page size (max {MAX_PAGE_SIZE})')
+users_search_parser.add_argument('offset', type=int, location='args', help='nextOffset from the previous page')
+users_search_parser.add_argument('fields', type=str, location='args', help='Comma separated field names')
+
+
+def encode_cursor(created_at, user_id):
+    raw = json.dumps([created_at.isoformat() if created_at else None, user_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(user_id)
+    except (ValueError, TypeError):
+        api.abort(400, 'Invalid cursor')
+
+
+def parse_bool(value, name):
+    if value is None or value == '':
+        return None
+    lowered = value.lower()
+    if lowered in ('true', '1', 'yes'):
+        return True
+    if lowered in ('false', '0', 'no'):
+        return False
+    api.abort(400, f"Invalid value for {name}; use true or false")
+
+
+def parse_fields(value):
+    if not value:
+        return DEFAULT_USER_FIELDS
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in USER_COLUMNS]
+    if unknown:
+        api.abort(400, f"Unknown fields: {', '.join(unknown)}")
+    return tuple(names)
+
+
+def build_users_query(args, names):
+    # created_at and id are always selected last: they drive the keyset cursor.
+    query = select(*(USER_COLUMNS[name] for name in names), User.created_at, User.id)
+
+    if args.get('role'):
+        query = query.where(User.role == args['role'])
+    is_active = parse_bool(args.get('is_active'), 'is_active')
+    if is_active is not None:
+        query = query.where(User.is_active == is_active)
+    is_verified = parse_bool(args.get('is_verified'), 'is_verified')
+    if is_verified is not None:
+        query = query.where(User.is_verified == is_verified)
+    if args.get('email_prefix'):
+        # A range rather than LIKE so the email index is used on every backend.
+        prefix = args['email_prefix'].strip().lower()
+        query = query.where(User.email >= prefix, User.email < prefix + '\uffff')
+
+    if args.get('cursor'):
+        created_at, user_id = decode_cursor(args['cursor'])
+        query = query.where(or_(
+            User.created_at < created_at,
+            and_(User.created_at == created_at, User.id < user_id),
+        ))
+    return query.order_by(User.created_at.desc(), User.id.desc())
+
+
+def parse_time(value, name):
+    """ISO 8601 time as the naive UTC datetime stored in ``created_at``; times with an offset are converted."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        api.abort(400, f"Invalid {name}; use an ISO 8601 time")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def build_events_query(args):
+    query = select(*EVENT_COLUMNS)
+    if args.get('subject_id') is not None:
+        query = query.where(AuthEvent.subject_type == (args.get('subject_type') or 'user'),
+                            AuthEvent.subject_id == args['subject_id'])
+    elif args.get('subject_type'):
+        query = query.where(AuthEvent.subject_type == args['subject_type'])
+    if args.get('email'):
+        query = query.where(AuthEvent.email == args['email'].strip().lower())
+    if args.get('type'):
+        query = query.where(AuthEvent.event_type == args['type'])
+    if args.get('since'):
+        query = query.where(AuthEvent.created_at >= parse_time(args['since'], 'since'))
+    if args.get('until'):
+        query = query.where(AuthEvent.created_at < parse_time(args['until'], 'until'))
+    if args.get('cursor'):
+        created_at, event_id = decode_cursor(args['cursor'])
+        query = query.where(or_(
+            AuthEvent.created_at < created_at,
+            and_(AuthEvent.created_at == created_at, AuthEvent.id < event_id),
+        ))
+    return query.order_by(AuthEvent.created_at.desc(), AuthEvent.id.desc())
+
+
+def event_to_dict(row):
+    return {
+        'id': row.id,
+        'type': row.event_type,
+        'success': row.success,
+        'subjectType': row.subject_type,
+        'subjectId': row.subject_id,
+        'email': row.email,
+        'actorId': row.actor_id,
+        'ip': row.ip,
+        'detail': json.loads(row.detail) if row.detail else None,
+        'createdAt': row.created_at.isoformat(),
+    }
+
+
+def verification_email(first_name, last_name, otp_code):
+    subject = "Account Verification - Galvan AI"
+    body = f"""
+        Hello {first_name} {last_name},
+        
+        Your account has been created by an administrator. Please verify your email address using the OTP below:
+        
+        Verification Code: {otp_code}
+        
+        This code will expire in 30 minutes.
+        
+        If you did not request this account, please contact support.
+        
+        Best regards,
+        Galvan AI Team
+        """
+    return subject, body
+
+
+def audit(event_type, **fields):
+    """Record an admin action on a user account, attributed to the calling admin."""
+    fields.setdefault('subject_type', 'user')
+    record(event_type, actor_id=int(get_jwt_identity()), **fields)
+
+
 def require_admin():
     # Read role/type from JWT custom claims populated at login
     claims = get_jwt()
@@ -40,85 +238,292 @@ def require_admin():
         api.abort(403, 'Admin access required')
 
 
+def require_operator():
+    # Mail and jobs serve every tenant; only the default tenant's admins run the deployment.
+    require_admin()
+    if current_tenant() != DEFAULT_TENANT:
+        api.abort(403, 'Only admins of the default tenant can manage the deployment')
+
+
+class UsersPage:
+    """One JSON page of GET /users, split like ``resources.auth.LoginAttempt``.
+
+    ``UsersList.get`` calls ``run_sync`` between ``begin`` and ``finish``;
+    asgi.py awaits ``run`` on the event loop. NDJSON exports stream from the
+    WSGI view, so asgi.py sends them there.
+    """
+
+    replica = True
+
+    def begin(self):
+        verify_jwt_in_request()
+        require_admin()
+        args = users_list_parser.parse_args()
+        self.names = parse_fields(args.get('fields'))
+        self.query = build_users_query(args, self.names)
+        if args.get('format') == 'ndjson':
+            return export_users(self.query, self.names, args.get('limit'))
+        self.limit = min(max(args.get('limit') or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        return None
+
+    def statement(self):
+        # One extra row tells us whether another page exists.
+        return self.query.limit(self.limit + 1)
+
+    async def run(self, session):
+        return (await session.execute(self.statement())).all()
+
+    def run_sync(self):
+        return db.session.execute(self.statement()).all()
+
+    def finish(self, rows):
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+        serialize = row_serializer(self.names)
+        body = encode({'items': [serialize(row) for row in rows], 'nextCursor': next_cursor})
+        return Response(body, mimetype='application/json')
+
+
+def export_users(query, names, limit=None):
+    if limit:
+        query = query.limit(limit)
+    serialize = row_serializer(names)
+    rows = db.session.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+    def generate():
+        try:
+            for row in rows:
+                yield encode(serialize(row)) + b'\n'
+        finally:
+            rows.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 class UsersList(Resource):
-    @jwt_required()
+    @api.expect(users_list_parser)
+    @replica_reads
     def get(self):
-        require_admin()
-        users = User.query.order_by(User.created_at.desc()).all()
-        return api.marshal(users, user_model), 200
+        """List users newest first, one keyset page at a time (or all as NDJSON)"""
+        page = UsersPage()  # begin checks the token
+        return page.begin() or page.finish(page.run_sync())
 
     @jwt_required()
     @api.expect(create_user_model, validate=True)
     def post(self):
         require_admin()
         data = request.json
-        if User.query.filter_by(email=data['email']).first():
+        # Stored lowercased, as bulk creation does and logins look emails up.
+        email = data['email'].strip().lower()
+        if '@' not in email:
+            api.abort(400, 'Invalid email format')
+        if User.query.filter_by(email=email).first():
             api.abort(400, 'Email already exists')
 
         user = User(
             profile_picture_url=data.get('profilePictureUrl'),
             first_name=data['firstName'],
             last_name=data['lastName'],
-            email=data['email'],
+            email=email,
             mobile_number=data.get('mobileNumber'),
             role=data.get('role', 'USER'),
             is_verified=False,  # Start as unverified
         )
-        user.set_password(data['password'])
+        try:
+            user.set_password(data['password'])
+        except HashingUnavailable:
+            api.abort(503, 'Server busy, please retry')
         db.session.add(user)
         db.session.flush()  # Get the user ID
-        print(f"Created user {data['email']} with ID {user.id}, is_verified: {user.is_verified}")
         
         # Generate and send OTP for verification
-        otp_code = generate_otp()
-        print(f"Generated OTP {otp_code} for user {data['email']}")
-        otp = EmailOTP(
-            email=data['email'],
-            otp_code=otp_code,
-            purpose='admin_verification',
-            expires_at=otp_expiry(30)  # 30 minutes expiry
-        )
-        db.session.add(otp)
+        otp_code = issue_otp(email, 'admin_verification', 30)  # 30 minutes expiry
         db.session.commit()
-        print(f"OTP record created for {data['email']}")
+        # SQLite reuses the id of the newest deleted user, whose cached status says "missing".
+        invalidate_identity('user', user.id)
+        audit('user_create', subject_id=user.id, email=email)
         
         # Send verification email
-        email_subject = "Account Verification - Galvan AI"
-        email_body = f"""
-        Hello {data['firstName']} {data['lastName']},
+        email_subject, email_body = verification_email(data['firstName'], data['lastName'], otp_code)
         
-        Your account has been created by an administrator. Please verify your email address using the OTP below:
-        
-        Verification Code: {otp_code}
-        
-        This code will expire in 30 minutes.
-        
-        If you did not request this account, please contact support.
-        
-        Best regards,
-        Galvan AI Team
-        """
+        queue_email(email, email_subject, email_body)
         
+        return serialize_user(user), 201
+
+
+def read_bulk_rows():
+    """Rows from a JSON list, {"users": [...]}, a text/csv body or an uploaded CSV file."""
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(text)))
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        api.abort(400, 'Expected a JSON list of users, {"users": [...]}, or CSV')
+    return data
+
+
+def validate_bulk_row(row):
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+    missing = [name for name in ('firstName', 'lastName', 'email', 'password') if not str(row.get(name) or '').strip()]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    email = str(row['email']).strip().lower()
+    if '@' not in email:
+        return None, 'Invalid email format'
+    return {
+        'profile_picture_url': row.get('profilePictureUrl') or None,
+        'first_name': str(row['firstName']).strip(),
+        'last_name': str(row['lastName']).strip(),
+        'email': email,
+        'mobile_number': row.get('mobileNumber') or None,
+        'role': str(row.get('role') or 'USER').strip(),
+        'is_verified': False,
+    }, None
+
+
+def existing_emails(emails):
+    found = set()
+    # Chunked to stay under database bound-parameter limits.
+    for i in range(0, len(emails), BULK_CHUNK_SIZE):
+        found.update(db.session.scalars(select(User.email).where(User.email.in_(emails[i:i + BULK_CHUNK_SIZE]))))
+    return found
+
+
+def insert_users(rows):
+    """Insert ``rows`` in one statement; returns the new ids in row order."""
+    if db.session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.session.execute(insert(User).returning(User.id, sort_by_parameter_order=True), rows).scalars().all()
+    # MySQL/MariaDB have no INSERT ... RETURNING; emails are unique, so read the ids back by email.
+    db.session.execute(insert(User), rows)
+    ids = dict(db.session.execute(
+        select(User.email, User.id).where(User.email.in_([row['email'] for row in rows]))).all())
+    return [ids[row['email']] for row in rows]
+
+
+class UsersSearch(Resource):
+    @jwt_required()
+    @api.expect(users_search_parser)
+    @replica_reads
+    def get(self):
+        """Find users by part of their name, email or mobile number, best match first"""
+        require_admin()
+        args = users_search_parser.parse_args()
+        names = parse_fields(args.get('fields'))
         try:
-            send_email(data['email'], email_subject, email_body)
-        except Exception as e:
-            print(f"Failed to send verification email: {e}")
-        
-        return api.marshal(user, user_model), 201
+            terms = search_terms(args['q'])
+        except ValueError as e:
+            api.abort(400, str(e))
+        limit = min(max(args.get('limit') or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        offset = min(max(args.get('offset') or 0, 0), SEARCH_MAX_OFFSET)
+        try:
+            ids = search_user_ids(terms, limit + 1, offset)
+        except SearchUnavailable as e:
+            api.abort(409, str(e))
+        next_offset = None
+        if len(ids) > limit:
+            ids = ids[:limit]
+            next_offset = offset + limit
+        # The index only yields ids; the rows come from the user table, in rank order.
+        rows = {row[-1]: row for row in db.session.execute(
+            select(*(USER_COLUMNS[name] for name in names), User.id).where(User.id.in_(ids)))}
+        serialize = row_serializer(names)
+        items = [serialize(rows[user_id]) for user_id in ids if user_id in rows]
+        return Response(encode({'items': items, 'nextOffset': next_offset}), mimetype='application/json')
+
+
+class UsersBulk(Resource):
+    @jwt_required()
+    def post(self):
+        """Create many users at once; returns a result per input row"""
+        require_admin()
+        rows = read_bulk_rows()
+        if len(rows) > BULK_MAX_ROWS:
+            api.abort(413, f'At most {BULK_MAX_ROWS} users per request')
+
+        results = [None] * len(rows)
+        pending = []  # (row index, user values, password)
+        seen = set()
+        for index, row in enumerate(rows):
+            values, error = validate_bulk_row(row)
+            if error is None and values['email'] in seen:
+                error = 'Duplicate email in request'
+            if error:
+                email = row.get('email') if isinstance(row, dict) else None
+                results[index] = {'row': index, 'email': email, 'status': 'error', 'message': error}
+                continue
+            seen.add(values['email'])
+            pending.append((index, values, str(row['password'])))
+
+        taken = existing_emails([values['email'] for _, values, _ in pending])
+        accepted = []
+        for index, values, password in pending:
+            if values['email'] in taken:
+                results[index] = {'row': index, 'email': values['email'], 'status': 'error', 'message': 'Email already exists'}
+            else:
+                accepted.append((index, values, password))
+
+        try:
+            hashes = hash_passwords([password for _, _, password in accepted])
+        except HashingUnavailable:
+            api.abort(503, 'Server busy, please retry')
+
+        emails_to_send = []
+        for start in range(0, len(accepted), BULK_CHUNK_SIZE):
+            chunk = accepted[start:start + BULK_CHUNK_SIZE]
+            user_rows = [dict(values, password_hash=hashes[start + i]) for i, (_, values, _) in enumerate(chunk)]
+            otp_codes = [generate_otp() for _ in chunk]
+            try:
+                created = insert_users(user_rows)
+                upsert_otps([
+                    otp_row(values['email'], 'admin_verification', code, 30)
+                    for (_, values, _), code in zip(chunk, otp_codes)
+                ])
+                db.session.commit()
+            except IntegrityError:
+                # Lost a race with another writer; report the chunk and carry on.
+                db.session.rollback()
+                for index, values, _ in chunk:
+                    results[index] = {'row': index, 'email': values['email'], 'status': 'error',
+                                      'message': 'Conflict while saving, please retry this row'}
+                continue
+            for (index, values, _), user_id, code in zip(chunk, created, otp_codes):
+                invalidate_identity('user', user_id)  # as in UsersList.post; cheap next to hashing the password
+                results[index] = {'row': index, 'email': values['email'], 'status': 'created', 'id': user_id}
+                emails_to_send.append((values['email'], *verification_email(values['first_name'], values['last_name'], code)))
+
+        for to_email, subject, body in emails_to_send:
+            queue_email(to_email, subject, body)
+
+        created_count = sum(1 for result in results if result['status'] == 'created')
+        audit('user_bulk_create', created=created_count, failed=len(results) - created_count)
+        return {
+            'created': created_count,
+            'failed': len(results) - created_count,
+            'results': results,
+        }, 200
 
 
 class UserItem(Resource):
     @jwt_required()
+    @replica_reads
     def get(self, user_id):
         require_admin()
         user = User.query.get_or_404(user_id)
-        return api.marshal(user, user_model), 200
+        return serialize_user(user), 200
 
     @jwt_required()
     def put(self, user_id):
         require_admin()
         user = User.query.get_or_404(user_id)
         data = request.json
+        role = user.role
         user.profile_picture_url = data.get('profilePictureUrl', user.profile_picture_url)
         user.first_name = data.get('firstName', user.first_name)
         user.last_name = data.get('lastName', user.last_name)
@@ -127,18 +532,101 @@ class UserItem(Resource):
         user.is_active = data.get('isActive', user.is_active)
         user.is_verified = data.get('isVerified', user.is_verified)
         if 'password' in data and data['password']:
-            user.set_password(data['password'])
+            try:
+                user.set_password(data['password'])
+            except HashingUnavailable:
+                api.abort(503, 'Server busy, please retry')
+        changed = sorted(name for name in USER_EDITABLE if name in data)
+        end_sessions = not user.is_active or bool(data.get('password'))
+        if end_sessions or user.role != role:
+            # Outstanding access tokens stop working; after a role change the
+            # next refresh issues one with the new role.
+            bump_token_version(user)
         db.session.commit()
-        return api.marshal(user, user_model), 200
+        invalidate_profile(user.id)
+        invalidate_identity('user', user.id)
+        audit('user_update', subject_id=user.id, email=user.email, fields=changed)
+        if end_sessions:
+            # Without this a refresh would just issue a token with the new version.
+            revoke_subject_sessions('user', user.id)
+        return serialize_user(user), 200
 
     @jwt_required()
     def delete(self, user_id):
         require_admin()
         user = User.query.get_or_404(user_id)
+        email = user.email
         db.session.delete(user)
         db.session.commit()
+        invalidate_profile(user_id)
+        invalidate_identity('user', user_id)
+        revoke_subject_sessions('user', user_id)
+        audit('user_delete', subject_id=user_id, email=email)
         return {"message": "Deleted"}, 200
 
 
+class UserSessions(Resource):
+    @jwt_required()
+    def delete(self, user_id):
+        """Sign the user out everywhere: revoke every refresh session and access token"""
+        require_admin()
+        user = User.query.get_or_404(user_id)
+        bump_token_version(user)  # every access token, not only the latest of each session
+        db.session.commit()
+        invalidate_identity('user', user_id)
+        revoked = revoke_subject_sessions('user', user_id)
+        audit('user_sessions_revoke', subject_id=user_id, email=user.email, revoked=revoked)
+        return {"revoked": revoked}, 200
+
+
+class AuthEvents(Resource):
+    @jwt_required()
+    @api.expect(events_parser)
+    @replica_reads
+    def get(self):
+        """Search auth events newest first by account, email, type and time range"""
+        require_admin()
+        if not get_audit_log().sink.searchable:
+            api.abort(409, 'Events are written to JSONL files; set AUDIT_SINK=sql to search them here')
+        args = events_parser.parse_args()
+        limit = min(max(args.get('limit') or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+        rows = db.session.execute(build_events_query(args).limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        return {'items': [event_to_dict(row) for row in rows], 'nextCursor': next_cursor}, 200
+
+
+class MailDeadLetters(Resource):
+    @jwt_required()
+    def get(self):
+        """Emails that exhausted their delivery attempts"""
+        require_operator()
+        return get_dispatcher().spool.dead_letters(), 200
+
+    @jwt_required()
+    def post(self):
+        """Put every dead-lettered email back in the queue"""
+        require_operator()
+        requeued = get_dispatcher().spool.retry_dead()
+        audit('mail_requeue', subject_type=None, requeued=requeued)
+        return {"requeued": requeued}, 200
+
+
+class Jobs(Resource):
+    @jwt_required()
+    def get(self):
+        """Background jobs: this worker's runs, and the last run anywhere for leased jobs"""
+        require_operator()
+        return get_tasks().status(), 200
+
+
 api.add_resource(UsersList, '/users')
+api.add_resource(UsersBulk, '/users/bulk')
+api.add_resource(UsersSearch, '/users/search')
 api.add_resource(UserItem, '/users/<int:user_id>')
+api.add_resource(UserSessions, '/users/<int:user_id>/sessions')
+api.add_resource(MailDeadLetters, '/mail/dead-letters')
+api.add_resource(AuthEvents, '/events')
+api.add_resource(Jobs, '/jobs')
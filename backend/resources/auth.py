@@ -1,20 +1,32 @@
 
 import os
-from flask import request, make_response
+from datetime import timezone
+
+from flask import Response, request, make_response
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import (
-    create_access_token,
-    create_refresh_token,
     jwt_required,
     get_jwt_identity,
     get_jwt,
+    current_user,
     set_access_cookies,
     set_refresh_cookies,
     unset_jwt_cookies,
+    verify_jwt_in_request,
 )
+from sqlalchemy import select, update
 
 from extensions import db
-from models import User, Admin, EmailOTP  # EmailOTP kept if you use it elsewhere
+from models import User, Admin
+from utils.audit import record
+from utils.cache import get_profile_cache, invalidate_profile, profile_key
+from utils.hashing import HashingUnavailable, verify_password, verify_password_async
+from utils.metrics import span
+from utils.otp import verify_otp
+from utils.ratelimit import get_limiter
+from utils.revocation import get_store as get_revocation_store
+from utils.serialization import PROFILE_FIELDS, USER_FIELDS, encode, row_serializer
+from utils.sessions import end_session, rotate_session, start_session
 
 api = Namespace('auth', description='Authentication endpoints')
 
@@ -25,106 +37,172 @@ login_model = api.model('Login', {
 })
 
 
+def login_error(error):
+    """Response for an exception raised by a ``LoginAttempt``."""
+    if isinstance(error, HashingUnavailable):
+        return {"message": "Server busy, please retry"}, 503, {"Retry-After": "1"}  # as the app-wide handler
+    return {"message": f"Server error: {str(error)}"}, 500
+
+
+class LoginAttempt:
+    """One admin or user login, split around its database work and the password check.
+
+    ``begin`` validates the request, ``run`` looks the account up, checks the
+    password and stores an upgraded hash, and ``finish`` starts the session.
+    The views below call ``run_sync`` between the other two; asgi.py awaits
+    ``run`` on the event loop with an ``AsyncSession``, so there a login holds
+    no thread while it waits on the database and no connection while PBKDF2 runs.
+    """
+
+    replica = False
+    error = staticmethod(login_error)
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.model = Admin if kind == 'admin' else User
+        self.email = self.password = None
+
+    def begin(self):
+        """A response to send straight away, or None once the account can be looked up."""
+        data = request.get_json()
+        if not data:
+            return {"message": "No JSON data provided"}, 400
+
+        self.email = (data.get('email') or '').strip().lower()
+        self.password = data.get('password', '')
+
+        if not self.email or '@' not in self.email:
+            return {"message": "Invalid email format"}, 400
+
+        # Checked before the lookup so brute-force traffic never reaches PBKDF2.
+        retry_after = get_limiter().login_blocked(self.kind, self.email)
+        if retry_after:
+            record('login', success=False, subject_type=self.kind, email=self.email, reason='rate_limited')
+            return {"message": "Too many failed attempts, please retry later"}, 429, {"Retry-After": str(retry_after)}
+        return None
+
+    def statement(self):
+        model = self.model
+        columns = [model.id, model.password_hash, model.token_version]
+        if model is User:
+            columns += [User.role, User.is_verified]
+        return select(*columns).filter_by(email=self.email, is_active=True)
+
+    def rehash(self, account, new_hash):
+        # Rehash on login, onto the current profile.
+        return update(self.model).where(self.model.id == account.id).values(password_hash=new_hash)
+
+    def check_password(self, password_hash):
+        with span("check_password"):
+            return verify_password(self.password, password_hash)
+
+    async def check_password_async(self, password_hash):
+        with span("check_password"):
+            return await verify_password_async(self.password, password_hash)
+
+    async def run(self, session):
+        """The account row (None if there is no active one) and whether the password matched."""
+        account = (await session.execute(self.statement())).first()
+        if account is None:
+            return None, False
+        await session.rollback()  # hand the connection back while the password is checked
+        ok, new_hash = await self.check_password_async(account.password_hash)
+        if ok and new_hash:
+            await session.execute(self.rehash(account, new_hash))
+            await session.commit()
+        return account, ok
+
+    def run_sync(self):
+        account = db.session.execute(self.statement()).first()
+        if account is None:
+            return None, False
+        ok, new_hash = self.check_password(account.password_hash)
+        if ok and new_hash:
+            db.session.execute(self.rehash(account, new_hash))
+            db.session.commit()
+        return account, ok
+
+    def finish(self, result):
+        """Start the session for the ``run`` result if the password matched."""
+        account, ok = result
+        if not ok:
+            return self._rejected()
+        get_limiter().login_succeeded(self.kind, self.email)
+        if self.kind == 'user' and not account.is_verified:
+            record('login', success=False, subject_type='user', subject_id=account.id, email=self.email,
+                   reason='not_verified')
+            return {"message": "Account not verified"}, 403
+
+        role = 'ADMIN' if self.kind == 'admin' else account.role
+        access_token, refresh_token = start_session(self.kind, account.id, role, account.token_version)
+        record('login', subject_type=self.kind, subject_id=account.id, email=self.email)
+
+        # Build a Response and return it directly (no tuple)
+        resp = make_response({
+            "accessToken": access_token,
+            "refreshToken": refresh_token,
+            "role": role,
+            "type": self.kind,
+        })
+        resp.status_code = 200
+        set_access_cookies(resp, access_token)
+        set_refresh_cookies(resp, refresh_token)
+        return resp
+
+    def _rejected(self):
+        get_limiter().login_failed(self.kind, self.email)
+        record('login', success=False, subject_type=self.kind, email=self.email, reason='invalid_credentials')
+        return {"message": f"Invalid {self.kind} credentials"}, 401
+
+
+def login(kind):
+    attempt = LoginAttempt(kind)
+    try:
+        return attempt.begin() or attempt.finish(attempt.run_sync())
+    except Exception as e:
+        return login_error(e)
+
+
 class AdminLogin(Resource):
     @api.expect(login_model, validate=False)
     def post(self):
-        try:
-            data = request.get_json()
-            if not data:
-                return {"message": "No JSON data provided"}, 400
-
-            email = (data.get('email') or '').strip().lower()
-            password = data.get('password', '')
-
-            if not email or '@' not in email:
-                return {"message": "Invalid email format"}, 400
-
-            admin = Admin.query.filter_by(email=email, is_active=True).first()
-            if not admin or not admin.check_password(password):
-                return {"message": "Invalid admin credentials"}, 401
-
-            identity = str(admin.id)
-            claims = {"role": "ADMIN", "type": "admin"}
-
-            access_token = create_access_token(identity=identity, additional_claims=claims)
-            refresh_token = create_refresh_token(identity=identity, additional_claims=claims)
-
-            # Build a Response and return it directly (no tuple)
-            resp = make_response({
-                "accessToken": access_token,
-                "refreshToken": refresh_token,
-                "role": "ADMIN",
-                "type": "admin",
-            })
-            resp.status_code = 200
-            set_access_cookies(resp, access_token)
-            set_refresh_cookies(resp, refresh_token)
-            return resp
-        except Exception as e:
-            return {"message": f"Server error: {str(e)}"}, 500
+        return login('admin')
 
 
 class UserLogin(Resource):
     @api.expect(login_model, validate=False)
     def post(self):
-        try:
-            data = request.get_json()
-            if not data:
-                return {"message": "No JSON data provided"}, 400
-
-            email = (data.get('email') or '').strip().lower()
-            password = data.get('password', '')
-
-            if not email or '@' not in email:
-                return {"message": "Invalid email format"}, 400
-
-            user = User.query.filter_by(email=email, is_active=True).first()
-            if not user or not user.check_password(password):
-                return {"message": "Invalid user credentials"}, 401
-            print(f"User {email} login attempt - is_verified: {user.is_verified}")
-            if not user.is_verified:
-                return {"message": "Account not verified"}, 403
-
-            identity = str(user.id)
-            claims = {"role": "USER", "type": "user"}
-
-            access_token = create_access_token(identity=identity, additional_claims=claims)
-            refresh_token = create_refresh_token(identity=identity, additional_claims=claims)
-
-            resp = make_response({
-                "accessToken": access_token,
-                "refreshToken": refresh_token,
-                "role": "USER",
-                "type": "user",
-            })
-            resp.status_code = 200
-            set_access_cookies(resp, access_token)
-            set_refresh_cookies(resp, refresh_token)
-            return resp
-        except Exception as e:
-            return {"message": f"Server error: {str(e)}"}, 500
+        return login('user')
 
 
 class Refresh(Resource):
     @jwt_required(refresh=True)
     def post(self):
-        identity = get_jwt_identity()
-        access_token = create_access_token(identity=identity)
-        resp = make_response({"accessToken": access_token})
+        status, tokens = rotate_session(get_jwt())
+        if status == 'superseded':
+            # A concurrent refresh already rotated this token; its cookies win.
+            return {"message": "Refresh token already used, retry with the latest one"}, 409
+        if status != 'ok':
+            resp = make_response({"message": "Session has expired, please log in again"})
+            resp.status_code = 401
+            unset_jwt_cookies(resp)
+            return resp
+        resp = make_response(tokens)
         resp.status_code = 200
-        set_access_cookies(resp, access_token)
+        set_access_cookies(resp, tokens["accessToken"])
+        set_refresh_cookies(resp, tokens["refreshToken"])
         return resp
 
 
 class Logout(Resource):
     @jwt_required()
     def post(self):
-        # Get the JWT token and add it to the blacklist
-        jti = get_jwt()['jti']
-        
-        # Import the blacklist from app.py (in a real app, use Redis or database)
-        from app import blacklisted_tokens
-        blacklisted_tokens.add(jti)
+        # Revoke the token until it would have expired anyway
+        token = get_jwt()
+        if token.get('fam'):
+            end_session(token['fam'])
+        get_revocation_store().revoke(token['jti'], token['exp'])
+        record('logout', subject_type=token.get('type'), subject_id=int(token['sub']))
         
         resp = make_response({"message": "Logged out successfully"})
         resp.status_code = 200
@@ -135,70 +213,98 @@ class Logout(Resource):
 
 
 
+PROFILE_COLUMNS = [getattr(User, USER_FIELDS[name]) for name in PROFILE_FIELDS]
+
+
+def profile_entry(row):
+    """Serialized profile plus the validators derived from ``updated_at``, as cached.
+
+    ``row`` holds PROFILE_COLUMNS followed by ``updated_at``.
+    """
+    changed = (row.updated_at or row.created_at).replace(tzinfo=timezone.utc)
+    return {
+        'body': encode(row_serializer(PROFILE_FIELDS)(row)).decode(),
+        'etag': f"{row.id}-{int(changed.timestamp() * 1000000)}",
+        'lastModified': int(changed.timestamp()),
+    }
+
+
+class ProfileRead:
+    """GET /profile around its one query, split like ``LoginAttempt``.
+
+    ``begin`` checks the token and answers from the profile cache when it can;
+    on a miss ``run`` reads the row and ``finish`` caches and sends it.
+    """
+
+    # A lagging replica would re-cache what invalidate_profile just dropped.
+    replica = False
+
+    def begin(self):
+        verify_jwt_in_request()
+        self.identity = get_jwt_identity()
+        self.entry = get_profile_cache().get(profile_key(self.identity))
+        return None if self.entry is None else self.respond()
+
+    def statement(self):
+        return select(*PROFILE_COLUMNS, User.updated_at).where(User.id == self.identity)
+
+    async def run(self, session):
+        return (await session.execute(self.statement())).first()
+
+    def run_sync(self):
+        return db.session.execute(self.statement()).first()
+
+    def finish(self, row):
+        if row is None:
+            api.abort(404)
+        self.entry = profile_entry(row)
+        get_profile_cache().set(profile_key(self.identity), self.entry)
+        return self.respond()
+
+    def respond(self):
+        resp = Response(self.entry['body'], mimetype='application/json')
+        resp.set_etag(self.entry['etag'])
+        resp.last_modified = self.entry['lastModified']
+        # The browser revalidates every poll; unchanged profiles come back as 304.
+        resp.headers['Cache-Control'] = 'private, no-cache'
+        return resp.make_conditional(request)
+
+
 class UserProfile(Resource):
-    @jwt_required()
     def get(self):
-        identity = get_jwt_identity()
-        user = User.query.get_or_404(identity)
-        return {
-            'id': user.id,
-            'firstName': user.first_name,
-            'lastName': user.last_name,
-            'email': user.email,
-            'mobileNumber': user.mobile_number,
-            'profilePictureUrl': user.profile_picture_url,
-            'isActive': user.is_active,
-            'isVerified': user.is_verified,
-            'createdAt': user.created_at.isoformat() if user.created_at else None
-        }, 200
+        read = ProfileRead()  # begin checks the token
+        return read.begin() or read.finish(read.run_sync())
 
 class VerifyOTP(Resource):
     def post(self):
-        data = request.get_json()
-        email = data.get('email', '').strip().lower()
-        otp_code = data.get('otp', '').strip()
-
-        print(f"OTP verification request for {email} with code {otp_code}")
+        data = request.get_json() or {}
+        email = (data.get('email') or '').strip().lower()
+        otp_code = (data.get('otp') or '').strip()
 
         if not email or not otp_code:
             return {"message": "Email and OTP code are required"}, 400
-        
-        # Find the most recent OTP for this email
-        otp_record = EmailOTP.query.filter_by(
-            email=email, 
-            purpose='admin_verification',
-            is_used=False
-        ).order_by(EmailOTP.created_at.desc()).first()
-        
-        print(f"Found OTP record: {otp_record}")
-        
-        if not otp_record:
-            print(f"No OTP record found for {email}")
+
+        status = verify_otp(email, 'admin_verification', otp_code)
+        if status != 'ok':
+            record('otp_verify', success=False, email=email, reason=status)
+        if status == 'missing':
             return {"message": "No verification code found for this email"}, 404
-        
-        # Check if OTP is expired
-        from datetime import datetime
-        if datetime.utcnow() > otp_record.expires_at:
+        if status == 'expired':
             return {"message": "Verification code has expired"}, 400
-        
-        # Verify OTP code
-        print(f"Comparing OTP: stored={otp_record.otp_code}, provided={otp_code}")
-        if otp_record.otp_code != otp_code:
-            print(f"OTP mismatch for {email}")
+        if status == 'invalid':
             return {"message": "Invalid verification code"}, 400
-        
-        # Mark OTP as used and verify the user
-        otp_record.is_used = True
-        
+
         # Update user verification status
         user = User.query.filter_by(email=email).first()
         if user:
             user.is_verified = True
             db.session.commit()
-            print(f"User {email} has been verified successfully")
+            invalidate_profile(user.id)
+            record('otp_verify', subject_type='user', subject_id=user.id, email=email)
             return {"message": "OTP verified successfully. User account is now verified."}, 200
         else:
-            print(f"User {email} not found during OTP verification")
+            db.session.rollback()
+            record('otp_verify', success=False, email=email, reason='unknown_user')
             return {"message": "User not found"}, 404
 
 
@@ -213,7 +319,7 @@ class CheckSession(Resource):
             return {
                 "valid": True,
                 "user_id": current_user_id,
-                "role": claims.get("role"),
+                "role": current_user["role"],  # live role from the identity cache, not the token
                 "type": claims.get("type")
             }, 200
         except Exception as e:
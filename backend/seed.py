@@ -1,6 +1,10 @@
 import os
-from extensions import db
-from models import Admin
+from sqlalchemy import insert
+from extensions import DEFAULT_TENANT, db, tenant_engine
+from models import Admin, User
+from utils.migrations import migrate, missing_schema
+from utils.search import init_search_index
+from utils.tenants import tenant_names
 
 
 def ensure_admin():
@@ -15,4 +19,52 @@ def ensure_admin():
     )
     admin.set_password(os.getenv('SUPERADMIN_PASSWORD', 'Admin@1234'))
     db.session.add(admin)
-    db.session.commit()
\ No newline at end of file
+    db.session.commit()
+
+
+def init_db():
+    """Migrate every tenant's database to the newest schema, add the search index and the superadmin.
+
+    Safe to run on every deploy. The superadmin is created in the default
+    tenant's database only. Returns what was done, one line per change,
+    prefixed with ``[tenant]`` outside the default tenant. Raises RuntimeError
+    if the models declare something no migration creates.
+    """
+    done = []
+    for tenant in tenant_names():
+        engine = tenant_engine(tenant)
+        lines = [f"Applied migration {revision}" for revision in migrate(engine, tenant)]
+        missing = missing_schema(engine, tenant)
+        if missing:
+            raise RuntimeError(f"The models declare {', '.join(missing)}, which no migration creates in "
+                               f"tenant {tenant}'s database; add one with `flask --app app db-revision -m ...`")
+        search_table = init_search_index(engine)
+        if search_table:
+            lines.append(f"Created search table {search_table}")
+        done += [line if tenant == DEFAULT_TENANT else f"[{tenant}] {line}" for line in lines]
+    ensure_admin()
+    return done
+
+
+def seed_users(count, password='Password@123', email_domain='example.com', batch_size=1000):
+    """Insert ``count`` verified users sharing one password hash (for local load testing)."""
+    template = User(first_name='', last_name='', email='')
+    template.set_password(password)
+    existing = User.query.count()
+    for start in range(0, count, batch_size):
+        rows = [
+            {
+                'first_name': 'Load',
+                'last_name': f'User{i}',
+                'email': f'user{i}@{email_domain}',
+                'password_hash': template.password_hash,
+                'mobile_number': f'+1555{i:07d}',
+                'role': 'USER',
+                'is_active': True,
+                'is_verified': True,
+            }
+            for i in range(existing + start, existing + min(start + batch_size, count))
+        ]
+        db.session.execute(insert(User), rows)
+        db.session.commit()
+    return [f'user{i}@{email_domain}' for i in range(existing, existing + count)]
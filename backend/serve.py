@@ -0,0 +1,84 @@
+"""Production launcher for the API.
+
+    python serve.py                      # WSGI: gunicorn with threaded workers
+    python serve.py --mode asgi          # ASGI: uvicorn serving asgi:app
+
+Both servers come from requirements-serve.txt. Every setting falls back to
+an environment variable so container images can configure it without
+changing the command. Each worker process starts its own password hashing
+pool (HASH_POOL_WORKERS), so size the two together. Workers do not create
+tables; run ``flask --app app init-db`` before the first start.
+"""
+import argparse
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default=os.getenv("SERVER_MODE", "wsgi"))
+    parser.add_argument("--host", default=os.getenv("BACKEND_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("BACKEND_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(min(os.cpu_count() or 1, 4)))),
+                        help="Worker processes")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SERVER_THREADS", "8")),
+                        help="Request threads per worker")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("KEEPALIVE_SECONDS", "5")),
+                        help="Seconds an idle client connection is kept open")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("SERVER_TIMEOUT_SECONDS", "30")),
+                        help="Seconds before a stuck worker is restarted (wsgi only)")
+    return parser.parse_args(argv)
+
+
+def serve_wsgi(args):
+    from gunicorn.app.base import BaseApplication  # only needed for this mode
+
+    class Server(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": "gthread",
+                "threads": args.threads,
+                "keepalive": args.keep_alive,
+                "timeout": args.timeout,
+                "chdir": BACKEND_DIR,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import create_app
+
+            return create_app()
+
+    Server().run()
+
+
+def serve_asgi(args):
+    import uvicorn  # only needed for this mode
+
+    os.environ["SERVER_THREADS"] = str(args.threads)  # read by asgi.py in every worker
+    uvicorn.run(
+        "asgi:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_keep_alive=args.keep_alive,
+        interface="asgi3",
+        app_dir=BACKEND_DIR,
+        access_log=False,
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mode == "asgi":
+        serve_asgi(args)
+    else:
+        serve_wsgi(args)
+
+
+if __name__ == "__main__":
+    main()
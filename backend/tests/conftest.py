@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="module")
+def make_app(tmp_path_factory):
+    """Build apps on their own throwaway databases, with extra settings as keyword arguments."""
+    from support import build_app
+
+    return lambda **env: build_app(tmp_path_factory.mktemp("app"), **env)
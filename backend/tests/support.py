@@ -0,0 +1,56 @@
+"""Helpers shared by the test modules: apps on throwaway databases and logins.
+
+Settings reach the app as environment variables, as in production, but only
+while it is created and its schema migrated, so no test module sees another's.
+"""
+import os
+from contextlib import contextmanager
+
+import pytest
+
+ADMIN_EMAIL = "admin@galvan.ai"
+ADMIN_PASSWORD = "Admin@1234"
+USER_PASSWORD = "Password@123"
+
+
+@contextmanager
+def app_environment(workdir, **env):
+    """Environment for an app whose database, keys, spool and logs live in ``workdir``."""
+    workdir = str(workdir)
+    settings = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'app.db')}",
+        "MAIL_SPOOL_PATH": os.path.join(workdir, "mail_spool.db"),
+        "JWT_KEY_DIR": os.path.join(workdir, "jwt_keys"),
+        "AUDIT_DIR": os.path.join(workdir, "audit"),
+        "HASH_POOL_WORKERS": "0",
+        "RATELIMIT_ENABLED": "false",
+        "SUPERADMIN_EMAIL": ADMIN_EMAIL,
+        "SUPERADMIN_PASSWORD": ADMIN_PASSWORD,
+        **{key: str(value) for key, value in env.items()},
+    }
+    with pytest.MonkeyPatch.context() as patch:
+        for key, value in settings.items():
+            patch.setenv(key, value)
+        yield
+
+
+def build_app(workdir, **env):
+    """A migrated app with the superadmin created; ``env`` overrides the test settings."""
+    from app import create_app
+    from seed import init_db
+
+    with app_environment(workdir, **env):
+        app = create_app()
+        with app.app_context():
+            init_db()
+    return app
+
+
+def login(client, kind, email, password, **headers):
+    response = client.post(f"/api/auth/{kind}-login", json={"email": email, "password": password}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
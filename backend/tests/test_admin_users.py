@@ -0,0 +1,58 @@
+"""Creating users one at a time stores the same normalised emails as bulk creation."""
+import pytest
+
+from support import ADMIN_EMAIL, ADMIN_PASSWORD, USER_PASSWORD, bearer, login
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client(use_cookies=False)
+
+
+@pytest.fixture
+def admin(client):
+    return bearer(login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)["accessToken"])
+
+
+def new_user(email):
+    return {"firstName": "New", "lastName": "User", "email": email, "password": USER_PASSWORD, "role": "USER"}
+
+
+def test_created_email_is_trimmed_and_lowercased(app, client, admin):
+    from extensions import db
+    from models import EmailOTP, User
+
+    response = client.post("/api/admin/users", headers=admin, json=new_user("  Mixed.Case@Example.COM "))
+    assert response.status_code == 201
+    assert response.get_json()["email"] == "mixed.case@example.com"
+
+    with app.app_context():
+        user = db.session.get(User, response.get_json()["id"])
+        assert user.email == "mixed.case@example.com"
+        assert EmailOTP.query.filter_by(email="mixed.case@example.com").count() == 1
+        user.is_verified = True
+        db.session.commit()
+    assert login(client, "user", "MIXED.case@example.com", USER_PASSWORD)["accessToken"]
+
+
+@pytest.mark.parametrize("email", ["mixed.case@example.com", "MIXED.CASE@EXAMPLE.COM "])
+def test_duplicates_are_refused_whatever_their_case(client, admin, email):
+    response = client.post("/api/admin/users", headers=admin, json=new_user(email))
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Email already exists"
+
+
+def test_bulk_sees_single_created_emails(client, admin):
+    response = client.post("/api/admin/users/bulk", headers=admin, json=[new_user("Mixed.Case@example.com")])
+    assert response.get_json()["results"][0]["message"] == "Email already exists"
+
+
+def test_email_without_at_sign_is_refused(client, admin):
+    response = client.post("/api/admin/users", headers=admin, json=new_user("   "))
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Invalid email format"
@@ -0,0 +1,160 @@
+"""Views served natively by asgi.py behave like the WSGI ones; everything else passes through."""
+import asyncio
+import json
+from functools import partial
+
+import pytest
+
+pytest.importorskip("a2wsgi")
+
+from support import ADMIN_EMAIL, ADMIN_PASSWORD, USER_PASSWORD, app_environment  # noqa: E402
+
+USER_EMAIL = "ada@example.com"
+
+
+@pytest.fixture(scope="module")
+def asgi_call(tmp_path_factory):
+    from extensions import db
+    from models import User
+    from seed import init_db
+
+    # asgi.py builds its app on import, from the environment.
+    workdir = tmp_path_factory.mktemp("asgi")
+    with app_environment(workdir, RATELIMIT_ENABLED="true", RATELIMIT_LOGIN_FAILURES="2/minute"):
+        import asgi
+
+        with asgi.flask_app.app_context():
+            init_db()
+            user = User(first_name="Ada", last_name="Lovelace", email=USER_EMAIL, role="USER")
+            user.set_password(USER_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+    # Pooled async connections belong to the loop that opened them, so every call shares one.
+    loop = asyncio.new_event_loop()
+    yield partial(call, loop, asgi.app)
+    loop.run_until_complete(asgi.async_db.dispose())
+    loop.close()
+
+
+def call(loop, app, method, path, body=None, headers=(), query=""):
+    """Run one request through the ASGI app; returns (status, [(header, value)], body)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method, "scheme": "http", "path": path,
+        "root_path": "", "query_string": query.encode(), "server": ("testserver", 80), "client": ("127.0.0.1", 1234),
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode()),
+                    *((name.lower().encode(), value.encode()) for name, value in headers)],
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    loop.run_until_complete(app(scope, receive, send))
+    start = sent[0]
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    return start["status"], [(name.decode(), value.decode()) for name, value in start["headers"]], body
+
+
+def test_login_issues_tokens_and_cookies(asgi_call):
+    status, headers, body = asgi_call("POST", "/api/auth/admin-login", {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    assert status == 200
+    tokens = json.loads(body)
+    assert tokens["type"] == "admin" and tokens["role"] == "ADMIN"
+    cookies = [value.split("=", 1)[0] for name, value in headers if name == "set-cookie"]
+    assert "access_token_cookie" in cookies and "refresh_token_cookie" in cookies
+
+    # Other routes go through a2wsgi and accept the token.
+    bearer = [("Authorization", f"Bearer {tokens['accessToken']}")]
+    assert asgi_call("GET", "/api/auth/check", headers=bearer)[0] == 200
+
+
+def test_failed_logins_are_throttled(asgi_call):
+    login = {"email": "nobody@example.com", "password": "wrong"}
+    assert [asgi_call("POST", "/api/auth/user-login", login)[0] for _ in range(3)] == [401, 401, 429]
+
+
+def test_request_hooks_still_apply(asgi_call):
+    status, _, _ = asgi_call("POST", "/api/auth/admin-login", {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD},
+                             headers=[("X-Tenant", "unknown")])
+    assert status == 404
+    assert asgi_call("POST", "/api/auth/user-login", {"email": "not-an-email"})[0] == 400
+
+
+def test_busy_hashing_pool_asks_the_client_to_retry(asgi_call, monkeypatch):
+    from resources.auth import LoginAttempt
+    from utils.hashing import HashingUnavailable
+
+    async def unavailable(self, password_hash):
+        raise HashingUnavailable()
+
+    monkeypatch.setattr(LoginAttempt, "check_password_async", unavailable)
+    status, headers, _ = asgi_call("POST", "/api/auth/admin-login", {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    assert status == 503 and ("retry-after", "1") in headers
+
+
+def test_request_context_is_popped_when_a_hook_raises(asgi_call, monkeypatch):
+    import asgi
+    from flask.ctx import RequestContext
+
+    popped = []
+    pop = RequestContext.pop
+    monkeypatch.setattr(RequestContext, "pop", lambda self, *args: popped.append(args) or pop(self, *args))
+
+    def broken():
+        raise RuntimeError("hook failed")
+
+    monkeypatch.setattr(asgi.flask_app, "preprocess_request", broken)
+    with pytest.raises(RuntimeError):
+        asgi_call("POST", "/api/auth/admin-login", {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+    assert len(popped) == 1 and isinstance(popped[0][0], RuntimeError)
+
+
+def token(asgi_call, kind, email, password):
+    status, _, body = asgi_call("POST", f"/api/auth/{kind}-login", {"email": email, "password": password})
+    assert status == 200
+    return [("Authorization", f"Bearer {json.loads(body)['accessToken']}")]
+
+
+@pytest.fixture
+def async_sessions(monkeypatch):
+    """Tenants of the AsyncSessions the native views open, in order."""
+    import asgi
+
+    opened = []
+    session = asgi.async_db.session
+    monkeypatch.setattr(asgi.async_db, "session", lambda *args: opened.append(args) or session(*args))
+    return opened
+
+
+def test_profile_is_read_through_an_async_session(asgi_call, async_sessions):
+    headers = token(asgi_call, "user", USER_EMAIL, USER_PASSWORD)
+    status, response_headers, body = asgi_call("GET", "/api/auth/profile", headers=headers)
+    assert status == 200 and json.loads(body)["email"] == USER_EMAIL
+    etag = dict(response_headers)["etag"]
+    # The login and the cache miss used the primary; the cached profile needs no query.
+    assert async_sessions == [("default", False), ("default", False)]
+    assert asgi_call("GET", "/api/auth/profile", headers=[*headers, ("If-None-Match", etag)])[0] == 304
+    assert len(async_sessions) == 2
+    assert asgi_call("GET", "/api/auth/profile")[0] == 401
+
+
+def test_users_pages_are_read_through_an_async_session(asgi_call, async_sessions):
+    headers = token(asgi_call, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)
+    status, _, body = asgi_call("GET", "/api/admin/users", headers=headers, query="limit=1&fields=email")
+    page = json.loads(body)
+    assert status == 200 and page == {"items": [{"email": USER_EMAIL}], "nextCursor": None}
+    assert async_sessions[-1] == ("default", True)
+    assert asgi_call("GET", "/api/admin/users", headers=headers, query="fields=nope")[0] == 400
+    assert asgi_call("GET", "/api/admin/users", headers=token(asgi_call, "user", USER_EMAIL, USER_PASSWORD))[0] == 403
+
+    # Exports stream through the WSGI app.
+    opened = len(async_sessions)
+    status, response_headers, body = asgi_call("GET", "/api/admin/users", headers=headers,
+                                               query="format=ndjson&fields=email")
+    assert status == 200 and dict(response_headers)["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in body.splitlines()] == [{"email": USER_EMAIL}]
+    assert len(async_sessions) == opened
@@ -0,0 +1,42 @@
+"""Async engines mirror the app's binds, on the asyncio driver of each backend."""
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from utils.async_db import AsyncDatabase, async_url
+
+
+def test_async_url_picks_the_asyncio_driver():
+    assert async_url("sqlite:////data/app.db").drivername == "sqlite+aiosqlite"
+    assert async_url("postgresql+psycopg2://u:p@db/app").render_as_string(hide_password=False) == \
+        "postgresql+asyncpg://u:p@db/app"
+    assert async_url("mysql+pymysql://u@db/app").drivername == "mysql+aiomysql"
+    with pytest.raises(ValueError):
+        async_url("sqlite:///:memory:")
+    with pytest.raises(ValueError):
+        async_url("oracle://u@db/app")
+
+
+def test_sessions_follow_tenant_and_replica(tmp_path, make_app):
+    app = make_app(DATABASE_REPLICA_URL=f"sqlite:///{tmp_path / 'replica.db'}",
+                   TENANT_DATABASES=f"acme=sqlite:///{tmp_path / 'acme.db'}")
+    async_db = AsyncDatabase(app)
+    with app.app_context():
+        from extensions import db
+
+        assert {key: engine.url.database for key, engine in async_db.engines.items()} == \
+            {key: engine.url.database for key, engine in db.engines.items()}
+    assert async_db.engine().url.database.endswith("app.db")
+    assert async_db.engine(replica=True).url.database.endswith("replica.db")
+    assert async_db.engine("acme", replica=True).url.database.endswith("acme.db")
+
+    async def pragmas():
+        try:
+            async with async_db.session("acme") as session:
+                return [(await session.execute(text(f"PRAGMA {name}"))).scalar()
+                        for name in ("journal_mode", "busy_timeout")]
+        finally:
+            await async_db.dispose()
+
+    assert asyncio.run(pragmas()) == ["wal", 5000]
@@ -0,0 +1,48 @@
+"""The rotating Bloom filter never forgets a live key, and frees buckets once their keys expire."""
+import types
+
+import pytest
+
+from utils import bloom
+from utils.bloom import RotatingBloomFilter
+
+START = 1_000_000.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(bloom, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_no_false_negatives_across_rotation(clock):
+    # Small buckets, so many keys share each one and rotation happens every second.
+    filter_ = RotatingBloomFilter(memory_budget=4096, max_ttl=10, bucket_seconds=1)
+    keys = {f"jti-{i}": START + 0.1 + i * 0.01 for i in range(1000)}  # expiries spread over 10 seconds
+    for key, expires_at in keys.items():
+        filter_.add(key, expires_at)
+
+    while clock[0] < START + 11:
+        live = [key for key, expires_at in keys.items() if expires_at > clock[0]]
+        assert all(filter_.might_contain(key) for key in live)
+        assert all(filter_.might_contain(key, keys[key]) for key in live)
+        clock[0] += 0.25
+
+
+def test_expired_buckets_are_dropped(clock):
+    filter_ = RotatingBloomFilter(memory_budget=4096, max_ttl=10, bucket_seconds=1)
+    for second in range(5):
+        filter_.add(f"jti-{second}", START + second + 0.5)
+    assert filter_.stats()["buckets"] == 5
+
+    clock[0] = START + 3
+    assert not filter_.might_contain("jti-0")  # a lookup rotates the filter
+    stats = filter_.stats()
+    assert stats["buckets"] == 2 and stats["memory_bytes"] == 2 * filter_.bucket_bytes
+    assert not filter_.might_contain("jti-1", START + 1.5)
+    assert filter_.might_contain("jti-3") and filter_.might_contain("jti-4", START + 4.5)
+
+    clock[0] = START + 5
+    assert not filter_.might_contain("jti-4")
+    assert filter_.stats()["buckets"] == 0
@@ -0,0 +1,57 @@
+"""The auth event search reads since/until as UTC, converting times that carry an offset."""
+from datetime import datetime
+
+import pytest
+
+from support import ADMIN_EMAIL, ADMIN_PASSWORD, bearer, login
+
+EVENT_TYPE = "test_window"
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    from extensions import db
+    from models import AuthEvent
+
+    app = make_app()
+    with app.app_context():
+        # created_at is naive UTC.
+        for hour in (9, 10, 11, 12):
+            db.session.add(AuthEvent(created_at=datetime(2026, 3, 1, hour), event_type=EVENT_TYPE, success=True))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def search(app):
+    client = app.test_client(use_cookies=False)
+    headers = bearer(login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)["accessToken"])
+
+    def search(**args):
+        response = client.get("/api/admin/events", headers=headers, query_string={"type": EVENT_TYPE, **args})
+        assert response.status_code == 200, response.get_json()
+        return [item["createdAt"] for item in response.get_json()["items"]]
+
+    return search
+
+
+def test_naive_times_are_utc(search):
+    assert search(since="2026-03-01T10:00:00", until="2026-03-01T12:00:00") == [
+        "2026-03-01T11:00:00", "2026-03-01T10:00:00"]
+
+
+@pytest.mark.parametrize("since, until", [
+    ("2026-03-01T12:00:00+02:00", "2026-03-01T14:00:00+02:00"),
+    ("2026-03-01T05:00:00-05:00", "2026-03-01T07:00:00-05:00"),
+    ("2026-03-01T10:00:00Z", "2026-03-01T12:00:00+00:00"),
+])
+def test_times_with_an_offset_are_converted_to_utc(search, since, until):
+    assert search(since=since, until=until) == ["2026-03-01T11:00:00", "2026-03-01T10:00:00"]
+
+
+def test_invalid_time_is_refused(app):
+    client = app.test_client(use_cookies=False)
+    headers = bearer(login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)["accessToken"])
+    response = client.get("/api/admin/events", headers=headers, query_string={"since": "yesterday"})
+    assert response.status_code == 400
+    assert "Invalid since" in response.get_json()["message"]
@@ -0,0 +1,122 @@
+"""Every access token is checked against the live account: version, tenant and status."""
+import pytest
+
+from support import ADMIN_EMAIL, ADMIN_PASSWORD, USER_PASSWORD, bearer, login
+
+
+@pytest.fixture(scope="module")
+def app(make_app, tmp_path_factory):
+    acme = tmp_path_factory.mktemp("acme") / "acme.db"
+    return make_app(TENANT_DATABASES=f"acme=sqlite:///{acme}")
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client(use_cookies=False)
+
+
+@pytest.fixture
+def admin(client):
+    return bearer(login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)["accessToken"])
+
+
+def create_user(app, email):
+    from extensions import db
+    from models import User
+
+    with app.app_context():
+        user = User(first_name="Test", last_name="User", email=email, role="USER")
+        user.set_password(USER_PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def check(client, headers):
+    return client.get("/api/auth/check", headers=headers).status_code
+
+
+def cached(app, user_id):
+    with app.app_context():
+        return app.extensions["identity_cache"].get(f"default:user:{user_id}")
+
+
+def test_signing_out_everywhere_rejects_earlier_tokens(app, client, admin):
+    user_id = create_user(app, "everywhere@example.com")
+    old = bearer(login(client, "user", "everywhere@example.com", USER_PASSWORD)["accessToken"])
+    assert check(client, old) == 200
+
+    assert client.delete(f"/api/admin/users/{user_id}/sessions", headers=admin).status_code == 200
+    assert check(client, old) == 401
+    assert check(client, bearer(login(client, "user", "everywhere@example.com", USER_PASSWORD)["accessToken"])) == 200
+
+
+def test_role_change_rejects_earlier_tokens(app, client, admin):
+    user_id = create_user(app, "promoted@example.com")
+    old = bearer(login(client, "user", "promoted@example.com", USER_PASSWORD)["accessToken"])
+    assert client.put(f"/api/admin/users/{user_id}", json={"role": "MANAGER"}, headers=admin).status_code == 200
+    assert check(client, old) == 401
+    tokens = login(client, "user", "promoted@example.com", USER_PASSWORD)
+    assert tokens["role"] == "MANAGER" and check(client, bearer(tokens["accessToken"])) == 200
+
+
+def test_deactivated_account_is_refused_at_the_same_version(app, client):
+    from extensions import db
+    from models import User
+    from utils.identity import invalidate_identity
+
+    user_id = create_user(app, "deactivated@example.com")
+    headers = bearer(login(client, "user", "deactivated@example.com", USER_PASSWORD)["accessToken"])
+    with app.app_context():
+        # Straight in the database: the token version stays, so only the status check can refuse it.
+        db.session.get(User, user_id).is_active = False
+        db.session.commit()
+        invalidate_identity("user", user_id)
+    assert check(client, headers) == 401
+
+
+def test_tokens_only_work_for_their_tenant(app, client, admin):
+    assert check(client, admin) == 200
+    assert check(client, {**admin, "X-Tenant": "acme"}) == 401
+
+
+def delete_with_cached_status(app, client, admin, email):
+    """Create and delete a user, leaving its status cached as missing; returns the freed id."""
+    from utils.identity import _MISSING
+
+    user_id = create_user(app, email)
+    tokens = login(client, "user", email, USER_PASSWORD)
+    # Deleting revokes each session's latest access token; an earlier one reaches the identity lookup.
+    headers = bearer(tokens["accessToken"])
+    assert client.post("/api/auth/refresh", headers=bearer(tokens["refreshToken"])).status_code == 200
+    assert client.delete(f"/api/admin/users/{user_id}", headers=admin).status_code == 200
+    assert check(client, headers) == 401
+    assert cached(app, user_id) == _MISSING
+    return user_id
+
+
+def new_user(email):
+    return {"firstName": "New", "lastName": "User", "email": email, "password": USER_PASSWORD, "role": "USER"}
+
+
+def test_recreated_account_is_not_refused_as_missing(app, client, admin):
+    from extensions import db
+    from models import User
+
+    user_id = delete_with_cached_status(app, client, admin, "deleted@example.com")
+    response = client.post("/api/admin/users", headers=admin, json=new_user("recreated@example.com"))
+    assert response.status_code == 201
+    assert response.get_json()["id"] == user_id  # SQLite hands out the deleted id again
+    assert cached(app, user_id) is None
+
+    with app.app_context():
+        db.session.get(User, user_id).is_verified = True
+        db.session.commit()
+    assert check(client, bearer(login(client, "user", "recreated@example.com", USER_PASSWORD)["accessToken"])) == 200
+
+
+def test_bulk_created_accounts_clear_their_cached_status(app, client, admin):
+    user_id = delete_with_cached_status(app, client, admin, "bulk-deleted@example.com")
+    response = client.post("/api/admin/users/bulk", headers=admin, json=[new_user("bulk-recreated@example.com")])
+    assert response.get_json()["results"][0]["id"] == user_id
+    assert cached(app, user_id) is None
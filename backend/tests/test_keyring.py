@@ -0,0 +1,60 @@
+"""Key ids stay whole epoch seconds through rotation, and tokens are signed with the key their header names."""
+import types
+
+import jwt as pyjwt
+import pytest
+
+from utils import keyring as keyring_module
+from utils.keyring import KeyRing
+
+START = 1_800_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [float(START)]
+    monkeypatch.setattr(keyring_module, "time", types.SimpleNamespace(
+        time=lambda: now[0], monotonic=keyring_module.time.monotonic))
+    return now
+
+
+def test_fractional_rotation_keeps_integer_kids(tmp_path, clock):
+    # JWT_KEY_ROTATION_DAYS is a float; 1.5 minutes must not produce a kid like "1800000090.0".
+    ring = KeyRing(str(tmp_path), "EdDSA", rotation_seconds=90.5, publish_ahead=0, max_token_lifetime=3600)
+    assert ring.stats()["kids"] == [str(START)]
+
+    clock[0] += 200
+    ring.maintain()
+    kids = ring.stats()["kids"]
+    assert kids == [str(START), str(START + 180)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{kid}.pem" for kid in kids]
+    assert ring.signing_key()[0] == str(START + 180)
+
+
+def test_rotations_within_one_second_get_distinct_kids(tmp_path, clock):
+    ring = KeyRing(str(tmp_path), "EdDSA", publish_ahead=0)
+    rotated = [ring.rotate(), ring.rotate()]
+    assert rotated == [str(START + 1), str(START + 2)]
+    assert ring.stats()["kids"] == [str(START), *rotated]
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app(JWT_ALGORITHM="EdDSA", JWKS_MAX_AGE_SECONDS=0)
+
+
+def test_token_is_signed_with_the_key_in_its_header(app, monkeypatch):
+    from flask_jwt_extended import create_access_token, decode_token
+
+    with app.app_context():
+        ring = app.extensions["jwt_keyring"]
+        ring.signing_key()
+        ring.rotate()
+        # A switchover between flask_jwt_extended asking for the header and for the key.
+        keys = iter([(kid, private) for kid, (private, _) in ring._keys.items()])
+        monkeypatch.setattr(ring, "signing_key", lambda: next(keys))
+
+        token = create_access_token(identity="1")
+        kid = pyjwt.get_unverified_header(token)["kid"]
+        assert kid == list(ring._keys)[0]
+        assert decode_token(token)["sub"] == "1"
@@ -0,0 +1,129 @@
+"""The email dispatcher against utils.smtp_sink: delivery, retry with backoff and dead-lettering."""
+import logging
+import socket
+import sqlite3
+import time
+
+import pytest
+
+from utils import mail_queue
+from utils.mail_queue import EmailDispatcher, MailSpool, SMTPConnectionPool
+from utils.smtp_sink import FakeSMTPServer
+
+BACKOFF = 30.0
+
+
+@pytest.fixture
+def sink():
+    server = FakeSMTPServer(reject={"nobody@example.com"}).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return MailSpool(str(tmp_path / "spool.db"))
+
+
+def dispatcher(spool, port, **options):
+    pool = SMTPConnectionPool("127.0.0.1", port, "sender@example.com", "secret", use_tls=False)
+    return EmailDispatcher(spool, pool, sender="sender@example.com", backoff_base=BACKOFF, **options)
+
+
+def outbox(spool):
+    with sqlite3.connect(spool.path) as conn:
+        return {row[0]: row[1:] for row in conn.execute(
+            "SELECT to_email, status, attempts, next_attempt_at, last_error FROM outbox")}
+
+
+def make_due(spool):
+    with sqlite3.connect(spool.path) as conn:
+        conn.execute("UPDATE outbox SET next_attempt_at = 0 WHERE status = 'pending'")
+
+
+def test_delivers_and_acks(spool, sink):
+    mail = dispatcher(spool, sink.port)
+    spool.enqueue("a@example.com", "Hello", "Body A")
+    spool.enqueue("b@example.com", "Hello", "Body B")
+    assert mail.drain() == 2
+    assert [recipients for _, recipients, _ in sink.messages] == [["<a@example.com>"], ["<b@example.com>"]]
+    assert outbox(spool) == {} and mail.stats()["sent"] == 2
+
+
+def test_unreachable_server_backs_off_then_delivers(spool, sink):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed_port = sock.getsockname()[1]  # nothing listens here once the socket closes
+    mail = dispatcher(spool, closed_port)
+    spool.enqueue("a@example.com", "Hello", "Body")
+    started = time.time()
+    assert mail.drain() == 1
+
+    status, attempts, next_attempt_at, last_error = outbox(spool)["a@example.com"]
+    assert (status, attempts) == ("pending", 1) and last_error
+    assert started + BACKOFF * 0.8 <= next_attempt_at <= time.time() + BACKOFF * 1.2
+    assert mail.drain() == 0  # not due yet
+
+    make_due(spool)
+    mail.pool = dispatcher(spool, sink.port).pool
+    assert mail.drain() == 1
+    assert outbox(spool) == {} and len(sink.messages) == 1
+
+
+def test_backoff_doubles_per_attempt(spool):
+    for attempts in range(3):
+        spool.enqueue(f"{attempts}@example.com", "Hello", "Body")
+    now = time.time()
+    for message_id, attempts in zip((1, 2, 3), range(3)):
+        spool.fail(message_id, attempts, "refused", max_attempts=6, backoff_base=BACKOFF)
+    delays = [next_attempt_at - now for _, _, next_attempt_at, _ in outbox(spool).values()]
+    for attempts, delay in enumerate(delays):
+        assert BACKOFF * 2 ** attempts * 0.8 <= delay <= BACKOFF * 2 ** attempts * 1.2 + 1
+
+
+def test_rejected_recipient_is_dead_lettered(spool, sink):
+    mail = dispatcher(spool, sink.port, max_attempts=2)
+    spool.enqueue("nobody@example.com", "Hello", "Body")
+    spool.enqueue("a@example.com", "Hello", "Body")
+    assert mail.drain() == 2
+    make_due(spool)
+    assert mail.drain() == 1
+
+    assert outbox(spool)["nobody@example.com"][:2] == ("dead", 2)
+    [dead] = spool.dead_letters()
+    assert dead["to"] == "nobody@example.com" and "550" in dead["lastError"]
+    assert [recipients for _, recipients, _ in sink.messages] == [["<a@example.com>"]]
+    assert mail.stats() == {"pending": 0, "dead": 1, "sent": 1, "failed_attempts": 2}
+
+
+def test_unexpected_error_fails_only_that_message(spool, sink, monkeypatch):
+    build_message = mail_queue.build_message
+
+    def broken_for_one(sender, to_email, subject, body):
+        if to_email == "broken@example.com":
+            raise ValueError("cannot encode")
+        return build_message(sender, to_email, subject, body)
+
+    monkeypatch.setattr(mail_queue, "build_message", broken_for_one)
+    mail = dispatcher(spool, sink.port)
+    for to_email in ("a@example.com", "broken@example.com", "b@example.com"):
+        spool.enqueue(to_email, "Hello", "Body")
+    assert mail.drain() == 3
+
+    [(to_email, (status, attempts, _, error))] = outbox(spool).items()
+    assert (to_email, status, attempts, error) == ("broken@example.com", "pending", 1, "cannot encode")
+    assert len(sink.messages) == 2 and mail.failed == 1
+
+
+def test_mock_delivery_logs_the_body_only_at_debug(spool, caplog, capsys):
+    mail = EmailDispatcher(spool, None, sender="")
+    spool.enqueue("a@example.com", "Your code", "Code: 123456")
+    with caplog.at_level(logging.INFO, logger=mail.logger.name):
+        assert mail.drain() == 1
+    assert "a@example.com" in caplog.text and "123456" not in caplog.text
+
+    spool.enqueue("a@example.com", "Your code", "Code: 654321")
+    with caplog.at_level(logging.DEBUG, logger=mail.logger.name):
+        mail.drain()
+    assert "654321" in caplog.text
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,89 @@
+"""Cluster jobs take a lease in job_lease, so of several nodes sharing a database only one runs each interval."""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app()
+
+
+def node(app, name, job_name, runs, interval=60):
+    """A worker's scheduler as another node would have it, with one cluster job counting its runs."""
+    from utils.maintenance import PeriodicTasks
+
+    tasks = PeriodicTasks(app)
+    tasks.owner = f"{name}:1:test"  # start() would set it; the thread is not needed here
+    tasks.register(job_name, interval, lambda: runs.append(name) or 1, lease="cluster")
+    return tasks, tasks.tasks[0]
+
+
+def expire_lease(app, job_name):
+    from extensions import db
+    from models import JobLease
+
+    with app.app_context():
+        db.session.execute(update(JobLease).where(JobLease.name == job_name)
+                           .values(leased_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+
+def test_only_the_lease_holder_runs(app):
+    runs = []
+    a, a_job = node(app, "node-a", "cluster_job", runs)
+    b, b_job = node(app, "node-b", "cluster_job", runs)
+
+    assert a.run(a_job)
+    assert not b.run(b_job) and b_job.skipped == 1
+    assert a.run(a_job)  # the holder renews its own lease
+    assert runs == ["node-a", "node-a"]
+
+    with app.app_context():
+        cluster = b.status()["jobs"][0]["cluster"]
+    assert cluster["holder"] == "node-a:1:test" and cluster["last_processed"] == 1
+
+
+def test_an_expired_lease_passes_to_another_node(app):
+    runs = []
+    a, a_job = node(app, "node-a", "handover_job", runs)
+    b, b_job = node(app, "node-b", "handover_job", runs)
+
+    assert a.run(a_job)
+    expire_lease(app, "handover_job")  # node-a died, or missed its interval
+    assert b.run(b_job)
+    assert not a.run(a_job)
+    assert runs == ["node-a", "node-b"]
+
+
+def test_racing_nodes_run_a_new_job_once(app):
+    for attempt in range(5):
+        runs = []
+        job_name = f"race_job_{attempt}"
+        nodes = [node(app, f"node-{i}", job_name, runs) for i in range(4)]
+        barrier = threading.Barrier(len(nodes))
+
+        def run(tasks, job):
+            barrier.wait()
+            tasks.run(job)
+
+        threads = [threading.Thread(target=run, args=pair) for pair in nodes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(runs) == 1, runs
+
+
+def test_jobs_without_a_lease_run_on_every_node(app):
+    from utils.maintenance import PeriodicTasks
+
+    runs = []
+    for name in ("node-a", "node-b"):
+        tasks = PeriodicTasks(app)
+        tasks.owner = f"{name}:1:test"
+        tasks.register("local_job", 60, lambda name=name: runs.append(name))
+        assert tasks.run(tasks.tasks[0])
+    assert runs == ["node-a", "node-b"]
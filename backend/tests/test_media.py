@@ -0,0 +1,89 @@
+"""Upload size limits, and deduplicated uploads: oversized images are refused from their header and never
+stored, and an upload matching a stored file restarts that file's orphan grace period."""
+import io
+import os
+
+import pytest
+
+from utils.media import ImageTooLarge, MediaStore
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def encode(image, format):
+    buffer = io.BytesIO()
+    image.save(buffer, format)
+    buffer.seek(0)
+    return buffer
+
+
+def stored_files(root):
+    return [name for _, _, names in os.walk(root) for name in names]
+
+
+def test_oversized_image_is_refused_before_storing(tmp_path):
+    store = MediaStore(str(tmp_path), workers=0, max_pixels=1000 * 1000)
+    # A 1-bit PNG compresses to a few kilobytes whatever its dimensions.
+    with pytest.raises(ImageTooLarge):
+        store.save(encode(Image.new("1", (5000, 5000)), "PNG"))
+    assert stored_files(tmp_path) == []
+
+
+def test_image_within_the_limit_is_stored(tmp_path):
+    store = MediaStore(str(tmp_path), workers=0, max_pixels=1000 * 1000)
+    digest, ext = store.save(encode(Image.new("RGB", (800, 600), "red"), "JPEG"))
+    assert ext == "jpg" and stored_files(tmp_path) == [f"{digest}.jpg"]
+
+
+def age(path, seconds):
+    old = os.stat(path).st_mtime - seconds
+    os.utime(path, (old, old))
+
+
+def test_reupload_spares_an_old_file_from_the_orphan_sweep(tmp_path):
+    store = MediaStore(str(tmp_path), workers=0)
+    image = encode(Image.new("RGB", (64, 64), "green"), "PNG").getvalue()
+    digest, ext = store.save(io.BytesIO(image))
+    thumbnail = store.path(digest, "_96.webp")
+    with open(thumbnail, "wb"):
+        pass  # as schedule_thumbnails would leave it
+    for path in (store.path(digest, f".{ext}"), thumbnail):
+        age(path, 2 * 3600)
+
+    # Uploaded again before the profile referencing it commits.
+    assert store.save(io.BytesIO(image)) == (digest, ext)
+    assert store.deduplicated == 1 and store.stored == 1
+    assert store.purge_orphans(set(), max_age_seconds=3600) == 0
+    assert sorted(stored_files(tmp_path)) == [f"{digest}.png", f"{digest}_96.webp"]
+
+
+def test_reupload_of_a_purged_file_stores_it_again(tmp_path):
+    store = MediaStore(str(tmp_path), workers=0)
+    image = encode(Image.new("RGB", (64, 64), "green"), "PNG").getvalue()
+    digest, ext = store.save(io.BytesIO(image))
+    age(store.path(digest, f".{ext}"), 2 * 3600)
+    assert store.purge_orphans(set(), max_age_seconds=3600) == 1
+
+    assert store.save(io.BytesIO(image)) == (digest, ext)
+    assert store.deduplicated == 0 and store.stored == 2
+    assert stored_files(tmp_path) == [f"{digest}.png"]
+
+
+def test_unreadable_image_is_rejected(tmp_path):
+    store = MediaStore(str(tmp_path), workers=0)
+    assert store.save(io.BytesIO(b"\x89PNG\r\n\x1a\n" + b"\x00" * 64)) is None
+    assert stored_files(tmp_path) == []
+
+
+def test_thumbnails_from_a_large_jpeg(tmp_path):
+    from utils.media import _render_thumbnails
+
+    source = tmp_path / "photo.jpg"
+    Image.new("RGB", (4000, 3000), "blue").save(source, "JPEG")
+    targets = [(96, str(tmp_path / "t96.webp")), (256, str(tmp_path / "t256.webp"))]
+    _render_thumbnails(str(source), targets, max_pixels=40 * 1000 * 1000)
+    for size, target in targets:
+        with Image.open(target) as thumb:
+            assert thumb.size == (size, size)
+    with pytest.raises(ImageTooLarge):
+        _render_thumbnails(str(source), targets, max_pixels=1000 * 1000)
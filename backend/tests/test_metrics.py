@@ -0,0 +1,72 @@
+"""Request metrics count failed requests, and per-worker files only ever cover running workers."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from utils.metrics import Registry
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def metrics_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("metrics")
+
+
+@pytest.fixture(scope="module")
+def app(make_app, metrics_dir):
+    app = make_app(METRICS_DIR=metrics_dir)
+
+    def boom():
+        raise RuntimeError("boom")
+
+    app.add_url_rule("/api/test-boom", "test_boom", boom)
+    return app
+
+
+def scrape(app):
+    response = app.test_client().get("/api/metrics")
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_a_view_that_raises_is_counted_as_500(app):
+    with pytest.raises(RuntimeError):
+        app.test_client().get("/api/test-boom")
+    assert 'http_request_duration_seconds_count{endpoint="test_boom",method="GET",status="500"} 1' in scrape(app)
+
+
+def write_worker_file(directory, pid, worker):
+    registry = Registry()
+    registry.histogram("test_worker_seconds", "Per worker test series.", ("worker",)).observe(0.01, worker)
+    with open(os.path.join(directory, f"metrics-{pid}.json"), "w") as handle:
+        json.dump(registry.snapshot(), handle)
+
+
+def test_scrape_skips_files_of_workers_that_are_gone(app, metrics_dir):
+    finished = subprocess.Popen([sys.executable, "-c", "pass"])
+    finished.wait()
+    write_worker_file(metrics_dir, os.getppid(), "running")
+    write_worker_file(metrics_dir, finished.pid, "killed")
+
+    body = scrape(app)
+    assert 'test_worker_seconds_count{worker="running"} 1' in body
+    assert 'worker="killed"' not in body
+
+
+def test_worker_file_is_removed_at_exit(tmp_path):
+    script = (
+        "import os, sys\n"
+        "from flask import Flask\n"
+        "from utils import metrics\n"
+        "app = Flask('worker')\n"
+        "app.config['METRICS_DIR'] = sys.argv[1]\n"
+        "metrics.init_app(app)\n"
+        "metrics.write_worker_snapshot(sys.argv[1])\n"
+        "assert os.listdir(sys.argv[1]) == [f'metrics-{os.getpid()}.json']\n"
+    )
+    subprocess.run([sys.executable, "-c", script, str(tmp_path)], cwd=BACKEND_DIR, check=True)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,87 @@
+"""One live code per email and purpose, used at most once; the sweeper removes only dead codes."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+PURPOSE = "admin_verification"
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def ctx(app):
+    from extensions import db
+    from models import EmailOTP
+
+    with app.app_context():
+        yield
+        db.session.rollback()
+        db.session.query(EmailOTP).delete()
+        db.session.commit()
+
+
+def codes(email):
+    from extensions import db
+    from models import EmailOTP
+
+    return db.session.execute(select(EmailOTP).where(EmailOTP.email == email)).scalars().all()
+
+
+def test_reissuing_replaces_the_previous_code(ctx):
+    from extensions import db
+    from utils.otp import issue_otp, verify_otp
+
+    first = issue_otp("Reissue@Example.com ", PURPOSE)
+    db.session.commit()
+    second = issue_otp("reissue@example.com", PURPOSE)
+    db.session.commit()
+    assert len(codes("reissue@example.com")) == 1
+    if first != second:
+        assert verify_otp("reissue@example.com", PURPOSE, first) == "invalid"
+    assert verify_otp("reissue@example.com", PURPOSE, second) == "ok"
+
+
+def test_a_code_works_once(ctx):
+    from extensions import db
+    from utils.otp import issue_otp, verify_otp
+
+    code = issue_otp("once@example.com", PURPOSE)
+    db.session.commit()
+    assert verify_otp("once@example.com", PURPOSE, code) == "ok"
+    db.session.commit()
+    assert verify_otp("once@example.com", PURPOSE, code) == "missing"
+    assert verify_otp("once@example.com", "password_reset", code) == "missing"
+
+
+def test_an_expired_code_is_refused(ctx):
+    from extensions import db
+    from models import EmailOTP
+    from utils.otp import issue_otp, verify_otp
+
+    code = issue_otp("late@example.com", PURPOSE, minutes=10)
+    db.session.execute(update(EmailOTP).where(EmailOTP.email == "late@example.com")
+                       .values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+    assert verify_otp("late@example.com", PURPOSE, code) == "expired"
+
+
+def test_sweeper_deletes_only_expired_and_used_codes(ctx):
+    from extensions import db
+    from models import EmailOTP
+    from utils.otp import issue_otp, sweep_expired_otps, verify_otp
+
+    issue_otp("expired@example.com", PURPOSE)
+    used = issue_otp("used@example.com", PURPOSE)
+    issue_otp("live@example.com", PURPOSE)
+    db.session.execute(update(EmailOTP).where(EmailOTP.email == "expired@example.com")
+                       .values(expires_at=datetime.utcnow() - timedelta(minutes=1)))
+    db.session.commit()
+    assert verify_otp("used@example.com", PURPOSE, used) == "ok"
+    db.session.commit()
+
+    assert sweep_expired_otps(batch_size=1) == 2
+    assert [row.email for row in db.session.execute(select(EmailOTP)).scalars()] == ["live@example.com"]
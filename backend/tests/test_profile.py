@@ -0,0 +1,34 @@
+"""The cached profile is filled from the primary, even with a lagging read replica configured."""
+import sqlite3
+
+from support import ADMIN_EMAIL, ADMIN_PASSWORD, USER_PASSWORD, bearer, build_app, login
+
+
+def test_profile_cache_is_not_refilled_from_a_stale_replica(tmp_path):
+    replica_path = tmp_path / "replica.db"
+    app = build_app(tmp_path, DATABASE_REPLICA_URL=f"sqlite:///{replica_path}")
+    with app.app_context():
+        from extensions import db
+        from models import User
+
+        user = User(first_name="Ada", last_name="Lovelace", email="ada@example.com", role="USER")
+        user.set_password(USER_PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+    user_token = login(client, "user", "ada@example.com", USER_PASSWORD)["accessToken"]
+    assert client.get("/api/auth/profile", headers=bearer(user_token)).get_json()["firstName"] == "Ada"
+
+    # The replica stops here, before the rename reaches it.
+    with sqlite3.connect(tmp_path / "app.db") as primary, sqlite3.connect(replica_path) as replica:
+        primary.backup(replica)
+
+    admin_token = login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)["accessToken"]
+    response = client.put(f"/api/admin/users/{user_id}", json={"firstName": "Augusta"}, headers=bearer(admin_token))
+    assert response.status_code == 200
+    assert client.get(f"/api/admin/users/{user_id}", headers=bearer(admin_token)).get_json()["firstName"] == "Ada"
+
+    for _ in range(2):
+        assert client.get("/api/auth/profile", headers=bearer(user_token)).get_json()["firstName"] == "Augusta"
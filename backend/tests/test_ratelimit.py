@@ -0,0 +1,78 @@
+"""Every rate limit store counts the same way; the redis store runs against utils.fake_redis."""
+import pytest
+
+from utils.fake_redis import FakeRedisServer
+from utils.ratelimit import MemoryRateLimitStore, RateLimiter, RedisRateLimitStore, SQLRateLimitStore
+
+WINDOW = 3600
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture(scope="module")
+def redis_server():
+    server = FakeRedisServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(params=["memory", "sql", "redis"])
+def store(request, app):
+    if request.param == "memory":
+        yield MemoryRateLimitStore()
+    elif request.param == "sql":
+        with app.app_context():
+            yield SQLRateLimitStore()
+    else:
+        yield RedisRateLimitStore(request.getfixturevalue("redis_server").url, prefix=f"test:{id(request)}:")
+
+
+def test_hit_counts_and_reset_clears(store):
+    assert [round(store.hit("k", WINDOW)) for _ in range(3)] == [1, 2, 3]
+    assert round(store.hit("k", WINDOW, amount=2)) == 5
+    assert round(store.hit("other", WINDOW)) == 1
+    store.reset("k", WINDOW)
+    assert round(store.hit("k", WINDOW)) == 1
+    store.reset("k", WINDOW)
+    store.reset("other", WINDOW)
+
+
+def test_count_reads_without_adding(store):
+    assert store.count("counted", WINDOW) == 0
+    store.hit("counted", WINDOW)
+    store.hit("counted", WINDOW)
+    assert [round(store.count("counted", WINDOW)) for _ in range(3)] == [2, 2, 2]
+    store.reset("counted", WINDOW)
+
+
+def test_login_throttle_blocks_after_the_limit(store, app):
+    limiter = RateLimiter(store, {}, login_limit=(3, WINDOW))
+    with app.app_context():
+        for _ in range(3):
+            assert limiter.login_blocked("user", "a@example.com") is None
+            limiter.login_failed("user", "a@example.com")
+        assert limiter.login_blocked("user", "a@example.com") > 0
+        assert limiter.login_blocked("user", "b@example.com") is None
+        limiter.login_succeeded("user", "a@example.com")
+        assert limiter.login_blocked("user", "a@example.com") is None
+
+
+def test_login_check_writes_no_counter(app):
+    from models import RateLimitCounter
+
+    limiter = RateLimiter(SQLRateLimitStore(), {}, login_limit=(3, WINDOW))
+    with app.app_context():
+        before = RateLimitCounter.query.count()
+        for _ in range(5):
+            limiter.login_blocked("user", "nobody@example.com")
+        assert RateLimitCounter.query.count() == before
+
+
+def test_redis_counters_expire(redis_server):
+    store = RedisRateLimitStore(redis_server.url, prefix="expiry:")
+    store.hit("k", WINDOW)
+    key = next(key for key in redis_server.data if key.startswith(b"expiry:"))
+    assert 0 < store.client.ttl(key) <= WINDOW * 2
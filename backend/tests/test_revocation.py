@@ -0,0 +1,86 @@
+"""Revocation stores: expiry-ordered eviction in memory, and the SQL mirror shared between workers."""
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.revocation import MemoryRevocationStore, SQLRevocationStore
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app()
+
+
+def test_full_store_drops_expired_entries_before_live_ones():
+    store = MemoryRevocationStore(max_entries=2)
+    store.revoke("short", time.time() + 0.05)
+    store.revoke("long", time.time() + 3600)
+    time.sleep(0.1)
+
+    store.revoke("new", time.time() + 3600)
+    assert store.evictions == 0
+    assert store.is_revoked("long") and store.is_revoked("new") and not store.is_revoked("short")
+
+    # Nothing has expired now, so the least recently used entry goes.
+    store.revoke("newer", time.time() + 3600)
+    assert store.evictions == 1
+    assert not store.is_revoked("long") and store.is_revoked("new") and store.is_revoked("newer")
+
+
+def test_expiry_heap_stays_bounded():
+    store = MemoryRevocationStore(max_entries=10)
+    expires_at = time.time() + 3600
+    for _ in range(100):
+        store.revoke("synced-again", expires_at)
+    for i in range(1000):
+        store.revoke(f"jti-{i}", expires_at + i)
+    assert len(store) == 10
+    assert len(store._expiries) <= 2 * len(store) + 1
+
+
+def revoked_row(jti, revoked_at):
+    from models import RevokedToken
+
+    return RevokedToken(jti=jti, expires_at=datetime.utcnow() + timedelta(hours=1), revoked_at=revoked_at)
+
+
+def test_sql_store_sees_other_workers_revocations_after_a_sync(app):
+    from extensions import db
+
+    with app.app_context():
+        # Two workers sharing one database, each with its own mirror.
+        worker, other = SQLRevocationStore(sync_interval=3600), SQLRevocationStore(sync_interval=0)
+        jti = str(uuid.uuid4())
+        assert not worker.is_revoked(jti)  # first sync
+        other.revoke(jti, time.time() + 3600)
+        assert not worker.is_revoked(jti)  # until the next sync, as documented
+
+        worker._next_sync.clear()
+        assert worker.is_revoked(jti)
+
+        # Rows committed out of order, up to SYNC_OVERLAP before the last sync started, are still found.
+        synced_since = worker._synced_since["default"]
+        late = str(uuid.uuid4())
+        too_late = str(uuid.uuid4())
+        db.session.add(revoked_row(late, synced_since - SQLRevocationStore.SYNC_OVERLAP + timedelta(seconds=1)))
+        db.session.add(revoked_row(too_late, synced_since - SQLRevocationStore.SYNC_OVERLAP - timedelta(seconds=1)))
+        db.session.commit()
+        worker._next_sync.clear()
+        assert worker.is_revoked(late)
+        assert not worker.is_revoked(too_late)
+
+        # A fresh worker reads every live row.
+        assert SQLRevocationStore().is_revoked(too_late)
+
+
+def test_sql_store_checks_the_table_once_its_mirror_overflowed(app):
+    with app.app_context():
+        store = SQLRevocationStore(max_entries=1, sync_interval=3600)
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+        store.revoke(first, time.time() + 3600)
+        store.revoke(second, time.time() + 3600)
+        assert store.cache.evictions == 1
+        assert store.is_revoked(first) and store.is_revoked(second)
+        assert not store.is_revoked(str(uuid.uuid4()))
@@ -0,0 +1,52 @@
+"""Row and object serializers build the same dicts for any field list, and encode handles both JSON backends."""
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from utils import serialization
+from utils.serialization import DEFAULT_USER_FIELDS, USER_FIELDS, encode, object_serializer, row_serializer
+
+CREATED = datetime(2026, 1, 2, 3, 4, 5)
+USER = SimpleNamespace(id=7, profile_picture_url=None, first_name="Ada", last_name="Lovelace", email="ada@example.com",
+                       mobile_number="+15550000000", role="ADMIN", is_active=True, is_verified=False,
+                       created_at=CREATED)
+
+
+def as_row(names):
+    # Fields in order, then the cursor columns the list query appends.
+    return tuple(getattr(USER, USER_FIELDS[name]) for name in names) + (CREATED, USER.id)
+
+
+@pytest.mark.parametrize("names", [DEFAULT_USER_FIELDS, tuple(USER_FIELDS), ("email",), ("createdAt",),
+                                   ("id", "id"), ()])
+def test_rows_and_objects_serialize_alike(names):
+    expected = {name: getattr(USER, USER_FIELDS[name]) for name in names}
+    if "createdAt" in expected:
+        expected["createdAt"] = CREATED.isoformat()
+    assert row_serializer(names)(as_row(names)) == expected
+    assert object_serializer(names)(USER) == expected
+
+
+def test_missing_created_at_stays_null():
+    assert row_serializer(("id", "createdAt"))((1, None)) == {"id": 1, "createdAt": None}
+
+
+def test_unknown_fields_are_refused():
+    with pytest.raises(ValueError, match="__class__"):
+        row_serializer(("id", "__class__"))
+    with pytest.raises(ValueError, match="nope"):
+        object_serializer(("nope",))
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_encode_is_compact_json_with_either_backend(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    value = {"items": [object_serializer(tuple(USER_FIELDS))(USER)], "nextCursor": None}
+    encoded = encode(value)
+    assert isinstance(encoded, bytes) and b" " not in encoded.replace(b"+1555", b"")
+    assert json.loads(encoded) == value
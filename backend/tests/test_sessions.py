@@ -0,0 +1,85 @@
+"""Refresh rotation: each refresh token works once, and a copied one ends the whole session."""
+import threading
+import time
+
+import pytest
+
+from support import ADMIN_EMAIL, ADMIN_PASSWORD, bearer, login
+
+
+@pytest.fixture(scope="module")
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    # Tokens travel in headers only, so each request says exactly which one it presents.
+    return app.test_client(use_cookies=False)
+
+
+def refresh(client, refresh_token):
+    return client.post("/api/auth/refresh", headers=bearer(refresh_token))
+
+
+def test_refresh_rotates_the_pair(client):
+    tokens = login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)
+    response = refresh(client, tokens["refreshToken"])
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated["refreshToken"] != tokens["refreshToken"] and rotated["role"] == "ADMIN"
+    assert client.get("/api/auth/check", headers=bearer(rotated["accessToken"])).status_code == 200
+    assert refresh(client, rotated["refreshToken"]).status_code == 200
+
+
+def test_replay_after_the_grace_window_revokes_the_family(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    tokens = login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)
+    rotated = refresh(client, tokens["refreshToken"]).get_json()
+    time.sleep(0.01)
+
+    assert refresh(client, tokens["refreshToken"]).status_code == 401
+    # Nobody keeps the session: not the copy, and not the client holding the latest pair.
+    assert refresh(client, rotated["refreshToken"]).status_code == 401
+    assert client.get("/api/auth/check", headers=bearer(rotated["accessToken"])).status_code == 401
+
+
+def test_replay_within_the_grace_window_is_tolerated(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "REFRESH_REUSE_GRACE_SECONDS", 60)
+    tokens = login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)
+    rotated = refresh(client, tokens["refreshToken"]).get_json()
+
+    assert refresh(client, tokens["refreshToken"]).status_code == 409
+    assert client.get("/api/auth/check", headers=bearer(rotated["accessToken"])).status_code == 200
+    assert refresh(client, rotated["refreshToken"]).status_code == 200
+
+
+def test_concurrent_rotations_have_one_winner(app, client, monkeypatch):
+    from flask_jwt_extended import decode_token
+
+    from utils import sessions
+
+    tokens = login(client, "admin", ADMIN_EMAIL, ADMIN_PASSWORD)
+    with app.app_context():
+        token = decode_token(tokens["refreshToken"])
+
+    # Both requests read the session before either writes it.
+    both_read = threading.Barrier(2, timeout=10)
+    mint = sessions._mint
+    monkeypatch.setattr(sessions, "_mint", lambda *args: both_read.wait() is None or mint(*args))
+    results = []
+
+    def rotate():
+        with app.app_context():
+            results.append(sessions.rotate_session(token))
+
+    threads = [threading.Thread(target=rotate) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(status for status, _ in results) == ["ok", "superseded"]
+    winner = next(tokens for status, tokens in results if status == "ok")
+    monkeypatch.setattr(sessions, "_mint", mint)
+    assert refresh(client, winner["refreshToken"]).status_code == 200
@@ -0,0 +1,67 @@
+"""Requests for tenants that are not configured are refused, and one failing tenant cannot stop a job."""
+import pytest
+from sqlalchemy import func, select
+
+from support import USER_PASSWORD
+
+TENANTS = ("default", "acme", "globex")
+
+
+@pytest.fixture(scope="module")
+def app(make_app, tmp_path_factory):
+    workdir = tmp_path_factory.mktemp("tenants")
+    return make_app(TENANT_DATABASES=f"acme=sqlite:///{workdir / 'acme.db'};globex=sqlite:///{workdir / 'globex.db'}")
+
+
+@pytest.mark.parametrize("tenant, status", [("acme", 200), ("nope", 404), ("ACME", 404)])
+def test_unknown_tenants_get_404(app, tenant, status):
+    response = app.test_client().get("/api/health", headers={"X-Tenant": tenant})
+    assert response.status_code == status
+    if status == 404:
+        assert response.get_json() == {"message": "Unknown tenant"}
+
+
+def test_unknown_tenant_is_refused_before_login(app):
+    response = app.test_client().post("/api/auth/user-login", headers={"X-Tenant": "nope"},
+                                      json={"email": "someone@example.com", "password": USER_PASSWORD})
+    assert response.status_code == 404
+
+
+def users_named(tenant, last_name):
+    from extensions import db, tenant_context
+    from models import User
+
+    with tenant_context(tenant):
+        return db.session.scalar(select(func.count()).select_from(User).where(User.last_name == last_name))
+
+
+def test_a_failing_tenant_does_not_stop_the_others(app):
+    from extensions import current_tenant, db
+    from models import User
+    from utils.maintenance import PeriodicTasks
+    from utils.tenants import for_each_tenant
+
+    visited = []
+
+    def add_user():
+        tenant = current_tenant()
+        visited.append(tenant)
+        db.session.add(User(first_name="Job", last_name="Tenant", email=f"job@{tenant}.example.com", role="USER",
+                            password_hash="x"))
+        db.session.flush()
+        if tenant == "acme":
+            raise RuntimeError("acme database is down")
+        db.session.commit()
+        return 1
+
+    tasks = PeriodicTasks(app)
+    tasks.register("add_user", 60, for_each_tenant(add_user))
+    [job] = tasks.tasks
+    assert tasks.run(job)
+
+    assert visited == list(TENANTS)
+    assert job.last_processed == 2
+    assert job.failures == 1 and job.last_error == "acme: acme database is down"
+    with app.app_context():
+        # The failed tenant's half-done work was rolled back; the others committed.
+        assert {tenant: users_named(tenant, "Tenant") for tenant in TENANTS} == {"default": 1, "acme": 0, "globex": 1}
@@ -0,0 +1,74 @@
+"""Async engines and sessions on the same databases as ``db``, for asgi.py.
+
+Every bind the app configures (the primary, the read replica and each tenant
+database) gets an engine on the asyncio driver for its backend
+(``ASYNC_DRIVERS``), with the pool settings and SQLite pragmas of its
+``db`` engine. The routes asgi.py serves on the event loop run their queries
+through ``AsyncDatabase.session``, so a request waiting on the database holds
+a pooled connection but no thread::
+
+    async_db = AsyncDatabase(app)
+    async with async_db.session(tenant) as session:
+        row = (await session.execute(statement)).first()
+    ...
+    await async_db.dispose()  # on shutdown
+
+Pooled connections belong to the event loop that opened them; one loop per
+process (uvicorn's) uses them.
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from extensions import DEFAULT_TENANT, REPLICA_BIND, apply_sqlite_pragmas, db, tenant_bind
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql", "mariadb": "aiomysql"}
+
+
+def async_url(database_url):
+    """``database_url`` on the asyncio driver for its backend."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver for {backend} databases")
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        # A second connection to :memory: opens an empty database.
+        raise ValueError("In-memory SQLite databases cannot be shared with an async engine")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+class AsyncDatabase:
+    def __init__(self, app):
+        config = app.config
+        options = {None: config["SQLALCHEMY_ENGINE_OPTIONS"]}
+        options.update({key: {k: v for k, v in bind.items() if k != "url"}
+                        for key, bind in config["SQLALCHEMY_BINDS"].items()})
+        with app.app_context():
+            # db.engines hold the URLs as Flask-SQLAlchemy resolved them (relative SQLite paths).
+            urls = {key: engine.url for key, engine in db.engines.items()}
+        self.engines = {}
+        for key, url in urls.items():
+            url = async_url(url)
+            if url.get_backend_name() == "sqlite":
+                # aiosqlite defaults to opening a connection per session; pool them like the sync engines.
+                engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool, **options[key])
+                apply_sqlite_pragmas(engine.sync_engine, config)
+            else:
+                engine = create_async_engine(url, **options[key])
+            self.engines[key] = engine
+
+    def engine(self, tenant=DEFAULT_TENANT, replica=False):
+        """Engine for ``tenant``; the default tenant reads from the replica when asked and one is configured."""
+        if tenant != DEFAULT_TENANT:
+            return self.engines[tenant_bind(tenant)]
+        if replica and REPLICA_BIND in self.engines:
+            return self.engines[REPLICA_BIND]
+        return self.engines[None]
+
+    def session(self, tenant=DEFAULT_TENANT, replica=False):
+        """A new ``AsyncSession`` on ``tenant``'s database; use it as an async context manager."""
+        return AsyncSession(self.engine(tenant, replica), expire_on_commit=False)
+
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
@@ -0,0 +1,184 @@
+"""Structured auth events: logins, OTP checks, refreshes and admin changes.
+
+Handlers call ``record()``, which only appends to a bounded in-memory ring
+buffer. A background thread drains it in batches into the append-only
+``auth_event`` table (``AUDIT_SINK=sql``, searchable through
+``GET /api/admin/events``) or into size-rotated JSONL segment files
+(``AUDIT_SINK=jsonl``). Events are tagged with the tenant they happened in;
+the SQL sink writes each into that tenant's database. When writes fall behind, the oldest buffered events
+are overwritten and counted in ``dropped``. Events still in the buffer when
+the process dies are lost.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import insert
+
+from extensions import current_tenant, tenant_engine
+from models import AuthEvent
+
+
+class SQLEventSink:
+    """Batched multi-row inserts into each tenant's ``auth_event``; rows are never updated."""
+
+    searchable = True
+
+    def write(self, events):
+        by_tenant = defaultdict(list)
+        for event in events:
+            row = {**event, 'created_at': datetime.utcfromtimestamp(event['created_at']),
+                   'detail': json.dumps(event['detail']) if event['detail'] else None}
+            by_tenant[row.pop('tenant')].append(row)
+        for tenant, rows in by_tenant.items():
+            with tenant_engine(tenant).begin() as conn:
+                conn.execute(insert(AuthEvent), rows)
+
+
+class JSONLEventSink:
+    """One JSON object per line in ``events-<epoch ms>-<pid>.jsonl``; a new segment starts past ``segment_bytes``."""
+
+    searchable = False
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._path = None
+
+    def write(self, events):
+        if self._path is None or os.path.getsize(self._path) >= self.segment_bytes:
+            os.makedirs(self.directory, exist_ok=True)
+            # The pid keeps workers sharing the directory out of each other's files.
+            self._path = os.path.join(self.directory, f"events-{int(time.time() * 1000)}-{os.getpid()}.jsonl")
+        with open(self._path, "a") as handle:
+            handle.write("".join(json.dumps(event, separators=(",", ":")) + "\n" for event in events))
+
+
+class AuditLog:
+    def __init__(self, app, sink, capacity=10000, batch_size=500, flush_interval=1.0):
+        self.app = app
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, event_type, success=True, subject_type=None, subject_id=None, email=None,
+               actor_id=None, **detail):
+        event = {
+            'created_at': time.time(),
+            'event_type': event_type,
+            'success': success,
+            'subject_type': subject_type,
+            'subject_id': subject_id,
+            'email': email,
+            'actor_id': actor_id,
+            'ip': request.remote_addr if has_request_context() else None,
+            'tenant': current_tenant(),
+            'detail': detail or None,
+        }
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1  # the append below overwrites the oldest event
+            self._buffer.append(event)
+            self.recorded += 1
+            backlog = len(self._buffer)
+        if backlog >= self.batch_size:
+            self._wake.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush(self):
+        """Write everything buffered on the calling thread; returns the number of events written."""
+        written = 0
+        with self.app.app_context():
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return written
+                try:
+                    self.sink.write(batch)
+                except Exception as e:
+                    # Not retried: a sink that keeps failing would otherwise pin the buffer full.
+                    with self._lock:
+                        self.failed_batches += 1
+                        self.dropped += len(batch)
+                    print(f"Audit log write failed, {len(batch)} events dropped: {e}")
+                    continue
+                self.written += len(batch)
+                written += len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+        self.flush()
+
+    def stats(self):
+        return {
+            "sink": type(self.sink).__name__,
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+        }
+
+
+def init_app(app):
+    backend = app.config.get("AUDIT_SINK", "sql")
+    if backend == "sql":
+        sink = SQLEventSink()
+    elif backend == "jsonl":
+        sink = JSONLEventSink(app.config["AUDIT_DIR"], app.config.get("AUDIT_SEGMENT_BYTES", 64 * 1024 * 1024))
+    else:
+        raise ValueError(f"Unknown AUDIT_SINK '{backend}'")
+    log = AuditLog(
+        app,
+        sink,
+        capacity=app.config.get("AUDIT_BUFFER_SIZE", 10000),
+        batch_size=app.config.get("AUDIT_BATCH_SIZE", 500),
+        flush_interval=app.config.get("AUDIT_FLUSH_SECONDS", 1.0),
+    )
+    app.extensions["audit_log"] = log
+    return log
+
+
+def get_audit_log():
+    return current_app.extensions["audit_log"]
+
+
+def record(event_type, **fields):
+    """Queue one auth event; never blocks on I/O."""
+    log = get_audit_log()
+    log.record(event_type, **fields)
+    log.start()
@@ -0,0 +1,115 @@
+import hashlib
+import math
+import threading
+import time
+
+
+class BloomFilter:
+    def __init__(self, size_bytes, hash_count=7):
+        self.size_bits = max(size_bytes, 1) * 8
+        self.hash_count = hash_count
+        self._bits = bytearray(max(size_bytes, 1))
+
+    def _positions(self, key):
+        # Kirsch-Mitzenmacher double hashing from a single 128-bit digest.
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hash_count)]
+
+    def contains_positions(self, positions):
+        bits = self._bits
+        for pos in positions:
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return self.contains_positions(self._positions(key))
+
+
+class RotatingBloomFilter:
+    """Bloom filters bucketed by key expiry time.
+
+    Each key lands in the bucket covering its expiry; a bucket is dropped as
+    soon as everything in it has expired, which is how keys leave the filter
+    without ever deleting bits. ``memory_budget`` bytes are split evenly across
+    the buckets needed to cover ``max_ttl`` seconds.
+
+    Callers that know the key's expiry (a JWT carries its own ``exp``) should
+    pass it to ``might_contain`` so only one bucket is probed.
+    """
+
+    def __init__(self, memory_budget, max_ttl, bucket_seconds=3600, hash_count=7):
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = math.ceil(max_ttl / bucket_seconds) + 1
+        self.bucket_bytes = max(memory_budget // self.bucket_count, 64)
+        self.hash_count = hash_count
+        self._buckets = {}  # bucket index -> BloomFilter
+        self._live = ()  # snapshot read without locking on the hot path
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.negatives = 0
+        self.false_positives = 0
+
+    def add(self, key, expires_at):
+        index = int(expires_at // self.bucket_seconds)
+        with self._lock:
+            bucket = self._buckets.get(index)
+            if bucket is None:
+                bucket = self._buckets[index] = BloomFilter(self.bucket_bytes, self.hash_count)
+                self._rotate()
+            bucket.add(key)
+
+    def might_contain(self, key, expires_at=None):
+        self.checks += 1
+        live = self._live
+        if live and live[0][0] < time.time():
+            with self._lock:
+                self._rotate()
+            live = self._live
+
+        if expires_at is not None:
+            bucket = self._buckets.get(int(expires_at // self.bucket_seconds))
+            if bucket is not None and key in bucket:
+                return True
+            self.negatives += 1
+            return False
+
+        if live:
+            positions = live[0][1]._positions(key)
+            for _, bucket in live:
+                if bucket.contains_positions(positions):
+                    return True
+        self.negatives += 1
+        return False
+
+    def record_false_positive(self):
+        self.false_positives += 1
+
+    def _rotate(self):
+        now = time.time()
+        for index in [i for i in self._buckets if (i + 1) * self.bucket_seconds <= now]:
+            del self._buckets[index]
+        # Ordered by bucket end time so expiry checks only look at the head.
+        self._live = tuple(
+            ((index + 1) * self.bucket_seconds, bucket) for index, bucket in sorted(self._buckets.items())
+        )
+
+    def stats(self):
+        checks, negatives, false_positives = self.checks, self.negatives, self.false_positives
+        positives = checks - negatives
+        return {
+            "buckets": len(self._live),
+            "memory_bytes": len(self._live) * self.bucket_bytes,
+            "checks": checks,
+            "fast_path_hits": negatives,
+            "positives": positives,
+            "false_positives": false_positives,
+            "hit_rate": round(negatives / checks, 4) if checks else 0.0,
+            "false_positive_rate": round(false_positives / positives, 4) if positives else 0.0,
+        }
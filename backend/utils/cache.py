@@ -0,0 +1,126 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from extensions import current_tenant
+
+
+class TTLCache:
+    """Per-process LRU whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, max_entries=10000, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class RedisCache:
+    """Cache shared by all workers, so an invalidation in one is seen by every other.
+
+    Values must be JSON serialisable.
+    """
+
+    def __init__(self, url, ttl=30.0, prefix="cache:"):
+        import redis  # optional dependency, only needed for CACHE_BACKEND=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), px=int(self.ttl * 1000))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_cache(app, ttl, max_entries, prefix):
+    """A cache on the configured CACHE_BACKEND; ``prefix`` keeps Redis keys apart."""
+    backend = app.config.get("CACHE_BACKEND", "memory")
+    if backend == "memory":
+        return TTLCache(max_entries, ttl)
+    if backend == "redis":
+        return RedisCache(app.config["REDIS_URL"], ttl, prefix=prefix)
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'")
+
+
+def init_app(app):
+    cache = build_cache(
+        app,
+        app.config.get("PROFILE_CACHE_TTL_SECONDS", 30.0),
+        app.config.get("PROFILE_CACHE_SIZE", 10000),
+        prefix="profile:",
+    )
+    app.extensions["profile_cache"] = cache
+    return cache
+
+
+def get_profile_cache():
+    return current_app.extensions["profile_cache"]
+
+
+def profile_key(user_id):
+    """Cache key of a user's profile; user ids repeat across tenant databases."""
+    return f"{current_tenant()}:{user_id}"
+
+
+def invalidate_profile(user_id):
+    get_profile_cache().delete(profile_key(user_id))
@@ -1,6 +1,19 @@
+import logging
 import os
 import smtplib
-from email.mime.text import MIMEText
+
+from flask import has_app_context
+
+from utils.mail_queue import build_message, get_dispatcher
+from utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+def _log_mock(to_email, subject, body):
+    # Bodies carry OTP codes: only debug logging shows them.
+    logger.info("Mock email to %s: %s", to_email, subject)
+    logger.debug("Mock email body:\n%s", body)
 
 
 def send_email(to_email: str, subject: str, body: str) -> None:
@@ -16,22 +29,26 @@ def send_email(to_email: str, subject: str, body: str) -> None:
     use_tls = os.getenv("MAIL_USE_TLS", "true").lower() == "true"
 
     if not host or not username or not password:
-        # Fallback: print to console in dev
-        print(f"[EMAIL MOCK] To: {to_email}\nSubject: {subject}\n\n{body}")
+        _log_mock(to_email, subject, body)  # dev fallback
         return
 
     try:
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = username
-        msg["To"] = to_email
+        msg = build_message(username, to_email, subject, body)
 
-        with smtplib.SMTP(host, port) as server:
+        with span("send_email"), smtplib.SMTP(host, port) as server:
             if use_tls:
                 server.starttls()
             server.login(username, password)
             server.send_message(msg)
-    except Exception as e:
-        print(f"Email error: {e}")
-        # Fallback: print to console in dev
-        print(f"[EMAIL MOCK] To: {to_email}\nSubject: {subject}\n\n{body}")
+    except Exception:
+        logger.exception("Email error")
+        _log_mock(to_email, subject, body)
+
+
+def queue_email(to_email: str, subject: str, body: str) -> None:
+    """Spool a message for the background dispatcher; sends inline outside an app."""
+    dispatcher = get_dispatcher() if has_app_context() else None
+    if dispatcher is None:
+        send_email(to_email, subject, body)
+        return
+    dispatcher.enqueue(str(to_email or ""), str(subject or ""), str(body or ""))
@@ -0,0 +1,193 @@
+"""A minimal in-process server speaking the Redis protocol (RESP), kept in memory.
+
+It implements the commands the ``redis`` backends use (strings, counters,
+expiry and MULTI/EXEC), so CACHE_BACKEND=redis and RATELIMIT_STORAGE=redis
+can be exercised locally through the real client without a Redis server::
+
+    server = FakeRedisServer().start()
+    ...
+    server.url   # redis://127.0.0.1:<port>/0
+    server.data  # {key: value bytes}
+    server.stop()
+
+Every connection shares one keyspace and commands run one at a time under a
+lock, so a transaction is as atomic as it is on Redis.
+"""
+import socketserver
+import threading
+import time
+
+
+class _Error(Exception):
+    pass
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # inline command, as typed into telnet
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, value):
+        if isinstance(value, _Error):
+            return f"-ERR {value}\r\n".encode()
+        if value is True:
+            return b"+OK\r\n"
+        if isinstance(value, str):
+            return f"+{value}\r\n".encode()
+        if isinstance(value, int):
+            return f":{value}\r\n".encode()
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, list):
+            return f"*{len(value)}\r\n".encode() + b"".join(self.encode(item) for item in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        server = self.server.fake
+        with server.lock:
+            server.connections += 1
+        queued = None
+        while True:
+            args = self.read_command()
+            if not args:
+                return
+            name = args[0].decode().upper()
+            if name == "QUIT":
+                self.wfile.write(self.encode(True))
+                return
+            if name == "MULTI":
+                queued, reply = [], True
+            elif name == "DISCARD":
+                queued, reply = None, True
+            elif name == "EXEC":
+                with server.lock:
+                    reply = [server.execute(*command) for command in queued or ()]
+                queued = None
+            elif queued is not None:
+                queued.append((name, args[1:]))
+                reply = "QUEUED"
+            else:
+                with server.lock:
+                    reply = server.execute(name, args[1:])
+            self.wfile.write(self.encode(reply))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeRedisServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = _Server((host, port), _RESPHandler)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address
+        self.url = f"redis://{self.host}:{self.port}/0"
+        self.data = {}
+        self.expires = {}  # key -> time.monotonic() deadline
+        self.commands = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _get(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _expire(self, key, seconds):
+        if self._get(key) is None:
+            return 0
+        self.expires[key] = time.monotonic() + seconds
+        return 1
+
+    def execute(self, name, args):
+        """Run one command against the keyspace; the caller holds ``lock``."""
+        self.commands += 1
+        try:
+            if name == "PING":
+                return args[0] if args else "PONG"
+            if name in ("SELECT", "CLIENT"):
+                return True
+            if name == "GET":
+                return self._get(args[0])
+            if name == "MGET":
+                return [self._get(key) for key in args]
+            if name == "SET":
+                key, value, options = args[0], args[1], [arg.decode().upper() for arg in args[2:]]
+                self.data[key] = value
+                self.expires.pop(key, None)
+                for option, amount in zip(options, options[1:]):
+                    if option in ("EX", "PX"):
+                        self.expires[key] = time.monotonic() + int(amount) / (1 if option == "EX" else 1000)
+                return True
+            if name in ("INCR", "INCRBY"):
+                key = args[0]
+                current = self._get(key)
+                if current is not None and not current.lstrip(b"-").isdigit():
+                    raise _Error("value is not an integer or out of range")
+                value = int(current or 0) + (int(args[1]) if name == "INCRBY" else 1)
+                self.data[key] = str(value).encode()
+                return value
+            if name == "EXPIRE":
+                return self._expire(args[0], int(args[1]))
+            if name == "PEXPIRE":
+                return self._expire(args[0], int(args[1]) / 1000)
+            if name == "TTL":
+                if self._get(args[0]) is None:
+                    return -2
+                deadline = self.expires.get(args[0])
+                return -1 if deadline is None else round(deadline - time.monotonic())
+            if name in ("DEL", "UNLINK"):
+                removed = 0
+                for key in args:
+                    removed += self._get(key) is not None
+                    self.data.pop(key, None)
+                    self.expires.pop(key, None)
+                return removed
+            if name in ("FLUSHDB", "FLUSHALL"):
+                self.data.clear()
+                self.expires.clear()
+                return True
+            if name == "DBSIZE":
+                return sum(self._get(key) is not None for key in list(self.data))
+            raise _Error(f"unknown command '{name}'")
+        except (IndexError, ValueError):
+            return _Error(f"wrong arguments for '{name}' command")
+        except _Error as e:
+            return e
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local in-memory Redis stand-in.")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+    server = FakeRedisServer(port=args.port).start()
+    print(f"Fake Redis listening on {server.url}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{len(server.data)} keys, {server.commands} commands over {server.connections} connections")
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Named pbkdf2_sha256 cost profiles. "low" matches passlib's built-in default,
+# which every hash created before profiles existed uses, so raising the
+# profile upgrades those hashes as their owners log in.
+HASH_PROFILES = {
+    "low": 29000,
+    "medium": 100000,
+    "high": 310000,
+    "paranoid": 600000,
+}
+DEFAULT_PROFILE = "low"
+
+
+class HashingUnavailable(Exception):
+    """Raised when a password hash cannot be computed in time; mapped to 503."""
+
+
+class HashingBusy(HashingUnavailable):
+    pass
+
+
+class HashingTimeout(HashingUnavailable):
+    pass
+
+
+_contexts = {}
+
+
+def build_context(rounds):
+    # Hashes below ``rounds`` are reported as needing an update, so logins
+    # transparently move old hashes onto the current profile.
+    context = _contexts.get(rounds)
+    if context is None:
+        from passlib.context import CryptContext  # deferred: only hashing calls and pool workers need it
+
+        context = CryptContext(
+            schemes=["pbkdf2_sha256"],
+            pbkdf2_sha256__default_rounds=rounds,
+            pbkdf2_sha256__min_rounds=rounds,
+        )
+        _contexts[rounds] = context
+    return context
+
+
+def resolve_rounds(profile=None, rounds=None):
+    if rounds:
+        return int(rounds)
+    profile = profile or DEFAULT_PROFILE
+    if profile not in HASH_PROFILES:
+        raise ValueError(f"Unknown hash profile '{profile}'. Choose from: {', '.join(HASH_PROFILES)}")
+    return HASH_PROFILES[profile]
+
+
+# Worker-side functions must be module level so they can be pickled.
+def _hash(password, rounds):
+    return build_context(rounds).hash(password)
+
+
+def _verify_and_update(password, password_hash, rounds):
+    return build_context(rounds).verify_and_update(password, password_hash)
+
+
+def _hash_many(passwords, rounds):
+    context = build_context(rounds)
+    return [context.hash(password) for password in passwords]
+
+
+class HashingPool:
+    """Process pool for PBKDF2 work with a bounded queue.
+
+    At most ``queue_size`` calls may be pending (queued or running) at once;
+    further calls fail fast with ``HashingBusy`` instead of piling up behind
+    the workers. Setting ``workers`` to 0 hashes inline on the caller thread.
+    """
+
+    def __init__(self, workers=None, queue_size=None, deadline=5.0):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = queue_size or max(self.workers * 4, 1)
+        self.deadline = deadline
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _get_executor(self):
+        # Created lazily so every gunicorn worker forks its own pool.
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _release(self, started):
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self._pending -= 1
+            self._completed += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+        self._slots.release()
+
+    def _acquire(self, timeout=None):
+        if timeout is None:
+            acquired = self._slots.acquire(blocking=False)
+        else:
+            acquired = self._slots.acquire(timeout=timeout)
+        if not acquired:
+            with self._stats_lock:
+                self._rejected += 1
+            raise HashingBusy("Password hashing queue is full")
+        with self._stats_lock:
+            self._pending += 1
+        return time.perf_counter()
+
+    def _submit(self, fn, args, started):
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died; drop the pool so the next call starts a fresh one.
+            self._executor = None
+            self._release(started)
+            raise HashingUnavailable("Password hashing pool is restarting")
+        except Exception:
+            self._release(started)
+            raise
+        # The slot is only freed once the worker finishes, even if the caller
+        # gave up waiting, so the queue bound reflects real pool load.
+        future.add_done_callback(lambda _f: self._release(started))
+        return future
+
+    def _result(self, future, deadline):
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeout:
+            future.cancel()
+            with self._stats_lock:
+                self._timeouts += 1
+            raise HashingTimeout("Password hashing deadline exceeded")
+        except BrokenProcessPool:
+            self._executor = None
+            raise HashingUnavailable("Password hashing pool is restarting")
+
+    def run(self, fn, *args, deadline=None):
+        started = self._acquire()
+        if self.workers == 0:
+            try:
+                return fn(*args)
+            finally:
+                self._release(started)
+        return self._result(self._submit(fn, args, started), deadline or self.deadline)
+
+    async def run_async(self, fn, *args, deadline=None):
+        """``run`` for the event loop: awaits the worker instead of blocking a thread on it."""
+        started = self._acquire()
+        if self.workers == 0:
+            # Inline hashing would stall the loop, so it gets the loop's default thread pool instead.
+            try:
+                return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+            finally:
+                self._release(started)
+        future = self._submit(fn, args, started)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline or self.deadline)
+        except asyncio.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise HashingTimeout("Password hashing deadline exceeded")
+        except BrokenProcessPool:
+            self._executor = None
+            raise HashingUnavailable("Password hashing pool is restarting")
+
+    def map(self, fn, chunks, *args):
+        """Run ``fn(chunk, *args)`` for every chunk, in order, for batch jobs.
+
+        Unlike ``run`` this waits for queue slots, but keeps no more chunks in
+        flight than there are workers so interactive calls still get through.
+        The deadline applies per item in a chunk.
+        """
+        results = []
+        in_flight = deque()
+        for chunk in chunks:
+            if self.workers and len(in_flight) >= self.workers:
+                future, size = in_flight.popleft()
+                results.append(self._result(future, self.deadline * size))
+            started = self._acquire(timeout=self.deadline)
+            if self.workers == 0:
+                try:
+                    results.append(fn(chunk, *args))
+                finally:
+                    self._release(started)
+                continue
+            in_flight.append((self._submit(fn, (chunk,) + args, started), len(chunk)))
+        while in_flight:
+            future, size = in_flight.popleft()
+            results.append(self._result(future, self.deadline * size))
+        return results
+
+    def stats(self):
+        with self._stats_lock:
+            completed = self._completed
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "queue_depth": self._pending,
+                "completed": completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "latency_avg_ms": round(self._latency_total / completed * 1000, 2) if completed else 0.0,
+                "latency_max_ms": round(self._latency_max * 1000, 2),
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool = HashingPool(workers=0)
+_rounds = resolve_rounds()
+
+
+def init_app(app):
+    global _pool, _rounds
+    _rounds = resolve_rounds(app.config.get("HASH_PROFILE"), app.config.get("HASH_ROUNDS"))
+    _pool.shutdown()
+    _pool = HashingPool(
+        workers=app.config.get("HASH_POOL_WORKERS"),
+        queue_size=app.config.get("HASH_POOL_QUEUE_SIZE"),
+        deadline=app.config.get("HASH_DEADLINE_SECONDS", 5.0),
+    )
+    app.extensions["hashing_pool"] = _pool
+
+
+def get_pool():
+    return _pool
+
+
+def get_rounds():
+    return _rounds
+
+
+def hash_password(password):
+    return _pool.run(_hash, password, _rounds)
+
+
+def hash_passwords(passwords, chunk_size=8):
+    """Hash many passwords across the pool; results keep the input order."""
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    return [hashed for chunk in _pool.map(_hash_many, chunks, _rounds) for hashed in chunk]
+
+
+def verify_password(password, password_hash):
+    """Return ``(ok, new_hash)``; ``new_hash`` is set when the stored hash is outdated."""
+    return _pool.run(_verify_and_update, password, password_hash, _rounds)
+
+
+async def verify_password_async(password, password_hash):
+    """``verify_password`` for coroutines (asgi.py)."""
+    return await _pool.run_async(_verify_and_update, password, password_hash, _rounds)
@@ -0,0 +1,92 @@
+"""Live account status for every authenticated request.
+
+A token says who the caller is; whether that account may still act is looked
+up in a small cache of ``{"active", "role", "version"}`` per account, from the
+JWT user loader, so a deactivated admin or user is refused even while their
+token is valid. Access tokens carry the account's ``token_version`` in the
+``ver`` claim, and bumping it (password change, deactivation, role change,
+signing out everywhere) rejects every token issued before. Tokens also carry
+the ``tenant`` they were issued for and are refused under any other.
+
+Entries live for IDENTITY_CACHE_TTL_SECONDS. Changes made through the admin
+API invalidate the entry at once; changes made on another worker with the
+memory backend, or directly in the database, apply when it expires.
+"""
+from flask import current_app, jsonify
+from sqlalchemy import select
+
+from extensions import DEFAULT_TENANT, current_tenant, db
+from models import Admin, User
+from utils.cache import build_cache
+
+_MISSING = {"active": False, "role": None, "version": -1}
+
+
+def _key(subject_type, subject_id):
+    return f"{current_tenant()}:{subject_type}:{subject_id}"
+
+
+def _load(subject_type, subject_id):
+    if subject_type == "user":
+        row = db.session.execute(
+            select(User.is_active, User.token_version, User.role).where(User.id == subject_id)
+        ).first()
+    elif subject_type == "admin":
+        row = db.session.execute(
+            select(Admin.is_active, Admin.token_version).where(Admin.id == subject_id)
+        ).first()
+    else:
+        return None
+    if row is None:
+        return _MISSING  # cached too, so tokens of deleted accounts cost no queries
+    return {"active": bool(row[0]), "version": row[1], "role": row[2] if subject_type == "user" else "ADMIN"}
+
+
+def get_identity(subject_type, subject_id):
+    """Cached status of one account, or None for an unknown subject type."""
+    cache = current_app.extensions["identity_cache"]
+    key = _key(subject_type, subject_id)
+    status = cache.get(key)
+    if status is None:
+        status = _load(subject_type, subject_id)
+        if status is not None:
+            cache.set(key, status)
+    return status
+
+
+def invalidate_identity(subject_type, subject_id):
+    """Drop the cached status; call after committing a change to the account."""
+    current_app.extensions["identity_cache"].delete(_key(subject_type, subject_id))
+
+
+def bump_token_version(account):
+    """Reject every token issued to ``account`` so far, once the caller commits."""
+    account.token_version = type(account).token_version + 1
+
+
+def init_app(app, jwt):
+    cache = build_cache(
+        app,
+        app.config.get("IDENTITY_CACHE_TTL_SECONDS", 5.0),
+        app.config.get("IDENTITY_CACHE_SIZE", 10000),
+        prefix="identity:",
+    )
+    app.extensions["identity_cache"] = cache
+
+    @jwt.user_lookup_loader
+    def load_identity(jwt_header, jwt_data):
+        if jwt_data.get("tenant", DEFAULT_TENANT) != current_tenant():
+            return None  # ids are per tenant database: the same sub is someone else here
+        subject_type = jwt_data.get("type")
+        if subject_type == "refresh":
+            return {}  # rotate_session() checks the account when it rotates
+        status = get_identity(subject_type, jwt_data["sub"])
+        if status is None or not status["active"] or status["version"] != jwt_data.get("ver", 0):
+            return None
+        return status
+
+    @jwt.user_lookup_error_loader
+    def identity_rejected(jwt_header, jwt_data):
+        return jsonify({"message": "Token is no longer valid"}), 401
+
+    return cache
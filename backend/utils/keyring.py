@@ -0,0 +1,239 @@
+"""Asymmetric JWT signing keys with rotation, published as a JWKS.
+
+Keys live as PKCS#8 PEM files named ``<kid>.pem`` in JWT_KEY_DIR, where the
+kid is the key's creation time in epoch seconds. Every worker (and every host,
+if the directory is shared) reads the same files, so they all sign with the
+same key and can verify each other's tokens. A new key is published in the
+JWKS for ``publish_ahead`` seconds before anything is signed with it, which
+gives downstream caches time to pick it up; a replaced key stays published
+until every token it signed has expired.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import Response, current_app, request
+from jwt.exceptions import DecodeError
+
+ALGORITHMS = ("RS256", "EdDSA")
+
+
+def _generate_private_key(algorithm):
+    if algorithm == "RS256":
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    return ed25519.Ed25519PrivateKey.generate()
+
+
+def _public_jwk(kid, algorithm, public_key):
+    from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+    converter = RSAAlgorithm if algorithm == "RS256" else OKPAlgorithm
+    return {**converter.to_jwk(public_key, as_dict=True), "kid": kid, "alg": algorithm, "use": "sig"}
+
+
+class KeyRing:
+    def __init__(self, directory, algorithm="RS256", rotation_seconds=30 * 86400,
+                 publish_ahead=600, max_token_lifetime=7 * 86400):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported JWT_ALGORITHM '{algorithm}', expected one of {ALGORITHMS}")
+        self.directory = directory
+        self.algorithm = algorithm
+        # Whole seconds: kids are integer file names, and reload() skips anything else.
+        self.rotation_seconds = int(rotation_seconds)
+        self.publish_ahead = publish_ahead
+        self.max_token_lifetime = max_token_lifetime
+        self.rotations = 0
+        self._keys = {}  # kid -> (private key, public key); parsed once per file
+        self._jwks = None  # (body, etag), rebuilt when the key set changes
+        self._signing = None
+        self._last_reload = 0.0
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        # Keys are read (or the first one generated) on first use rather than
+        # at app creation, so booting a worker does no key I/O.
+        if self._last_reload:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.reload()
+        if not self._keys:
+            self._create(int(time.time()))
+            self.reload()
+
+    def _path(self, kid):
+        return os.path.join(self.directory, f"{kid}.pem")
+
+    def _create(self, created):
+        """Write a new key; returns False if another worker already created this kid."""
+        from cryptography.hazmat.primitives import serialization
+
+        pem = _generate_private_key(self.algorithm).private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+        tmp = os.path.join(self.directory, f".{created}.{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(pem)
+        try:
+            os.link(tmp, self._path(created))  # atomic and fails if the kid exists
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp)
+
+    def reload(self):
+        """Pick up keys added or removed by other workers; unchanged files are not re-parsed."""
+        from cryptography.hazmat.primitives import serialization
+
+        kids = sorted(
+            (name[:-4] for name in os.listdir(self.directory) if name.endswith(".pem") and name[:-4].isdigit()),
+            key=int,
+        )
+        keys = {}
+        for kid in kids:
+            if kid in self._keys:
+                keys[kid] = self._keys[kid]
+                continue
+            try:
+                with open(self._path(kid), "rb") as handle:
+                    # Our own keys from a 0600 directory; the RSA consistency check costs ~50 ms per key.
+                    private = serialization.load_pem_private_key(
+                        handle.read(), password=None, unsafe_skip_rsa_key_validation=True)
+            except FileNotFoundError:
+                continue  # retired while we were listing
+            keys[kid] = (private, private.public_key())
+        with self._lock:
+            if keys.keys() != self._keys.keys():
+                self._jwks = None
+            self._keys = keys
+            self._signing = None
+            self._last_reload = time.monotonic()
+
+    def signing_key(self):
+        """(kid, private key) of the newest key that has been published long enough."""
+        signing = self._signing
+        now = time.time()
+        if signing is None or (signing[2] and now >= signing[2]):
+            self._ensure_loaded()
+            with self._lock:
+                kids = list(self._keys)
+                ready = [kid for kid in kids if int(kid) + self.publish_ahead <= now]
+                kid = ready[-1] if ready else kids[0]
+                # Re-evaluate once the next pending key becomes usable.
+                pending = [int(k) + self.publish_ahead for k in kids if int(k) + self.publish_ahead > now]
+                signing = self._signing = (kid, self._keys[kid][0], min(pending) if pending else None)
+        return signing[0], signing[1]
+
+    def public_key(self, kid):
+        self._ensure_loaded()
+        entry = self._keys.get(kid)
+        if entry is None and time.monotonic() - self._last_reload > 5:
+            # Possibly rotated by another worker; throttled so unknown kids cannot force disk scans.
+            self.reload()
+            entry = self._keys.get(kid)
+        return entry[1] if entry else None
+
+    def rotate(self):
+        """Publish a new key now; it signs once ``publish_ahead`` has passed."""
+        self._ensure_loaded()
+        created = max(int(time.time()), int(list(self._keys)[-1]) + 1)
+        self._create(created)
+        self.reload()
+        self.rotations += 1
+        return str(created)
+
+    def maintain(self):
+        """Scheduled rotation and retirement, safe to run from every worker at once."""
+        self._ensure_loaded()
+        self.reload()
+        now = time.time()
+        kids = list(self._keys)
+        newest = int(kids[-1])
+        if self.rotation_seconds and now - newest >= self.rotation_seconds:
+            # Same kid in every worker, so only one of them creates the file.
+            if self._create(newest + self.rotation_seconds * int((now - newest) // self.rotation_seconds)):
+                self.rotations += 1
+            self.reload()
+            kids = list(self._keys)
+        # A key is retired once its successor has been signing for longer than any token lives.
+        for kid, successor in zip(kids, kids[1:]):
+            if int(successor) + self.publish_ahead + self.max_token_lifetime < now:
+                try:
+                    os.unlink(self._path(kid))
+                except FileNotFoundError:
+                    pass
+        self.reload()
+
+    def jwks(self):
+        cached = self._jwks
+        if cached is None:
+            self._ensure_loaded()
+            with self._lock:
+                keys = [_public_jwk(kid, self.algorithm, public) for kid, (_, public) in self._keys.items()]
+            body = json.dumps({"keys": keys})
+            cached = self._jwks = (body, hashlib.sha256(body.encode()).hexdigest()[:32])
+        return cached
+
+    def stats(self):
+        kid, _ = self.signing_key()
+        return {"algorithm": self.algorithm, "signing_kid": kid, "kids": list(self._keys), "rotations": self.rotations}
+
+
+def init_app(app, jwt):
+    """Install the keyring behind flask_jwt_extended; HS* algorithms keep the shared secret."""
+    algorithm = app.config["JWT_ALGORITHM"]
+    if algorithm.startswith("HS"):
+        return None
+    keyring = KeyRing(
+        app.config["JWT_KEY_DIR"],
+        algorithm,
+        rotation_seconds=app.config["JWT_KEY_ROTATION_DAYS"] * 86400,
+        publish_ahead=app.config["JWKS_MAX_AGE_SECONDS"],
+        max_token_lifetime=max(
+            app.config["JWT_ACCESS_TOKEN_EXPIRES"].total_seconds(),
+            app.config["JWT_REFRESH_TOKEN_EXPIRES"].total_seconds(),
+        ),
+    )
+    app.extensions["jwt_keyring"] = keyring
+    # flask_jwt_extended asks for the headers, then the key, for each token. The key picked for
+    # the header is handed over here, so a switchover in between cannot split the pair.
+    chosen = threading.local()
+
+    @jwt.additional_headers_loader
+    def key_id_header(identity):
+        chosen.key = keyring.signing_key()
+        return {"kid": chosen.key[0]}
+
+    @jwt.encode_key_loader
+    def signing_key(identity):
+        key, chosen.key = getattr(chosen, "key", None), None
+        return (key or keyring.signing_key())[1]
+
+    @jwt.decode_key_loader
+    def verification_key(jwt_header, jwt_payload):
+        key = keyring.public_key(jwt_header.get("kid"))
+        if key is None:
+            raise DecodeError("Unknown signing key")
+        return key
+
+    max_age = app.config["JWKS_MAX_AGE_SECONDS"]
+
+    @app.route("/.well-known/jwks.json")
+    def jwks():
+        body, etag = keyring.jwks()
+        resp = Response(body, mimetype="application/json")
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = f"public, max-age={max_age}"
+        return resp.make_conditional(request)
+
+    return keyring
+
+
+def get_keyring():
+    return current_app.extensions.get("jwt_keyring")
@@ -0,0 +1,350 @@
+import logging
+import os
+import queue
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app
+
+from utils.metrics import span
+
+
+class MailSpool:
+    """Durable outbound queue kept in a local SQLite file.
+
+    Messages are claimed with a lease rather than deleted, so a sender that
+    dies mid-batch leaves them to be retried once the lease runs out.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_ready = False  # the file and table are created by the first connection
+
+    def _create_schema(self, conn):
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                to_email TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_outbox_status_due ON outbox (status, next_attempt_at)")
+        self._schema_ready = True
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=10000")
+            conn.execute("PRAGMA journal_mode=WAL")  # not allowed inside the BEGIN IMMEDIATE below
+            if not self._schema_ready:
+                self._create_schema(conn)  # IF NOT EXISTS, so racing threads are harmless
+            self._local.conn = conn
+        return _Transaction(conn)
+
+    def enqueue(self, to_email, subject, body):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO outbox (to_email, subject, body, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (to_email, subject, body, now, now),
+            )
+
+    def claim(self, limit, lease_seconds=60):
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, to_email, subject, body, attempts FROM outbox "
+                "WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                    [(now + lease_seconds, row[0]) for row in rows],
+                )
+        return rows
+
+    def ack(self, message_ids):
+        if not message_ids:
+            return
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(message_id,) for message_id in message_ids])
+
+    def fail(self, message_id, attempts, error, max_attempts, backoff_base):
+        attempts += 1
+        with self._connect() as conn:
+            if attempts >= max_attempts:
+                conn.execute(
+                    "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? WHERE id = ?",
+                    (attempts, error, message_id),
+                )
+            else:
+                delay = min(backoff_base * 2 ** (attempts - 1), 3600) * random.uniform(0.8, 1.2)
+                conn.execute(
+                    "UPDATE outbox SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                    (attempts, error, time.time() + delay, message_id),
+                )
+
+    def dead_letters(self, limit=100):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, to_email, subject, attempts, last_error, created_at FROM outbox "
+                "WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [
+            {"id": row[0], "to": row[1], "subject": row[2], "attempts": row[3], "lastError": row[4], "createdAt": row[5]}
+            for row in rows
+        ]
+
+    def retry_dead(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ? WHERE status = 'dead'",
+                (time.time(),),
+            ).rowcount
+
+    def counts(self):
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP connections kept open and reused across messages."""
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, size=2, idle_check_seconds=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_check_seconds = idle_check_seconds
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        return server
+
+    @contextmanager
+    def connection(self):
+        try:
+            server, last_used = self._idle.get_nowait()
+            if time.monotonic() - last_used > self.idle_check_seconds and server.noop()[0] != 250:
+                raise smtplib.SMTPServerDisconnected("stale connection")
+        except queue.Empty:
+            server = self._open()
+        except (smtplib.SMTPException, OSError):
+            self._close(server)
+            server = self._open()
+        try:
+            yield server
+        except BaseException:
+            # Unknown protocol state after an error; never hand it out again.
+            self._close(server)
+            raise
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self._close(server)
+
+    def close_all(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+
+class EmailDispatcher:
+    """Background threads draining the spool over pooled SMTP connections."""
+
+    def __init__(self, spool, pool, sender, threads=2, batch_size=20, max_attempts=6,
+                 backoff_base=30.0, poll_interval=1.0, logger=None):
+        self.spool = spool
+        self.pool = pool  # None means mock delivery to the log
+        self.sender = sender
+        self.logger = logger or logging.getLogger(__name__)
+        self.threads = threads
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self.sent = 0
+        self.failed = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._workers = []
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, to_email, subject, body):
+        self.spool.enqueue(to_email, subject, body)
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._workers:
+            return
+        with self._start_lock:
+            if self._workers:
+                return
+            self._stop.clear()
+            for index in range(self.threads):
+                worker = threading.Thread(target=self._run, name=f"email-dispatcher-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        if self.pool is not None:
+            self.pool.close_all()
+
+    def drain(self):
+        """Deliver everything currently due on the calling thread; returns messages handled."""
+        handled = 0
+        while True:
+            batch = self.spool.claim(self.batch_size)
+            if not batch:
+                return handled
+            self._deliver(batch)
+            handled += len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.drain():
+                    continue
+            except Exception:
+                self.logger.exception("Email dispatcher error")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _deliver(self, batch):
+        if self.pool is None:
+            for _, to_email, subject, body, _ in batch:
+                # Bodies carry OTP codes: only debug logging shows them.
+                self.logger.info("Mock email to %s: %s", to_email, subject)
+                self.logger.debug("Mock email body:\n%s", body)
+            self.spool.ack([row[0] for row in batch])
+            self.sent += len(batch)
+            return
+
+        delivered = []
+        remaining = list(batch)
+        try:
+            with self.pool.connection() as server:
+                while remaining:
+                    message_id, to_email, subject, body, attempts = remaining[0]
+                    try:
+                        with span("send_email"):
+                            server.send_message(build_message(self.sender, to_email, subject, body))
+                        delivered.append(message_id)
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                        # The message was rejected but the connection is still usable.
+                        self._fail(message_id, attempts, e)
+                    except (smtplib.SMTPException, OSError):
+                        raise  # the connection is gone; every remaining message fails below
+                    except Exception as e:
+                        # This message could not be built or sent; the rest still go out.
+                        self.logger.exception("Could not send email %s", message_id)
+                        self._fail(message_id, attempts, e)
+                    remaining.pop(0)
+        except Exception as e:
+            for message_id, _, _, _, attempts in remaining:
+                self._fail(message_id, attempts, e)
+        finally:
+            self.spool.ack(delivered)
+            self.sent += len(delivered)
+
+    def _fail(self, message_id, attempts, error):
+        self.spool.fail(message_id, attempts, str(error) or type(error).__name__, self.max_attempts, self.backoff_base)
+        self.failed += 1
+
+    def stats(self):
+        counts = self.spool.counts()
+        return {
+            "pending": counts.get("pending", 0),
+            "dead": counts.get("dead", 0),
+            "sent": self.sent,
+            "failed_attempts": self.failed,
+        }
+
+
+def build_message(sender, to_email, subject, body):
+    from email.mime.text import MIMEText
+
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = to_email
+    return msg
+
+
+def init_app(app):
+    config = app.config
+    pool = None
+    if config.get("MAIL_SERVER") and config.get("MAIL_USERNAME") and config.get("MAIL_PASSWORD"):
+        pool = SMTPConnectionPool(
+            config["MAIL_SERVER"],
+            config["MAIL_PORT"],
+            config["MAIL_USERNAME"],
+            config["MAIL_PASSWORD"],
+            use_tls=config["MAIL_USE_TLS"],
+            size=config["MAIL_POOL_SIZE"],
+        )
+    dispatcher = EmailDispatcher(
+        MailSpool(config["MAIL_SPOOL_PATH"]),
+        pool,
+        sender=config.get("MAIL_USERNAME") or "",
+        threads=config["MAIL_POOL_SIZE"],
+        batch_size=config["MAIL_BATCH_SIZE"],
+        max_attempts=config["MAIL_MAX_ATTEMPTS"],
+        backoff_base=config["MAIL_RETRY_BACKOFF_SECONDS"],
+        logger=app.logger,
+    )
+    app.extensions["email_dispatcher"] = dispatcher
+    return dispatcher
+
+
+def get_dispatcher():
+    return current_app.extensions.get("email_dispatcher")
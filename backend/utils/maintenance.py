@@ -0,0 +1,249 @@
+"""Background housekeeping jobs run on intervals by one thread per worker.
+
+Jobs that clean shared tables take a lease in ``job_lease`` before running,
+so across every worker and node each runs once per interval. The lease lasts
+one interval: a node that dies mid-run only delays the next run, and the
+holder renews it when it runs again. ``lease="node"`` scopes the lease to the
+host, for work on local disk; jobs without a lease run in every worker.
+
+Batched jobs delete through ``delete_in_batches`` (or call ``checkpoint``
+between their own batches). Between batches it pauses briefly so request
+threads get the GIL and the database, and it stops once the job's time
+budget is spent. The job is then marked as having a backlog and runs again
+on the next tick instead of after a full interval.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import JobLease
+
+LEASES = (None, "cluster", "node")
+_current = threading.local()  # the job running on this thread, if any
+
+
+def checkpoint():
+    """Yield point between batches; returns False once the running job should stop."""
+    job = getattr(_current, "job", None)
+    if job is None:
+        return True  # called outside the scheduler (CLI, tests): run to completion
+    if job.pause:
+        time.sleep(job.pause)
+    if time.monotonic() >= job.deadline:
+        job.backlog = True
+        return False
+    return True
+
+
+def report_error(error):
+    """Record a failure the running job recovered from; it counts in ``failures`` and shows as ``last_error``."""
+    job = getattr(_current, "job", None)
+    if job is None:
+        return
+    job.failures += 1
+    job.last_error = str(error)[:255]
+
+
+def delete_in_batches(model, *criteria, batch_size=1000):
+    """Delete rows matching ``criteria`` one short transaction per batch; returns the number removed."""
+    removed = 0
+    while True:
+        ids = db.session.scalars(select(model.id).where(*criteria).limit(batch_size)).all()
+        if not ids:
+            return removed
+        db.session.execute(delete(model).where(model.id.in_(ids)))
+        db.session.commit()
+        removed += len(ids)
+        if len(ids) < batch_size or not checkpoint():
+            return removed
+
+
+class Job:
+    def __init__(self, name, interval, fn, lease=None):
+        if lease not in LEASES:
+            raise ValueError(f"Unknown lease '{lease}', expected one of {LEASES}")
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.lease = lease
+        self.lease_key = f"{name}@{socket.gethostname()}" if lease == "node" else name
+        self.due = time.monotonic() + interval
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_duration = None
+        self.last_processed = None
+        self.last_error = None
+        self.backlog = False
+        # Set for each run.
+        self.deadline = 0.0
+        self.pause = 0.0
+
+
+class PeriodicTasks:
+    """Runs registered jobs inside an app context on a background thread.
+
+    A job that raises is logged and retried on its next turn. A job may
+    return how many items it processed, which is reported in ``status()``.
+    """
+
+    def __init__(self, app, budget_seconds=30.0, pause_seconds=0.01):
+        self.app = app
+        self.budget_seconds = budget_seconds
+        self.pause_seconds = pause_seconds
+        self.tasks = []
+        self.owner = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def register(self, name, interval, fn, lease=None):
+        if interval and interval > 0:
+            self.tasks.append(Job(name, interval, fn, lease))
+
+    def start(self):
+        if self._thread is not None or not self.tasks:
+            return
+        with self._lock:
+            if self._thread is None:
+                # Taken here rather than in __init__ so every forked worker gets its own.
+                self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(max(0.05, min(job.due for job in self.tasks) - time.monotonic())):
+            for job in self.tasks:
+                if job.due <= time.monotonic() and not self._stop.is_set():
+                    self.run(job)
+
+    def run(self, job):
+        """Run one job now, if its lease can be taken; returns False when another process holds it."""
+        with self.app.app_context():
+            try:
+                if job.lease and not self._acquire(job):
+                    job.skipped += 1
+                    job.due = time.monotonic() + job.interval
+                    return False
+                started = time.monotonic()
+                job.backlog = False
+                # Never past the lease, or another node could start the same job.
+                job.deadline = started + min(self.budget_seconds, job.interval / 2)
+                job.pause = self.pause_seconds
+                job.last_error = None
+                _current.job = job
+                try:
+                    processed = job.fn()
+                except Exception as e:
+                    db.session.rollback()
+                    job.failures += 1
+                    job.last_error = str(e)[:255]
+                    processed = None
+                    print(f"Maintenance task {job.name} failed: {e}")
+                finally:
+                    _current.job = None
+                job.runs += 1
+                job.last_duration = time.monotonic() - started
+                job.last_processed = processed if isinstance(processed, int) else None
+                job.due = time.monotonic() + (0 if job.backlog else job.interval)
+                if job.lease:
+                    self._record(job)
+                return True
+            except Exception as e:
+                # Lease table unreachable: try again next interval.
+                job.failures += 1
+                job.last_error = str(e)[:255]
+                job.due = time.monotonic() + job.interval
+                print(f"Maintenance task {job.name} could not run: {e}")
+                return False
+            finally:
+                db.session.remove()
+
+    def _acquire(self, job):
+        now = datetime.utcnow()
+        values = {"owner": self.owner, "leased_until": now + timedelta(seconds=job.interval)}
+        with db.engine.begin() as conn:
+            taken = conn.execute(
+                update(JobLease)
+                .where(JobLease.name == job.lease_key,
+                       or_(JobLease.leased_until <= now, JobLease.owner == self.owner))
+                .values(**values)
+            ).rowcount
+        if taken:
+            return True
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(JobLease).values(name=job.lease_key, **values))
+            return True
+        except IntegrityError:
+            return False  # the row exists and another process holds it
+
+    def _record(self, job):
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(JobLease)
+                .where(JobLease.name == job.lease_key, JobLease.owner == self.owner)
+                .values(last_finished_at=datetime.utcnow(), last_duration_ms=int(job.last_duration * 1000),
+                        last_processed=job.last_processed, backlog=job.backlog, last_error=job.last_error)
+            )
+
+    def status(self):
+        """Per job: this worker's view plus, for leased jobs, the last run anywhere. Needs an app context."""
+        # Through the engine: the session may be routed to a tenant without the lease table.
+        with db.engine.connect() as conn:
+            leases = {lease.name: lease for lease in conn.execute(
+                select(JobLease).where(JobLease.name.in_([job.lease_key for job in self.tasks if job.lease])))}
+        now = time.monotonic()
+        jobs = []
+        for job in self.tasks:
+            entry = {
+                "name": job.name,
+                "interval_seconds": job.interval,
+                "lease": job.lease,
+                "runs": job.runs,
+                "skipped": job.skipped,
+                "failures": job.failures,
+                "last_duration_ms": round(job.last_duration * 1000, 1) if job.last_duration is not None else None,
+                "last_processed": job.last_processed,
+                "backlog": job.backlog,
+                "last_error": job.last_error,
+                "next_run_in_seconds": round(max(job.due - now, 0), 1),
+            }
+            lease = leases.get(job.lease_key)
+            if lease is not None:
+                entry["cluster"] = {
+                    "holder": lease.owner,
+                    "leased_until": lease.leased_until.isoformat(),
+                    "last_finished_at": lease.last_finished_at.isoformat() if lease.last_finished_at else None,
+                    "last_duration_ms": lease.last_duration_ms,
+                    "last_processed": lease.last_processed,
+                    "backlog": lease.backlog,
+                    "last_error": lease.last_error,
+                }
+            jobs.append(entry)
+        return {"owner": self.owner, "running": self._thread is not None, "jobs": jobs}
+
+
+def init_app(app):
+    tasks = PeriodicTasks(
+        app,
+        budget_seconds=app.config.get("JOB_BUDGET_SECONDS", 30.0),
+        pause_seconds=app.config.get("JOB_BATCH_PAUSE_SECONDS", 0.01),
+    )
+    app.extensions["maintenance"] = tasks
+    return tasks
+
+
+def get_tasks():
+    return current_app.extensions["maintenance"]
@@ -0,0 +1,327 @@
+"""Content-addressed profile picture storage with background thumbnails.
+
+Uploads are copied to disk in chunks while being hashed and stored as
+``<sha256>.<ext>`` under a two-character shard directory, so identical
+images are kept once and a stored file never changes. That makes every URL
+cacheable forever. Thumbnails (``<sha256>_<size>.webp``) are rendered by a
+small thread pool after the upload returns; ``?size=`` picks one, and until
+it exists the original is served without long-lived caching. Files no
+profile references any more are removed by the ``sweep_upload_orphans`` job.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, abort, current_app, jsonify, request, send_file, send_from_directory
+from sqlalchemy import select
+
+from extensions import db, tenant_context
+from models import User
+from utils.maintenance import checkpoint
+from utils.tenants import tenant_names
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+_STORED_NAME = re.compile(r"^([0-9a-f]{64})\.(png|jpg|gif|webp)$")
+_STORED_FILE = re.compile(r"^([0-9a-f]{64})(?:\.(?:png|jpg|gif|webp)|_\d+\.webp)$")  # originals and thumbnails
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+MIMETYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+
+
+def sniff_extension(head):
+    """Image type from the file's first bytes; None for anything that is not an allowed image."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class ImageTooLarge(Exception):
+    """Raised for images with more pixels than UPLOADS_MAX_PIXELS; mapped to 413."""
+
+
+def _check_pixels(image, max_pixels):
+    # Only the header has been read so far; decoding is what costs memory and CPU.
+    if max_pixels and image.width * image.height > max_pixels:
+        raise ImageTooLarge(f"{image.width}x{image.height} image is over the {max_pixels} pixel limit")
+
+
+def _image_fits(path, max_pixels):
+    """Whether Pillow reads ``path`` as an image; raises ImageTooLarge past ``max_pixels``."""
+    from PIL import Image, UnidentifiedImageError  # deferred: only uploads and thumbnail threads need it
+
+    try:
+        with Image.open(path) as image:
+            _check_pixels(image, max_pixels)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except UnidentifiedImageError:
+        return False
+    return True
+
+
+def _render_thumbnails(source, targets, max_pixels=None):
+    from PIL import Image, ImageOps  # only loaded in the thumbnail threads
+
+    with Image.open(source) as image:
+        _check_pixels(image, max_pixels)  # files stored before the limit
+        largest = max(size for size, _ in targets)
+        # JPEGs decode at 1/2, 1/4 or 1/8 scale when that still covers the largest thumbnail.
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGBA")
+        for size, target in targets:
+            # Square crop from the centre, which is how avatars are displayed.
+            thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            thumb.save(tmp, "WEBP", quality=85, method=4)
+            os.replace(tmp, target)
+
+
+class MediaStore:
+    def __init__(self, root, thumbnail_sizes=(96, 256), workers=2, max_pixels=None):
+        self.root = root
+        self.thumbnail_sizes = tuple(sorted(thumbnail_sizes))
+        self.max_pixels = max_pixels
+        self.stored = 0
+        self.deduplicated = 0
+        self.thumbnails_failed = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails") if workers else None
+        self._pending = set()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest, suffix):
+        return os.path.join(self.root, digest[:2], f"{digest}{suffix}")
+
+    def save(self, stream):
+        """Copy ``stream`` to the store; returns ``(digest, ext)`` or None if it is not an allowed image.
+
+        Raises ImageTooLarge, before anything is stored, for images over ``max_pixels``.
+        """
+        head = stream.read(CHUNK_SIZE)
+        ext = sniff_extension(head)
+        if ext is None:
+            return None
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".upload")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                chunk = head
+                while chunk:
+                    digest.update(chunk)
+                    handle.write(chunk)
+                    chunk = stream.read(CHUNK_SIZE)
+            if not _image_fits(tmp, self.max_pixels):
+                os.unlink(tmp)
+                return None
+            digest = digest.hexdigest()
+            target = self.path(digest, f".{ext}")
+            if self._touch(digest, ext):
+                self.deduplicated += 1
+                os.unlink(tmp)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(tmp, target)
+                self.stored += 1
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.schedule_thumbnails(digest, ext)
+        return digest, ext
+
+    def _touch(self, digest, ext):
+        """Restart the orphan grace period of a stored file and its thumbnails; False if it is not stored.
+
+        An old file uploaded again may be unreferenced until the profile saving
+        its URL commits, and purge_orphans only spares files younger than the
+        grace period.
+        """
+        try:
+            os.utime(self.path(digest, f".{ext}"))
+        except FileNotFoundError:
+            return False  # never stored, or purged just now: store it again
+        for size in self.thumbnail_sizes:
+            try:
+                os.utime(self.path(digest, f"_{size}.webp"))
+            except FileNotFoundError:
+                pass  # rendered by schedule_thumbnails below
+        return True
+
+    def schedule_thumbnails(self, digest, ext):
+        if self._executor is None:
+            return
+        targets = [(size, self.path(digest, f"_{size}.webp")) for size in self.thumbnail_sizes]
+        targets = [(size, target) for size, target in targets if not os.path.exists(target)]
+        with self._lock:
+            if not targets or digest in self._pending:
+                return
+            self._pending.add(digest)
+        self._executor.submit(self._thumbnail_job, digest, self.path(digest, f".{ext}"), targets)
+
+    def _thumbnail_job(self, digest, source, targets):
+        try:
+            _render_thumbnails(source, targets, self.max_pixels)
+        except Exception as e:
+            self.thumbnails_failed += 1
+            print(f"Thumbnail generation for {digest} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(digest)
+
+    def thumbnail_size(self, requested):
+        """Smallest configured thumbnail covering ``requested`` pixels; None means the original."""
+        for size in self.thumbnail_sizes:
+            if size >= requested:
+                return size
+        return None
+
+    def purge_orphans(self, referenced, max_age_seconds, batch_size=500):
+        """Delete stored files and stale upload temp files older than ``max_age_seconds``
+        whose digest is not in ``referenced``; returns the number of files removed."""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        in_batch = 0
+        for shard in sorted(os.scandir(self.root), key=lambda entry: entry.name):
+            if shard.is_file() and shard.name.endswith(".upload"):
+                candidates = [shard]  # left behind by a worker that died mid-upload
+            elif shard.is_dir() and len(shard.name) == 2:
+                candidates = os.scandir(shard.path)
+            else:
+                continue
+            for entry in candidates:
+                match = _STORED_FILE.match(entry.name)
+                if match is None and not entry.name.endswith(".upload"):
+                    continue
+                if match is not None and (match.group(1) in referenced or match.group(1) in self._pending):
+                    continue
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue  # just uploaded, the profile saving it may not be committed yet
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                in_batch += 1
+                if in_batch >= batch_size:
+                    in_batch = 0
+                    if not checkpoint():
+                        return removed
+        return removed
+
+    def stats(self):
+        return {
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "thumbnails_pending": len(self._pending),
+            "thumbnails_failed": self.thumbnails_failed,
+        }
+
+
+def _send(path, mimetype, etag, cache_control):
+    """Let the front web server send the bytes when it is configured to, otherwise stream the file."""
+    config = current_app.config
+    mode = config.get("UPLOADS_SENDFILE")
+    if mode == "x-accel-redirect":
+        relative = os.path.relpath(path, config["UPLOAD_FOLDER"]).replace(os.sep, "/")
+        resp = Response(mimetype=mimetype)
+        resp.headers["X-Accel-Redirect"] = f"{config['UPLOADS_ACCEL_PREFIX'].rstrip('/')}/{relative}"
+    elif mode == "x-sendfile":
+        resp = Response(mimetype=mimetype)
+        resp.headers["X-Sendfile"] = path
+    else:
+        resp = send_file(path, mimetype=mimetype, etag=False, conditional=False, max_age=None)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp.make_conditional(request)
+
+
+def init_app(app):
+    store = MediaStore(
+        app.config["UPLOAD_FOLDER"],
+        thumbnail_sizes=app.config["THUMBNAIL_SIZES"],
+        workers=app.config["THUMBNAIL_WORKERS"],
+        max_pixels=app.config["UPLOADS_MAX_PIXELS"],
+    )
+    app.extensions["media_store"] = store
+
+    @app.route("/api/upload/profile-picture", methods=["POST"])
+    def upload_profile_picture():
+        # A raw image body is streamed straight from the socket; multipart
+        # uploads are read back from werkzeug's spooled temporary file.
+        if request.mimetype in MIMETYPES.values():
+            stream = request.stream
+        else:
+            file = request.files.get("file")
+            if file is None:
+                return jsonify({"error": "No file provided"}), 400
+            if file.filename == "":
+                return jsonify({"error": "No file selected"}), 400
+            stream = file.stream
+        try:
+            saved = store.save(stream)
+        except ImageTooLarge as e:
+            return jsonify({"error": f"Image too large: {e}"}), 413
+        if saved is None:
+            return jsonify({"error": "Invalid file type. Allowed: png, jpg, jpeg, gif, webp"}), 400
+        digest, ext = saved
+        url = f"/uploads/{digest}.{ext}"
+        return jsonify({
+            "url": url,
+            "thumbnails": {str(size): f"{url}?size={size}" for size in store.thumbnail_sizes},
+        }), 200
+
+    @app.route("/uploads/<filename>")
+    def uploaded_file(filename):
+        match = _STORED_NAME.match(filename)
+        if match is None:
+            # Pictures uploaded before content addressing keep their old names and may be overwritten.
+            return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+        digest, ext = match.groups()
+        original = store.path(digest, f".{ext}")
+        if not os.path.exists(original):
+            abort(404)
+        requested = request.args.get("size", type=int)
+        size = store.thumbnail_size(requested) if requested else None
+        if size is not None:
+            thumbnail = store.path(digest, f"_{size}.webp")
+            if os.path.exists(thumbnail):
+                return _send(thumbnail, "image/webp", f"{digest}-{size}", IMMUTABLE)
+            store.schedule_thumbnails(digest, ext)
+            # Not rendered yet: make the browser ask again instead of caching the full image.
+            return _send(original, MIMETYPES[ext], digest, "public, no-cache")
+        return _send(original, MIMETYPES[ext], digest, IMMUTABLE)
+
+    return store
+
+
+def get_media_store():
+    return current_app.extensions["media_store"]
+
+
+def referenced_digests():
+    """Digests of every picture a user profile points at."""
+    urls = db.session.scalars(
+        select(User.profile_picture_url).where(User.profile_picture_url.is_not(None)).execution_options(yield_per=1000)
+    )
+    return {digest for url in urls for digest in _DIGEST.findall(url)}
+
+
+def sweep_upload_orphans():
+    config = current_app.config
+    # Every tenant stores pictures in the same directory, so a file is kept if any tenant uses it.
+    referenced = set()
+    for tenant in tenant_names():
+        with tenant_context(tenant):
+            referenced |= referenced_digests()
+    return get_media_store().purge_orphans(referenced, config["UPLOADS_ORPHAN_AGE_HOURS"] * 3600)
@@ -0,0 +1,307 @@
+"""In-process latency histograms exported in Prometheus text format.
+
+Every thread records into its own shard, so the hot path takes no locks;
+shards are only summed when ``/api/metrics`` is scraped. With METRICS_DIR
+set, each worker also writes its totals to ``METRICS_DIR/metrics-<pid>.json``
+and the endpoint merges all of them, so any worker can answer for the pool.
+A worker removes its file when it exits, and files of pids no longer running
+(a killed worker) are skipped, so METRICS_DIR must not be shared across hosts.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = {}  # thread -> {labels: [bucket counts..., sum, count]}
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def _thread_shard(self):
+        shard = {}
+        self._local.shard = shard
+        with self._lock:
+            if len(self._shards) > 64:
+                self._retire_dead_threads()
+            self._shards[threading.current_thread()] = shard
+        return shard
+
+    def observe(self, value, *labels):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._thread_shard()
+        row = shard.get(labels)
+        if row is None:
+            row = shard[labels] = [0] * (len(self.buckets) + 3)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-2] += value
+        row[-1] += 1
+
+    def _retire_dead_threads(self):
+        # Folds shards of finished threads (the dev server uses one per request).
+        for thread in [t for t in self._shards if not t.is_alive()]:
+            _merge_rows(self._retired, self._shards.pop(thread))
+
+    def collect(self):
+        with self._lock:
+            self._retire_dead_threads()
+            totals = {labels: list(row) for labels, row in self._retired.items()}
+            for shard in self._shards.values():
+                _merge_rows(totals, dict(shard))
+        return totals
+
+
+def _merge_rows(target, source):
+    for labels, row in source.items():
+        current = target.get(labels)
+        if current is None:
+            target[labels] = list(row)
+        else:
+            for i, value in enumerate(row):
+                current[i] += value
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}
+
+    def histogram(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name, help_text, label_names, buckets)
+        return self.histograms[name]
+
+    def snapshot(self):
+        return {
+            name: {
+                "help": hist.help,
+                "labels": list(hist.label_names),
+                "buckets": list(hist.buckets),
+                "rows": [[list(labels), row] for labels, row in hist.collect().items()],
+            }
+            for name, hist in self.histograms.items()
+        }
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            entry = merged.setdefault(name, {**data, "rows": {}})
+            _merge_rows(entry["rows"], {tuple(labels): row for labels, row in data["rows"]})
+    return merged
+
+
+def render(merged, gauges):
+    lines = []
+    for name, data in sorted(merged.items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, row in sorted(data["rows"].items()):
+            base = _labels(zip(data["labels"], labels))
+            cumulative = 0
+            for bound, count in zip(list(data["buckets"]) + ["+Inf"], row):
+                cumulative += count
+                bucket_labels = _labels(list(zip(data["labels"], labels)) + [("le", bound)])
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{base} {row[-2]}")
+            lines.append(f"{name}_count{base} {row[-1]}")
+    seen = set()
+    for name, help_text, labels, value in gauges:
+        if name not in seen:
+            lines.append(f"# HELP {name} {help_text}")
+            # Running totals only grow for the life of a worker, so rate() can treat restarts as resets.
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            seen.add(name)
+        lines.append(f"{name}{_labels(labels.items())} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _labels(pairs):
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in pairs) + "}"
+
+
+registry = Registry()
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time spent handling a request.", ("endpoint", "method", "status"))
+request_queries = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ("endpoint",), COUNT_BUCKETS)
+query_duration = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing a SQL statement.", ("endpoint",))
+span_duration = registry.histogram(
+    "span_duration_seconds", "Time spent in instrumented hot-path operations.", ("span",))
+
+_enabled = False
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        span_duration.observe(time.perf_counter() - self.started, self.name)
+
+
+_NULL_SPAN = nullcontext()
+
+
+def span(name):
+    """Time a block into span_duration_seconds; a shared no-op when metrics are off."""
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def _endpoint():
+    return (request.endpoint or "unmatched") if has_request_context() else "background"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    query_duration.observe(elapsed, _endpoint())
+    if has_request_context():
+        g.metrics_queries = g.get("metrics_queries", 0) + 1
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def register_gauges(app, collector):
+    """Export ``collector()``'s values on every scrape; names ending in ``_total`` are typed as counters."""
+    if "metrics_gauges" in app.extensions:
+        app.extensions["metrics_gauges"].append(collector)
+
+
+def _worker_file(directory):
+    return os.path.join(directory, f"metrics-{os.getpid()}.json")
+
+
+_snapshot_lock = threading.Lock()
+_snapshot_removed = False
+
+
+def write_worker_snapshot(directory):
+    with _snapshot_lock:
+        if _snapshot_removed:
+            return  # the worker is exiting
+        os.makedirs(directory, exist_ok=True)
+        path = _worker_file(directory)
+        with open(path + ".tmp", "w") as handle:
+            json.dump(registry.snapshot(), handle)
+        os.replace(path + ".tmp", path)
+
+
+def remove_worker_snapshot(directory):
+    """Delete this worker's file for good; registered with atexit."""
+    global _snapshot_removed
+    with _snapshot_lock:
+        _snapshot_removed = True
+        try:
+            os.remove(_worker_file(directory))
+        except FileNotFoundError:
+            pass
+
+
+def _worker_alive(path):
+    try:
+        pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+    except ValueError:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # alive, run by another user
+    return True
+
+
+def init_app(app):
+    global _enabled
+    _enabled = app.config.get("METRICS_ENABLED", True)
+    if not _enabled:
+        return None
+    app.extensions["metrics_gauges"] = []  # callables returning [(name, help, {labels}, value)]
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = 0
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request(exc):
+        # Teardown also runs when the view or an after_request hook raised; those requests count as 500s.
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            status = g.pop("metrics_status", 500)
+            request_duration.observe(time.perf_counter() - started, endpoint, request.method, status)
+            request_queries.observe(g.pop("metrics_queries", 0), endpoint)
+
+    metrics_dir = app.config.get("METRICS_DIR")
+    if metrics_dir:
+        atexit.register(remove_worker_snapshot, metrics_dir)
+
+    @app.route("/api/metrics")
+    def metrics():
+        own = registry.snapshot()
+        snapshots = [own]
+        if metrics_dir:
+            own_file = _worker_file(metrics_dir)
+            for path in glob.glob(os.path.join(metrics_dir, "metrics-*.json")):
+                if path == own_file or not _worker_alive(path):
+                    continue
+                try:
+                    with open(path) as handle:
+                        snapshots.append(json.load(handle))
+                except (OSError, ValueError):
+                    continue  # a worker is mid-write or gone
+        gauges = []
+        for collector in app.extensions["metrics_gauges"]:
+            gauges.extend(collector())
+        body = render(merge_snapshots(snapshots), gauges)
+        return Response(body, mimetype="text/plain; version=0.0.4")
+
+    return metrics_dir
@@ -0,0 +1,115 @@
+"""Versioned schema migrations (Alembic), applied to every tenant's database.
+
+Revisions live in ``migrations/versions`` as ``NNNN_<name>.py``. ``migrate``
+upgrades one database to the newest; ``flask --app app init-db`` runs it for
+every tenant. Databases created before migrations existed have tables but no
+``alembic_version``: they are stamped at the baseline and upgraded from there.
+Each revision checks what is already in place before changing it, so such a
+database converges whichever build created it. Tables in ``GLOBAL_TABLES``
+are only created in the default tenant's database.
+
+After upgrading, anything the models declare that the database still lacks
+is reported by ``missing_schema`` rather than created on the fly: a change to
+the models needs a revision (``flask --app app db-revision -m "..."``).
+"""
+import os
+
+from alembic import command, op
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+
+from extensions import DEFAULT_TENANT, db
+from models import GLOBAL_TABLES
+from utils.search import SEARCH_TABLES
+
+BASELINE = "0001"
+SCRIPT_LOCATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+
+def _config(connection=None, tenant=DEFAULT_TENANT):
+    config = Config()
+    config.set_main_option("script_location", SCRIPT_LOCATION)
+    config.attributes["connection"] = connection
+    config.attributes["tenant"] = tenant
+    return config
+
+
+def _current(connection):
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def migrate(engine, tenant=DEFAULT_TENANT):
+    """Upgrade ``engine``'s database to the newest revision; returns the revisions applied, oldest first,
+    as ``NNNN title`` strings."""
+    with engine.begin() as connection:
+        config = _config(connection, tenant)
+        tables = inspect(connection).get_table_names()
+        if tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE)  # from before migrations existed
+        before = _current(connection)
+        command.upgrade(config, "head")
+        after = _current(connection)
+    if before == after:
+        return []
+    scripts = ScriptDirectory.from_config(_config())
+    return [f"{script.revision} {script.doc}" for script in reversed(list(scripts.iterate_revisions(after, before)))]
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Leave the search index, which utils.search creates outside the models, to itself."""
+    return not (type_ == "table" and name in SEARCH_TABLES)
+
+
+def missing_schema(engine, tenant=DEFAULT_TENANT):
+    """Tables, columns and indexes the models declare but the database lacks, as ``kind name`` strings."""
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_object": include_object})
+        diffs = compare_metadata(context, db.metadata)
+    missing = []
+    for diff in diffs:
+        if not isinstance(diff, tuple):
+            continue  # column changes come as lists of modifications; only additions are reported
+        kind = diff[0]
+        if kind == "add_table":
+            table, name = diff[1].name, f"table {diff[1].name}"
+        elif kind == "add_column":
+            table, name = diff[2], f"column {diff[2]}.{diff[3].name}"
+        elif kind in ("add_index", "add_constraint"):
+            table, name = diff[1].table.name, f"index {diff[1].name}"
+        else:
+            continue
+        if tenant == DEFAULT_TENANT or table not in GLOBAL_TABLES:
+            missing.append(name)
+    return missing
+
+
+def new_revision(engine, message):
+    """Write the next ``NNNN`` revision, autogenerated from the models against ``engine``'s database."""
+    scripts = ScriptDirectory.from_config(_config())
+    rev_id = f"{len(list(scripts.walk_revisions())) + 1:04d}"
+    with engine.connect() as connection:
+        script = command.revision(_config(connection), message, autogenerate=True, rev_id=rev_id)
+    return script.path
+
+
+# Helpers for revisions, which run with Alembic's ``op`` bound to the database being upgraded.
+
+def is_default_tenant():
+    return op.get_context().config.attributes.get("tenant", DEFAULT_TENANT) == DEFAULT_TENANT
+
+
+def has_table(name):
+    return inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table, name):
+    return any(column["name"] == name for column in inspect(op.get_bind()).get_columns(table))
+
+
+def has_index(table, name):
+    inspector = inspect(op.get_bind())
+    return any(index["name"] == name for index in inspector.get_indexes(table)) or any(
+        constraint["name"] == name for constraint in inspector.get_unique_constraints(table))
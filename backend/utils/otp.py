@@ -1,10 +1,101 @@
+import hashlib
+import hmac
+import secrets
 from datetime import datetime, timedelta
-import random
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from extensions import db
+from models import EmailOTP
+from utils.maintenance import delete_in_batches
 
 
 def generate_otp(length: int = 6) -> str:
-    return ''.join(str(random.randint(0, 9)) for _ in range(length))
+    return ''.join(str(secrets.randbelow(10)) for _ in range(length))
 
 
 def otp_expiry(minutes: int = 10) -> datetime:
     return datetime.utcnow() + timedelta(minutes=minutes)
+
+
+def hash_otp(email: str, purpose: str, code: str) -> str:
+    # Keyed so a leaked table cannot be brute-forced over the 10^6 code space.
+    key = (current_app.config.get("OTP_SECRET") or current_app.config["SECRET_KEY"]).encode()
+    message = f"{email.strip().lower()}\x00{purpose}\x00{code}".encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def otp_row(email: str, purpose: str, code: str, minutes: int) -> dict:
+    return {
+        'email': email.strip().lower(),
+        'purpose': purpose,
+        'code_hash': hash_otp(email, purpose, code),
+        'is_used': False,
+        'created_at': datetime.utcnow(),
+        'expires_at': otp_expiry(minutes),
+    }
+
+
+def upsert_otps(rows):
+    """Insert OTP rows, replacing any existing code for the same (email, purpose)."""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    replace = ('code_hash', 'is_used', 'created_at', 'expires_at')
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(EmailOTP)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['email', 'purpose'],
+            set_={name: stmt.excluded[name] for name in replace},
+        )
+        db.session.execute(stmt, rows)
+    elif dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(EmailOTP)
+        db.session.execute(stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in replace}), rows)
+    else:
+        for row in rows:
+            db.session.execute(delete(EmailOTP).where(
+                EmailOTP.email == row['email'], EmailOTP.purpose == row['purpose']
+            ))
+        db.session.execute(EmailOTP.__table__.insert(), rows)
+
+
+def issue_otp(email: str, purpose: str, minutes: int = 10) -> str:
+    """Create (or replace) the active code for ``email``/``purpose``; the caller commits."""
+    code = generate_otp()
+    upsert_otps([otp_row(email, purpose, code, minutes)])
+    return code
+
+
+def verify_otp(email: str, purpose: str, code: str) -> str:
+    """Check a code and consume it on success.
+
+    Returns ``'ok'``, ``'missing'``, ``'expired'`` or ``'invalid'``; the caller commits.
+    """
+    email = email.strip().lower()
+    record = db.session.execute(
+        select(EmailOTP).where(EmailOTP.email == email, EmailOTP.purpose == purpose)
+    ).scalar_one_or_none()
+    if record is None or record.is_used:
+        return 'missing'
+    now = datetime.utcnow()
+    if now > record.expires_at:
+        return 'expired'
+    if not hmac.compare_digest(record.code_hash, hash_otp(email, purpose, code)):
+        return 'invalid'
+    # Expiring a used code now means the sweeper only has to look at expires_at.
+    record.is_used = True
+    record.expires_at = now
+    return 'ok'
+
+
+def sweep_expired_otps(batch_size: int = 500) -> int:
+    """Delete expired and used codes in short transactions; returns rows removed."""
+    return delete_in_batches(EmailOTP, EmailOTP.expires_at <= datetime.utcnow(), batch_size=batch_size)
@@ -0,0 +1,299 @@
+"""Sliding-window rate limits with per-route limits and a per-account login throttle.
+
+Counts are kept per fixed window; a request is weighed against the current
+window's count plus the previous window's count scaled by how much of it
+still overlaps the sliding window. That needs two counters per key whatever
+the limit, and every store increments and reads them in one atomic step, so
+workers sharing a store (``sql`` or ``redis``) enforce one limit between them.
+"""
+import math
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, select, update
+
+from extensions import current_tenant, db
+from models import RateLimitCounter
+from utils.maintenance import delete_in_batches
+
+UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT_RE = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+
+
+def _login_key(kind, email):
+    # The same email can be a different account in each tenant.
+    return f"login:{current_tenant()}:{kind}:{email}"
+
+
+def parse_limit(text):
+    """``"5/minute"``, ``"10 per 15 minutes"`` -> ``(count, window seconds)``."""
+    match = _LIMIT_RE.match(text.lower())
+    if match is None:
+        raise ValueError(f"Invalid rate limit '{text}'")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNITS[unit]
+
+
+def parse_route_limits(text):
+    """``"auth_user_login=20/minute;auth_refresh=60/minute"`` -> ``{endpoint: (count, window)}``."""
+    limits = {}
+    for part in filter(None, (part.strip() for part in text.split(";"))):
+        endpoint, _, limit = part.partition("=")
+        limits[endpoint.strip()] = parse_limit(limit)
+    return limits
+
+
+def _weighted(previous, current, window, now):
+    elapsed = (now % window) / window
+    return previous * (1 - elapsed) + current
+
+
+class MemoryRateLimitStore:
+    """Per-process counters; each worker enforces its own copy of every limit."""
+
+    def __init__(self):
+        self._counters = {}  # (key, window) -> [window index, current, previous]
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def hit(self, key, window, amount=1):
+        """Add ``amount`` and return the sliding-window count including it."""
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            counter = self._counters.get((key, window))
+            if counter is None:
+                counter = self._counters[(key, window)] = [index, 0, 0]
+            elif counter[0] != index:
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[0], counter[1] = index, 0
+            counter[1] += amount
+            count = _weighted(counter[2], counter[1], window, now)
+            if now >= self._next_prune:
+                self._prune(now)
+        return count
+
+    def count(self, key, window):
+        """The sliding-window count without adding to it."""
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            counter = self._counters.get((key, window))
+        if counter is None or counter[0] < index - 1:
+            return 0
+        if counter[0] == index - 1:
+            return _weighted(counter[1], 0, window, now)
+        return _weighted(counter[2], counter[1], window, now)
+
+    def reset(self, key, window):
+        with self._lock:
+            self._counters.pop((key, window), None)
+
+    def _prune(self, now):
+        for key in [key for key, counter in self._counters.items() if counter[0] < now // key[1] - 1]:
+            del self._counters[key]
+        self._next_prune = now + 60
+
+    def stats(self):
+        return {"backend": "memory", "keys": len(self._counters)}
+
+
+class SQLRateLimitStore:
+    """Counters in the ``rate_limit_counter`` table, shared by every worker and node.
+
+    Each hit is an upsert-increment and a read of both windows in its own short
+    transaction, on a connection separate from the request's session.
+    """
+
+    def hit(self, key, window, amount=1):
+        now = time.time()
+        index = int(now // window)
+        with db.engine.begin() as conn:
+            self._increment(conn, key, window, index, amount,
+                            datetime.utcfromtimestamp((index + 2) * window))
+            counts = self._counts(conn, key, window, index)
+        return _weighted(counts.get(index - 1, 0), counts.get(index, 0), window, now)
+
+    def count(self, key, window):
+        now = time.time()
+        index = int(now // window)
+        with db.engine.connect() as conn:
+            counts = self._counts(conn, key, window, index)
+        return _weighted(counts.get(index - 1, 0), counts.get(index, 0), window, now)
+
+    def _counts(self, conn, key, window, index):
+        return dict(conn.execute(
+            select(RateLimitCounter.window_index, RateLimitCounter.count).where(
+                RateLimitCounter.key == self._row_key(key, window),
+                RateLimitCounter.window_index.in_((index - 1, index)),
+            )
+        ).all())
+
+    @staticmethod
+    def _row_key(key, window):
+        return f"{key}:{window}"
+
+    def _increment(self, conn, key, window, index, amount, expires_at):
+        row = {"key": self._row_key(key, window), "window_index": index, "count": amount, "expires_at": expires_at}
+        table = RateLimitCounter.__table__
+        dialect = conn.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["key", "window_index"], set_={"count": table.c.count + stmt.excluded.count}), row)
+        elif dialect in ("mysql", "mariadb"):
+            from sqlalchemy.dialects.mysql import insert
+
+            stmt = insert(table)
+            conn.execute(stmt.on_duplicate_key_update(count=table.c.count + stmt.inserted.count), row)
+        else:
+            updated = conn.execute(
+                update(table).where(table.c.key == row["key"], table.c.window_index == index)
+                .values(count=table.c.count + amount)
+            ).rowcount
+            if not updated:
+                conn.execute(table.insert(), row)
+
+    def reset(self, key, window):
+        with db.engine.begin() as conn:
+            conn.execute(delete(RateLimitCounter).where(RateLimitCounter.key == self._row_key(key, window)))
+
+    def purge_expired(self, batch_size=1000):
+        """Delete counters for windows that can no longer count; returns the number removed."""
+        return delete_in_batches(
+            RateLimitCounter, RateLimitCounter.expires_at <= datetime.utcnow(), batch_size=batch_size)
+
+    def stats(self):
+        return {"backend": "sql"}
+
+
+class RedisRateLimitStore:
+    """Counters in Redis (or any server speaking its protocol, e.g. Valkey, KeyDB or
+    ``utils.fake_redis`` for local runs).
+
+    The increment and both reads go out as one MULTI/EXEC transaction and the
+    keys expire on their own, so nothing needs purging.
+    """
+
+    def __init__(self, url, prefix="ratelimit:"):
+        import redis  # optional dependency, only needed for RATELIMIT_STORAGE=redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def hit(self, key, window, amount=1):
+        now = time.time()
+        index = int(now // window)
+        current = f"{self.prefix}{key}:{window}:{index}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.incrby(current, amount)
+        pipe.expire(current, window * 2)
+        pipe.get(f"{self.prefix}{key}:{window}:{index - 1}")
+        count, _, previous = pipe.execute()
+        return _weighted(int(previous or 0), int(count), window, now)
+
+    def count(self, key, window):
+        now = time.time()
+        index = int(now // window)
+        previous, current = self.client.mget([f"{self.prefix}{key}:{window}:{i}" for i in (index - 1, index)])
+        return _weighted(int(previous or 0), int(current or 0), window, now)
+
+    def reset(self, key, window):
+        index = int(time.time() // window)
+        self.client.delete(*(f"{self.prefix}{key}:{window}:{i}" for i in (index - 1, index)))
+
+    def stats(self):
+        return {"backend": "redis"}
+
+
+class RateLimiter:
+    """Applies the configured per-route limits and the login failure throttle."""
+
+    def __init__(self, store, route_limits, default_limit=None, login_limit=None, enabled=True):
+        self.store = store
+        self.route_limits = route_limits
+        self.default_limit = default_limit
+        self.login_limit = login_limit
+        self.enabled = enabled
+        self.rejected = 0
+
+    def _retry_after(self, window):
+        # When the current window closes; the previous window's share keeps shrinking after that.
+        return max(1, math.ceil(window - time.time() % window))
+
+    def check_route(self, endpoint, client):
+        """Count a request; returns seconds to wait if it is over the limit, else None."""
+        limit = self.route_limits.get(endpoint, self.default_limit)
+        if not self.enabled or limit is None:
+            return None
+        count, window = limit
+        if self.store.hit(f"route:{endpoint}:{client}", window) > count:
+            self.rejected += 1
+            return self._retry_after(window)
+        return None
+
+    def login_blocked(self, kind, email):
+        """Seconds to wait if ``email`` has used up its failed logins, else None; counts nothing."""
+        if not self.enabled or self.login_limit is None:
+            return None
+        count, window = self.login_limit
+        if self.store.count(_login_key(kind, email), window) >= count:
+            self.rejected += 1
+            return self._retry_after(window)
+        return None
+
+    def login_failed(self, kind, email):
+        if self.enabled and self.login_limit is not None:
+            self.store.hit(_login_key(kind, email), self.login_limit[1])
+
+    def login_succeeded(self, kind, email):
+        if self.enabled and self.login_limit is not None:
+            self.store.reset(_login_key(kind, email), self.login_limit[1])
+
+    def stats(self):
+        return {**self.store.stats(), "enabled": self.enabled, "rejected": self.rejected}
+
+
+def init_app(app):
+    backend = app.config.get("RATELIMIT_STORAGE", "memory")
+    if backend == "memory":
+        store = MemoryRateLimitStore()
+    elif backend == "sql":
+        store = SQLRateLimitStore()
+    elif backend == "redis":
+        store = RedisRateLimitStore(app.config.get("RATELIMIT_REDIS_URL") or app.config["REDIS_URL"])
+    else:
+        raise ValueError(f"Unknown RATELIMIT_STORAGE '{backend}'")
+    default = app.config.get("RATELIMIT_DEFAULT")
+    login = app.config.get("RATELIMIT_LOGIN_FAILURES")
+    limiter = RateLimiter(
+        store,
+        parse_route_limits(app.config.get("RATELIMIT_ROUTES", "")),
+        default_limit=parse_limit(default) if default else None,
+        login_limit=parse_limit(login) if login else None,
+        enabled=app.config.get("RATELIMIT_ENABLED", True),
+    )
+    exempt = set(app.config.get("RATELIMIT_EXEMPT", ()))
+    app.extensions["rate_limiter"] = limiter
+
+    @app.before_request
+    def enforce_route_limit():
+        if request.endpoint is None or request.endpoint in exempt or request.method == "OPTIONS":
+            return None
+        retry_after = limiter.check_route(request.endpoint, request.remote_addr or "unknown")
+        if retry_after is None:
+            return None
+        return jsonify({"message": "Too many requests, please retry later"}), 429, {"Retry-After": str(retry_after)}
+
+    return limiter
+
+
+def get_limiter():
+    return current_app.extensions["rate_limiter"]
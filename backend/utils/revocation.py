@@ -0,0 +1,201 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import current_tenant, db
+from models import RevokedToken
+from utils.bloom import RotatingBloomFilter
+from utils.maintenance import delete_in_batches
+
+
+class MemoryRevocationStore:
+    """Per-process LRU of revoked JTIs, each dropped once its token expires.
+
+    A heap of ``(expiry, jti)`` lets every revoke drop the entries that have
+    expired since the last one in O(log n) each, so a full store evicts live
+    entries only when nothing has expired. Entries that leave the LRU first
+    stay in the heap until they surface or it is rebuilt.
+
+    When a Bloom filter is attached, lookups it rules out return without
+    touching the LRU or its lock, which is the case for almost every request.
+    """
+
+    def __init__(self, max_entries=100000, bloom=None):
+        self.max_entries = max_entries
+        self.bloom = bloom
+        self.evictions = 0
+        self._entries = OrderedDict()  # jti -> exp (epoch seconds)
+        self._expiries = []  # heap of (exp, jti); may hold entries no longer in _entries
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        if expires_at <= time.time():
+            return
+        if self.bloom is not None:
+            self.bloom.add(jti, expires_at)
+        with self._lock:
+            if self._entries.get(jti) != expires_at:  # syncs revoke the same JTIs again
+                heapq.heappush(self._expiries, (expires_at, jti))
+            self._entries[jti] = expires_at
+            self._entries.move_to_end(jti)
+            self._drop_expired()
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def might_be_revoked(self, jti, expires_at=None):
+        return self.bloom is None or self.bloom.might_contain(jti, expires_at)
+
+    def is_revoked(self, jti, expires_at=None):
+        if not self.might_be_revoked(jti, expires_at):
+            return False
+        return self._lookup(jti)
+
+    def _lookup(self, jti):
+        with self._lock:
+            expires_at = self._entries.get(jti)
+            if expires_at is None:
+                if self.bloom is not None and not self.evictions:
+                    self.bloom.record_false_positive()
+                return False
+            if expires_at <= time.time():
+                del self._entries[jti]
+                return False
+            self._entries.move_to_end(jti)
+            return True
+
+    def stats(self):
+        stats = {"entries": len(self._entries), "evictions": self.evictions}
+        if self.bloom is not None:
+            stats["bloom"] = self.bloom.stats()
+        return stats
+
+    def _drop_expired(self):
+        now = time.time()
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now:
+            expires_at, jti = heapq.heappop(expiries)
+            if self._entries.get(jti) == expires_at:
+                del self._entries[jti]
+        if len(expiries) > 2 * len(self._entries):
+            # Mostly entries the LRU already dropped: rebuild from what is left.
+            self._expiries = [(exp, jti) for jti, exp in self._entries.items()]
+            heapq.heapify(self._expiries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLRevocationStore:
+    """Revocations persisted in the ``revoked_token`` table and shared by all workers.
+
+    Lookups are answered from a local mirror that is refreshed with the rows
+    revoked since the last sync at most every ``sync_interval`` seconds, so a
+    token that is not revoked never costs a database round trip. Revocations
+    made by other workers become visible within one sync interval. Each tenant's
+    table is synced on its own schedule into the one mirror; JTIs are UUIDs,
+    so tenants cannot collide in it.
+    """
+
+    # Rows committed slightly out of order by other workers are still picked
+    # up by re-reading this much history on every sync.
+    SYNC_OVERLAP = timedelta(seconds=30)
+
+    def __init__(self, max_entries=100000, sync_interval=5.0, bloom=None):
+        self.cache = MemoryRevocationStore(max_entries, bloom)
+        self.sync_interval = sync_interval
+        self._synced_since = {}  # tenant -> start of its last sync
+        self._next_sync = {}  # tenant -> monotonic time of its next sync
+        self._sync_lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        db.session.add(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(expires_at)))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # already revoked
+        self.cache.revoke(jti, expires_at)
+
+    def is_revoked(self, jti, expires_at=None):
+        self._maybe_sync()
+        if not self.cache.might_be_revoked(jti, expires_at):
+            return False
+        if self.cache._lookup(jti):
+            return True
+        if self.cache.evictions:
+            # The mirror overflowed, so a miss is no longer authoritative.
+            revoked = db.session.execute(
+                select(RevokedToken.id).where(
+                    RevokedToken.jti == jti, RevokedToken.expires_at > datetime.utcnow()
+                )
+            ).first() is not None
+            if not revoked and self.cache.bloom is not None:
+                self.cache.bloom.record_false_positive()
+            return revoked
+        return False
+
+    def stats(self):
+        return self.cache.stats()
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        tenant = current_tenant()
+        if now < self._next_sync.get(tenant, 0.0) or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            started = datetime.utcnow()
+            synced_since = self._synced_since.get(tenant)
+            query = select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > started)
+            if synced_since is not None:
+                query = query.where(RevokedToken.revoked_at >= synced_since - self.SYNC_OVERLAP)
+            for jti, expires_at in db.session.execute(query):
+                self.cache.revoke(jti, _epoch(expires_at))
+            self._synced_since[tenant] = started
+            self._next_sync[tenant] = now + self.sync_interval
+        finally:
+            self._sync_lock.release()
+
+    def purge_expired(self, batch_size=1000):
+        """Delete expired rows in small batches; returns the number removed."""
+        return delete_in_batches(RevokedToken, RevokedToken.expires_at <= datetime.utcnow(), batch_size=batch_size)
+
+
+def _epoch(value):
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+def init_app(app):
+    backend = app.config.get("REVOCATION_BACKEND", "sql")
+    max_entries = app.config.get("REVOCATION_CACHE_SIZE", 100000)
+    bloom = None
+    if app.config.get("REVOCATION_BLOOM_BYTES"):
+        # Revoked tokens can be refresh tokens, so cover the longest lifetime.
+        max_ttl = max(
+            app.config["JWT_ACCESS_TOKEN_EXPIRES"].total_seconds(),
+            app.config["JWT_REFRESH_TOKEN_EXPIRES"].total_seconds(),
+        )
+        bloom = RotatingBloomFilter(
+            app.config["REVOCATION_BLOOM_BYTES"],
+            max_ttl,
+            bucket_seconds=app.config.get("REVOCATION_BLOOM_BUCKET_SECONDS", 3600),
+        )
+    if backend == "memory":
+        store = MemoryRevocationStore(max_entries, bloom)
+    elif backend == "sql":
+        store = SQLRevocationStore(
+            max_entries, sync_interval=app.config.get("REVOCATION_SYNC_SECONDS", 5.0), bloom=bloom
+        )
+    else:
+        raise ValueError(f"Unknown REVOCATION_BACKEND '{backend}'")
+    app.extensions["revocation_store"] = store
+    return store
+
+
+def get_store():
+    return current_app.extensions["revocation_store"]
@@ -0,0 +1,152 @@
+"""Substring search over user names, emails and mobile numbers for admin lookups.
+
+On SQLite the searchable text is copied into ``user_search``, an FTS5 table
+with the trigram tokenizer, which triggers on ``user`` keep in step with
+every insert, delete and change to a searched column, including bulk
+inserts and writes made outside the app. On PostgreSQL a ``pg_trgm`` GIN
+index on the same text serves ``LIKE '%term%'``, and PostgreSQL maintains it
+itself. Both match each whitespace-separated term of three or more
+characters anywhere in the text, and rank matches by relevance. A broad
+term can match most of the table, so only the first ``MAX_CANDIDATES``
+matches (the newest users on SQLite) are ranked; the time a search takes then
+grows with how common its rarest trigram is, not with the number of matches.
+
+``init_search_index`` (run by ``flask --app app init-db``) creates the index
+and fills it the first time; ``rebuild_search_index`` refills it from the
+``user`` table.
+"""
+from sqlalchemy import inspect, text
+
+from extensions import db
+
+MIN_TERM_LENGTH = 3  # the length of a trigram; shorter terms cannot use the index
+MAX_TERMS = 5
+MAX_CANDIDATES = 2000
+
+# SQLite
+_FTS_TABLE = "user_search"
+_FTS_COLUMNS = ("name", "email", "mobile")
+# The FTS5 table and the shadow tables SQLite keeps for it; not part of the models.
+SEARCH_TABLES = frozenset({_FTS_TABLE, *(f"{_FTS_TABLE}_{suffix}"
+                                          for suffix in ("data", "idx", "content", "docsize", "config"))})
+_FTS_VALUES = "{row}.first_name || ' ' || {row}.last_name, {row}.email, coalesce({row}.mobile_number, '')"
+_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE {_FTS_TABLE} USING fts5({', '.join(_FTS_COLUMNS)}, tokenize = 'trigram')",
+    f"""CREATE TRIGGER {_FTS_TABLE}_insert AFTER INSERT ON "user" BEGIN
+        INSERT INTO {_FTS_TABLE} (rowid, {', '.join(_FTS_COLUMNS)}) VALUES (new.id, {_FTS_VALUES.format(row='new')});
+    END""",
+    f"""CREATE TRIGGER {_FTS_TABLE}_delete AFTER DELETE ON "user" BEGIN
+        DELETE FROM {_FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    # Logins also update the row (updated_at, rehashed passwords); only reindex on searched columns.
+    f"""CREATE TRIGGER {_FTS_TABLE}_update AFTER UPDATE OF first_name, last_name, email, mobile_number ON "user" BEGIN
+        DELETE FROM {_FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {_FTS_TABLE} (rowid, {', '.join(_FTS_COLUMNS)}) VALUES (new.id, {_FTS_VALUES.format(row='new')});
+    END""",
+)
+
+# PostgreSQL
+_TRGM_INDEX = "ix_user_search_trgm"
+_TRGM_TEXT = "lower(first_name || ' ' || last_name || ' ' || email || ' ' || coalesce(mobile_number, ''))"
+
+
+class SearchUnavailable(Exception):
+    """Raised on databases without a search index implementation; mapped to 409."""
+
+
+def search_terms(query):
+    """The terms of ``query`` that can be searched; raises ValueError when there are none."""
+    terms = [term for term in (query or "").lower().split() if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        raise ValueError(f"Search needs a term of at least {MIN_TERM_LENGTH} characters")
+    return terms[:MAX_TERMS]
+
+
+def _dialect():
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        raise SearchUnavailable(f"User search is not available on {dialect}")
+    return dialect
+
+
+def init_search_index(engine=None):
+    """Create and fill the search index in ``engine``'s database (the default tenant's) if it does
+    not exist; returns its name when it was added."""
+    engine = engine or db.engine
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        if inspect(engine).has_table(_FTS_TABLE):
+            return None
+        with engine.begin() as conn:
+            for statement in _FTS_DDL:
+                conn.exec_driver_sql(statement)
+        rebuild_search_index(engine)
+        return _FTS_TABLE
+    if dialect == "postgresql":
+        if any(index["name"] == _TRGM_INDEX for index in inspect(engine).get_indexes("user")):
+            return None
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            conn.exec_driver_sql(f'CREATE INDEX {_TRGM_INDEX} ON "user" USING gin (({_TRGM_TEXT}) gin_trgm_ops)')
+        return _TRGM_INDEX
+    return None  # search answers 409 on other databases
+
+
+def rebuild_search_index(engine=None, batch_size=10000):
+    """Refill the index from ``user`` in short transactions; returns the number of users indexed."""
+    engine = engine or db.engine
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"REINDEX INDEX {_TRGM_INDEX}")
+            return conn.exec_driver_sql('SELECT count(*) FROM "user"').scalar()
+    if dialect != "sqlite":
+        raise SearchUnavailable(f"User search is not available on {dialect}")
+    indexed = 0
+    last_id = 0
+    while True:
+        # Rows are replaced in place, so searches keep working during a rebuild; users written
+        # meanwhile are indexed by the triggers.
+        with engine.begin() as conn:
+            ids = conn.exec_driver_sql(
+                'SELECT id FROM "user" WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.exec_driver_sql(
+                f"INSERT OR REPLACE INTO {_FTS_TABLE} (rowid, {', '.join(_FTS_COLUMNS)}) "
+                f'SELECT id, {_FTS_VALUES.format(row="user")} FROM "user" WHERE id BETWEEN ? AND ?',
+                (ids[0], ids[-1]),
+            )
+        indexed += len(ids)
+        last_id = ids[-1]
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'DELETE FROM {_FTS_TABLE} WHERE rowid NOT IN (SELECT id FROM "user")')
+        conn.exec_driver_sql(f"INSERT INTO {_FTS_TABLE} ({_FTS_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def search_statement(dialect, terms, limit, offset=0):
+    """The query behind ``search_user_ids``, for ``dialect``."""
+    if dialect == "sqlite":
+        # Each term is one quoted FTS5 string, so operators typed by the admin are matched literally.
+        match = " AND ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        return text(
+            # bm25 weights: a hit in the name or email counts for more than one in the mobile number.
+            f"SELECT id FROM (SELECT rowid AS id, bm25({_FTS_TABLE}, 2.0, 2.0, 1.0) AS score FROM {_FTS_TABLE} "
+            f"WHERE {_FTS_TABLE} MATCH :match ORDER BY rowid DESC LIMIT :candidates) "
+            "ORDER BY score, id DESC LIMIT :limit OFFSET :offset"
+        ).bindparams(match=match, candidates=MAX_CANDIDATES, limit=limit, offset=offset)
+    params = {f"term{i}": "%{}%".format(term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"))
+              for i, term in enumerate(terms)}
+    where = " AND ".join(f"{_TRGM_TEXT} LIKE :term{i}" for i in range(len(terms)))
+    return text(
+        f'SELECT id FROM (SELECT id, {_TRGM_TEXT} AS search_text FROM "user" WHERE {where} '
+        "LIMIT :candidates) AS candidates "
+        "ORDER BY word_similarity(:query, search_text) DESC, id DESC LIMIT :limit OFFSET :offset"
+    ).bindparams(query=" ".join(terms), candidates=MAX_CANDIDATES, limit=limit, offset=offset, **params)
+
+
+def search_user_ids(terms, limit, offset=0):
+    """Ids of users matching every term, best match first."""
+    return db.session.scalars(search_statement(_dialect(), terms, limit, offset)).all()
@@ -0,0 +1,161 @@
+"""Server-side refresh sessions with rotation and reuse detection.
+
+Every login starts a session *family*. Its tokens carry the family id in the
+``fam`` claim, and the ``refresh_session`` row holds the one refresh JTI that
+may still be exchanged. A refresh swaps it for a new one, so a refresh token
+presented a second time has been copied and the whole family is revoked. A
+refresh takes the role and token version for the new access token from the
+identity cache (utils.identity), so it usually does not load the account.
+"""
+import uuid
+from calendar import timegm
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import select, update
+
+from extensions import current_tenant, db
+from models import RefreshSession
+from utils.audit import record
+from utils.identity import get_identity
+from utils.maintenance import delete_in_batches
+from utils.metrics import span
+from utils.revocation import get_store as get_revocation_store
+
+
+def _epoch(value):
+    return timegm(value.utctimetuple())
+
+
+def _mint(identity, claims, family, started_at):
+    """New token pair for a family; returns the tokens and the row values describing them."""
+    config = current_app.config
+    # Whole seconds, so the stored expiries match the ``exp`` claims exactly.
+    now = datetime.utcnow().replace(microsecond=0)
+    access_expires = now + config["JWT_ACCESS_TOKEN_EXPIRES"]
+    # Rotation slides the refresh expiry forward, but never past the session's maximum age.
+    refresh_expires = min(now + config["JWT_REFRESH_TOKEN_EXPIRES"], started_at + config["SESSION_MAX_AGE"])
+    # Both tokens only work against the tenant whose database holds the account.
+    tenant = current_tenant()
+    values = {
+        'refresh_jti': str(uuid.uuid4()),
+        'access_jti': str(uuid.uuid4()),
+        'access_expires_at': access_expires,
+        'rotated_at': now,
+        'expires_at': refresh_expires,
+    }
+    with span("create_access_token"):
+        access_token = create_access_token(identity=identity, additional_claims={
+            **claims, 'tenant': tenant, 'fam': family, 'jti': values['access_jti'], 'exp': _epoch(access_expires)})
+    # No role/type here: a refresh looks them up again, and a custom ``type``
+    # would replace the token-type claim that marks this as a refresh token.
+    refresh_token = create_refresh_token(identity=identity, additional_claims={
+        'tenant': tenant, 'fam': family, 'jti': values['refresh_jti'], 'exp': _epoch(refresh_expires)})
+    return access_token, refresh_token, values
+
+
+def start_session(subject_type, subject_id, role, version=0):
+    """Open a session for a successful login; returns ``(access token, refresh token)``."""
+    family = uuid.uuid4().hex
+    started_at = datetime.utcnow().replace(microsecond=0)
+    access_token, refresh_token, values = _mint(
+        str(subject_id), {'role': role, 'type': subject_type, 'ver': version}, family, started_at)
+    db.session.add(RefreshSession(
+        family=family, subject_type=subject_type, subject_id=subject_id, role=role,
+        created_at=started_at, **values,
+    ))
+    db.session.commit()
+    return access_token, refresh_token
+
+
+def rotate_session(token):
+    """Exchange the decoded refresh ``token`` for a new pair.
+
+    Returns ``(status, tokens)``. ``status`` is ``'ok'``, ``'expired'`` (unknown,
+    expired or revoked session), ``'superseded'`` (rotated moments ago by a
+    concurrent request, e.g. another tab) or ``'reused'`` (the family has now
+    been revoked). ``tokens`` is only set for ``'ok'``.
+    """
+    family = token.get('fam')
+    if not family:
+        return 'expired', None  # issued before server-side sessions
+    now = datetime.utcnow()
+    session = db.session.execute(
+        select(RefreshSession).where(RefreshSession.family == family)
+    ).scalar_one_or_none()
+    if session is None or session.expires_at <= now:
+        return 'expired', None
+
+    if session.refresh_jti != token['jti']:
+        grace = timedelta(seconds=current_app.config["REFRESH_REUSE_GRACE_SECONDS"])
+        if token['jti'] == session.previous_jti and now - session.rotated_at <= grace:
+            return 'superseded', None
+        # A rotated refresh token came back: it has been copied, so nobody keeps the session.
+        record('refresh', success=False, subject_type=session.subject_type, subject_id=session.subject_id,
+               reason='reused', family=family)
+        end_session(family)
+        return 'reused', None
+
+    account = get_identity(session.subject_type, session.subject_id)
+    if account is None or not account['active']:
+        end_session(family)
+        return 'expired', None
+    claims = {'role': account['role'], 'type': session.subject_type}
+    access_token, refresh_token, values = _mint(
+        str(session.subject_id), {**claims, 'ver': account['version']}, family, session.created_at)
+    # Conditional on the JTI we read, so of two concurrent refreshes only one wins.
+    rotated = db.session.execute(
+        update(RefreshSession)
+        .where(RefreshSession.id == session.id, RefreshSession.refresh_jti == token['jti'])
+        .values(previous_jti=token['jti'], **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not rotated:
+        db.session.rollback()
+        return 'superseded', None
+    db.session.commit()
+    return 'ok', {
+        'accessToken': access_token,
+        'refreshToken': refresh_token,
+        **claims,
+    }
+
+
+def _revoke(*criteria):
+    now = datetime.utcnow()
+    rows = db.session.execute(
+        select(RefreshSession.id, RefreshSession.access_jti, RefreshSession.access_expires_at)
+        .where(*criteria, RefreshSession.expires_at > now)
+    ).all()
+    if not rows:
+        return 0
+    db.session.execute(
+        update(RefreshSession)
+        .where(RefreshSession.id.in_([row.id for row in rows]))
+        .values(expires_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    # The refresh side is dead once the row expires; the latest access token
+    # is revoked explicitly. Access tokens minted before the last rotation
+    # lapse on their own within JWT_ACCESS_TOKEN_EXPIRES.
+    store = get_revocation_store()
+    for _, jti, expires_at in rows:
+        store.revoke(jti, _epoch(expires_at))
+    return len(rows)
+
+
+def end_session(family):
+    """Revoke one session family (logout, or reuse of a rotated refresh token)."""
+    return _revoke(RefreshSession.family == family)
+
+
+def revoke_subject_sessions(subject_type, subject_id):
+    """Revoke every live session of one account; returns how many there were."""
+    return _revoke(RefreshSession.subject_type == subject_type, RefreshSession.subject_id == subject_id)
+
+
+def purge_expired_sessions(batch_size=1000):
+    """Delete expired and revoked sessions in small batches; returns the number removed."""
+    return delete_in_batches(RefreshSession, RefreshSession.expires_at <= datetime.utcnow(), batch_size=batch_size)
@@ -0,0 +1,125 @@
+"""A minimal in-process SMTP server that accepts and records every message.
+
+Point MAIL_SERVER/MAIL_PORT at it (with MAIL_USE_TLS=false) to exercise the
+real delivery path locally without sending mail anywhere::
+
+    sink = FakeSMTPServer().start()
+    ...
+    sink.messages  # [(mail_from, [rcpt, ...], raw_message), ...]
+    sink.stop()
+
+Recipients listed in ``reject`` are refused with a 550, like a mailbox that
+does not exist.
+"""
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply("220 fake-smtp ready")
+        mail_from, recipients = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode(errors="replace").rstrip("\r\n")
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                if command == "EHLO":
+                    self.reply("250-fake-smtp")
+                    self.reply("250 AUTH PLAIN LOGIN")
+                else:
+                    self.reply("250 fake-smtp")
+            elif command == "AUTH":
+                parts = line.split()
+                if len(parts) == 2 and parts[1].upper() == "LOGIN":
+                    # smtplib's LOGIN exchange: username then password prompts.
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif len(parts) == 2:
+                    self.reply("334 ")
+                    self.rfile.readline()
+                self.reply("235 Authentication successful")
+            elif command == "MAIL":
+                mail_from, recipients = line.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipient = line.split(":", 1)[1].strip()
+                if recipient.strip("<>") in sink.reject:
+                    self.reply("550 No such user here")
+                    continue
+                recipients.append(recipient)
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                with sink.lock:
+                    sink.messages.append((mail_from, recipients, b"".join(lines)))
+                self.reply("250 OK queued")
+            elif command == "RSET":
+                mail_from, recipients = None, []
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    def __init__(self, host="127.0.0.1", port=0, reject=()):
+        self._server = _Server((host, port), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self.reject = set(reject)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink that records messages.")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    sink = FakeSMTPServer(port=args.port).start()
+    print(f"Fake SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{len(sink.messages)} messages over {sink.connections} connections")
+    except KeyboardInterrupt:
+        sink.stop()
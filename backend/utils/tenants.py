@@ -0,0 +1,102 @@
+"""Customer orgs (tenants) served by one deployment, each with its own database.
+
+``TENANT_DATABASES`` maps tenant names to database URLs. Each becomes a bind
+with its own connection pool, so one tenant's load cannot take another's
+connections, and a tenant's users, admins, sessions, codes, revocations and
+auth events live only in its database. Requests name their tenant in the
+``TENANT_HEADER`` header; without it they belong to the default tenant, which
+uses ``DATABASE_URL`` (and, alone, the read replica). Access tokens carry the
+tenant they were issued for in the ``tenant`` claim and are refused for any
+other, so an admin only ever sees their own tenant's users.
+
+Rate-limit counters and job leases are shared by all tenants and stay in the
+default database. Background jobs visit every tenant's database in turn
+through ``for_each_tenant``.
+"""
+import re
+
+from flask import current_app, jsonify, request
+
+from extensions import DEFAULT_TENANT, db, engine_options, tenant_bind, tenant_context
+from utils.maintenance import checkpoint, report_error
+
+_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,39}$")
+
+
+def parse_tenant_databases(value):
+    """``acme=postgresql://...;globex=sqlite:///globex.db`` as ``{name: url}``."""
+    tenants = {}
+    for entry in (value or "").split(";"):
+        if not entry.strip():
+            continue
+        name, _, url = entry.partition("=")
+        name, url = name.strip(), url.strip()
+        if not _NAME.match(name) or not url:
+            raise ValueError(f"Invalid TENANT_DATABASES entry '{entry.strip()}', expected name=url")
+        if name == DEFAULT_TENANT:
+            raise ValueError(f"Tenant '{DEFAULT_TENANT}' always uses DATABASE_URL")
+        if name in tenants:
+            raise ValueError(f"Tenant '{name}' is listed twice in TENANT_DATABASES")
+        tenants[name] = url
+    urls = list(tenants.values())
+    if len(set(urls)) != len(urls):
+        # Tables carry no tenant id, so two tenants in one database would see each other's users.
+        raise ValueError("Every tenant in TENANT_DATABASES needs its own database")
+    return tenants
+
+
+def tenant_binds(config):
+    """``SQLALCHEMY_BINDS`` entries for the tenants in ``config``."""
+    return {
+        tenant_bind(name): {"url": url, **engine_options(url, config)}
+        for name, url in config["TENANT_DATABASES"].items()
+    }
+
+
+def tenant_names():
+    return [DEFAULT_TENANT, *current_app.config["TENANT_DATABASES"]]
+
+
+def for_each_tenant(fn):
+    """Job running ``fn`` once per tenant database; returns the total it processed.
+
+    A run that uses up the job's time budget stops after the current tenant,
+    and the next run starts with the tenant after it, so no tenant waits
+    behind another's backlog for long. A tenant whose database fails is
+    rolled back, reported through ``report_error`` and skipped until the next
+    run, so it cannot hold up the tenants after it.
+    """
+    position = {"next": 0}
+
+    def run():
+        names = tenant_names()
+        start = position["next"] % len(names)
+        processed = 0
+        for offset in range(len(names)):
+            index = (start + offset) % len(names)
+            position["next"] = index + 1
+            with tenant_context(names[index]):
+                try:
+                    processed += fn() or 0
+                except Exception as e:
+                    db.session.rollback()
+                    report_error(f"{names[index]}: {e}")
+                    print(f"Maintenance task {fn.__name__} failed for tenant {names[index]}: {e}")
+            if not checkpoint():
+                break
+        return processed
+
+    run.__name__ = fn.__name__
+    return run
+
+
+def init_app(app):
+    header = app.config["TENANT_HEADER"]
+    known = {DEFAULT_TENANT, *app.config["TENANT_DATABASES"]}
+
+    @app.before_request
+    def resolve_tenant():
+        tenant = request.headers.get(header) or DEFAULT_TENANT
+        if tenant not in known:
+            return jsonify({"message": "Unknown tenant"}), 404
+        db.session.info["tenant"] = tenant
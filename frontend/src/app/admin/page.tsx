@@ -26,11 +26,17 @@ type User = {
   createdAt?: string;
 };
 
+type UsersPage = {
+  items: User[];
+  nextCursor: string | null;
+};
+
 export default function AdminPage() {
   const router = useRouter();
   const { isAuthenticated, isAdmin } = useAuth();
   const [isAuthorized, setIsAuthorized] = useState(false);
   const [users, setUsers] = useState<User[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
   const [loading, setLoading] = useState(false);
@@ -52,12 +58,14 @@ export default function AdminPage() {
   const [showCreateModal, setShowCreateModal] = useState(false);
   const { toasts, success: showSuccess, removeToast } = useToast();
 
-  async function loadUsers() {
+  async function loadUsers(cursor?: string) {
     setLoading(true);
     setError('');
     try {
-      const data = await apiFetch<User[]>("/admin/users");
-      setUsers(data);
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const data = await apiFetch<UsersPage>(`/admin/users${query}`);
+      setUsers(prev => (cursor ? [...prev, ...data.items] : data.items));
+      setNextCursor(data.nextCursor);
     } catch (err: unknown) {
       setError(err instanceof Error ? err.message : 'Failed to load users');
     } finally {
@@ -328,7 +336,7 @@ export default function AdminPage() {
             </tr>
           </thead>
               <tbody className="bg-white divide-y divide-gray-200">
-            {loading ? (
+            {loading && users.length === 0 ? (
                   <tr>
                     <td colSpan={5} className="px-6 py-4 text-center text-gray-500">
                       <div className="flex items-center justify-center">
@@ -352,7 +360,7 @@ export default function AdminPage() {
                             {user.profilePictureUrl ? (
                               <Image
                                 className="h-10 w-10 rounded-full object-cover border-2 border-gray-200"
-                                src={`http://localhost:5000${user.profilePictureUrl}`}
+                                src={`http://localhost:5000${user.profilePictureUrl}?size=80`}
                                 alt={`${user.firstName} ${user.lastName}`}
                                 width={40}
                                 height={40}
@@ -430,6 +438,13 @@ export default function AdminPage() {
           </tbody>
         </table>
           </div>
+          {nextCursor && (
+            <div className="flex justify-center py-4">
+              <Button variant="secondary" onClick={() => loadUsers(nextCursor)} disabled={loading}>
+                {loading ? 'Loading...' : 'Load more'}
+              </Button>
+            </div>
+          )}
         </Card>
       </div>
 
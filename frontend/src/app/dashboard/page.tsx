@@ -130,7 +130,7 @@ export default function DashboardPage() {
                   {user?.profilePictureUrl ? (
                     <Image
                       className="h-24 w-24 rounded-full object-cover border-4 border-white shadow-lg"
-                      src={`http://localhost:5000${user.profilePictureUrl}`}
+                      src={`http://localhost:5000${user.profilePictureUrl}?size=192`}
                       alt={`${user.firstName} ${user.lastName}`}
                       width={96}
                       height={96}